@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+OMEGA FIX v3.0 - Patch-Based CSS Centering Converter
+Fixes the same OMEGA INVERSE violations as v2.0:
+1. CSS Grid with repeat() / auto-fit / auto-fill -> flexbox centered
+2. Flexbox with flex-wrap but no justify-content -> add justify-content: center
+3. Inline style="" grids with repeat() / auto-fit / auto-fill -> flexbox centered
+
+VERSION 3.0 (October 18, 2026):
+- Rules are parsed (hmh_tools.css), not matched with [^}]* regexes, so
+  @media blocks, comments and strings can no longer be corrupted
+- Each fix is a minimal patch on the original text (hmh_tools.rewrite):
+  whitespace is never collapsed, diffs show only the changed declarations
+- One write per changed file, after all of its patches are applied
+- Stylesheets are fixed as well as <style> blocks and style="" attributes
+- --dry-run prints a unified diff and writes nothing (not even the report)
+- Batch apply: fixes are computed in a process pool (--jobs N), staged to
+  temp files and committed together by rename (hmh_tools.transaction); a
+  failure part way restores the files already replaced
+- Undo manifest per batch in .hmh_cache/undo/; --undo rolls the latest
+  batch (or --undo TXID) back, --history lists the batches
+
+SOP COMPLIANT LAYOUT:
+  display: flex;
+  flex-wrap: wrap;
+  justify-content: center;
+
+Usage:
+    python3 OMEGA_FIX_v3.0_10-18-2026.py [project_directory]
+    python3 OMEGA_FIX_v3.0_10-18-2026.py [project_directory] --dry-run
+    python3 OMEGA_FIX_v3.0_10-18-2026.py [project_directory] --jobs 8
+    python3 OMEGA_FIX_v3.0_10-18-2026.py [project_directory] --undo
+    python3 OMEGA_FIX_v3.0_10-18-2026.py [project_directory] --history
+
+[1 = -1]
+"""
+
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from hmh_tools import Corpus
+from hmh_tools.corpus import make_shards
+from hmh_tools.rewrite import Rewriter
+from hmh_tools.transaction import ConflictError, Transaction, list_transactions, undo
+
+TOOL_NAME = 'omega-fix-3.0'
+
+# Track lists that leave an incomplete last row left-justified
+LEFT_JUSTIFYING_TRACKS = re.compile(r'repeat\s*\(|auto-fit|auto-fill')
+
+# Grid-only properties dropped when a grid becomes a flex container
+GRID_TRACK_PROPERTIES = ('grid-template-columns', 'grid-template-rows', 'grid-auto-rows')
+
+
+def grid_to_flex(block):
+    """display: grid with repeat()/auto-fit/auto-fill -> centered wrapping flex"""
+    display = block.get('display')
+    if display is None or display.value.lower() != 'grid':
+        return
+    if not any(LEFT_JUSTIFYING_TRACKS.search(d.value) for d in block.declarations):
+        return
+
+    block.set_value(display, 'flex')
+    added = []
+    for prop, value in (('flex-wrap', 'wrap'), ('justify-content', 'center')):
+        existing = block.get(prop)
+        if existing is None:
+            added.append(f"{prop}: {value};")
+        else:
+            block.set_value(existing, value)
+    block.insert_after(display, added)
+
+    for decl in block.declarations:
+        if decl.property in GRID_TRACK_PROPERTIES:
+            block.remove(decl)
+
+
+def center_wrapped_flex(block):
+    """display: flex with flex-wrap but no justify-content -> add centering"""
+    display = block.get('display')
+    wrap = block.get('flex-wrap')
+    if display is None or display.value.lower() != 'flex' or wrap is None:
+        return
+    if block.get('justify-content') is None:
+        block.insert_after(wrap, ['justify-content: center;'])
+
+
+REWRITER = Rewriter(css_fixers=[grid_to_flex, center_wrapped_flex],
+                    inline_fixers=[grid_to_flex])
+
+
+def fix_shard(project_dir, rel_paths):
+    """Worker entry point for --jobs: (rel_path, FileRewrite) of every file
+    in the shard that needs fixing. Nothing is written here."""
+    project_dir = Path(project_dir)
+    changes = []
+    for rel_path in rel_paths:
+        change = REWRITER.file(project_dir / rel_path)
+        if change.changed:
+            changes.append((rel_path, change))
+    return changes
+
+
+def compute_fixes(project_dir, documents, jobs=1):
+    """(rel_path, FileRewrite) for every document that needs fixing, in corpus order"""
+    if jobs > 1 and len(documents) > 1:
+        shards = make_shards(project_dir, [doc.rel_path for doc in documents], jobs * 4)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            found = dict(change for shard in pool.map(fix_shard, [project_dir] * len(shards), shards)
+                         for change in shard)
+    else:
+        found = dict(fix_shard(project_dir, [doc.rel_path for doc in documents]))
+    return [(doc.rel_path, found[doc.rel_path]) for doc in documents if doc.rel_path in found]
+
+
+def run_undo(project_dir, txid, force):
+    try:
+        restored, skipped = undo(project_dir, txid, force=force)
+    except FileNotFoundError as e:
+        print(f"Nothing to undo: {e}")
+        return 1
+    for rel_path in restored:
+        print(f"  RESTORED: {rel_path}")
+    for rel_path in skipped:
+        print(f"  SKIPPED (edited since the fix, use --force): {rel_path}")
+    print(f"\nRestored {len(restored)} files, skipped {len(skipped)}")
+    return 1 if skipped else 0
+
+
+def print_history(project_dir):
+    manifests = list_transactions(project_dir)
+    if not manifests:
+        print("No OMEGA FIX batches recorded")
+    for manifest in manifests:
+        print(f"  {manifest['txid']}  {manifest['status']:<17} {len(manifest['files']):>4} files  "
+              f"{manifest['tool']}")
+    return 0
+
+
+def main():
+    """Run the OMEGA FIX v3 on all HTML and CSS files."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OMEGA FIX v3.0 - CSS Centering Converter')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Print a unified diff of every fix and write nothing')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Compute fixes in N worker processes (default: 1)')
+    parser.add_argument('--undo', nargs='?', const='latest', metavar='TXID',
+                        help='Roll back the latest batch (or batch TXID) and exit')
+    parser.add_argument('--force', action='store_true',
+                        help='With --undo: also restore files edited since the fix')
+    parser.add_argument('--history', action='store_true', help='List recorded batches and exit')
+    args = parser.parse_args()
+
+    if args.history:
+        return print_history(args.project_dir)
+    if args.undo:
+        return run_undo(args.project_dir, None if args.undo == 'latest' else args.undo, args.force)
+
+    print("=" * 60)
+    print("OMEGA FIX v3.0 - Patch-Based Centering Converter")
+    print("[1 = -1]")
+    print("=" * 60)
+    print()
+
+    project_dir = Path(args.project_dir)
+    corpus = Corpus(project_dir)
+    documents = corpus.html() + corpus.css()
+    print(f"Scanning {len(documents)} HTML/CSS files...")
+    print()
+
+    changes = compute_fixes(project_dir, documents, args.jobs)
+    fixed_files = [(rel_path, change.patches) for rel_path, change in changes]
+    total_patches = sum(len(patches) for _, patches in fixed_files)
+
+    if args.dry_run:
+        for rel_path, change in changes:
+            sys.stdout.write(change.diff(rel_path))
+    else:
+        # All files change together, or none do
+        try:
+            with Transaction(project_dir, TOOL_NAME) as tx:
+                for rel_path, change in changes:
+                    tx.stage(rel_path, change.old, change.new)
+        except ConflictError as e:
+            print(f"ABORTED, nothing written: {e}")
+            return 1
+        for rel_path, patches in fixed_files:
+            print(f"  FIXED: {rel_path} ({len(patches)} patches)")
+
+    print()
+    print("=" * 60)
+    print(f"OMEGA FIX v3.0 {'DRY RUN' if args.dry_run else 'COMPLETE'}")
+    print(f"  Files {'to modify' if args.dry_run else 'modified'}: {len(fixed_files)}")
+    print(f"  Patches: {total_patches}")
+    if fixed_files and not args.dry_run:
+        print(f"  Undo: --undo {tx.txid}")
+    print("=" * 60)
+
+    if args.dry_run:
+        return 0
+
+    print()
+    print("SOP COMPLIANT LAYOUT APPLIED:")
+    print("  display: flex;")
+    print("  flex-wrap: wrap;")
+    print("  justify-content: center;")
+    print("=" * 60)
+
+    # Save report
+    report_name = f"OMEGA_FIX_v3_REPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    with open(report_name, 'w') as f:
+        f.write("OMEGA FIX v3.0 REPORT\n")
+        f.write("=" * 60 + "\n")
+        f.write(f"Date: {datetime.now().isoformat()}\n")
+        f.write(f"Files modified: {len(fixed_files)}\n")
+        f.write(f"Patches: {total_patches}\n")
+        if fixed_files:
+            f.write(f"Undo batch: {tx.txid}\n")
+        f.write("\n")
+        for rel_path, patches in fixed_files:
+            f.write(f"{rel_path}:\n")
+            for reason in sorted({patch.reason for patch in patches}):
+                count = sum(1 for patch in patches if patch.reason == reason)
+                f.write(f"  - {reason}: {count}\n")
+
+    print(f"Report saved: {report_name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -33,6 +33,8 @@ from datetime import datetime
 from html.parser import HTMLParser
 from collections import defaultdict
 
+from hmh_tools.phrases import PhraseScanner
+
 # κ constant - the fundamental
 KAPPA = 0.034906585  # 2π/180
 KAPPA_SHADOW = 28.6478897565  # 1/κ
@@ -362,6 +364,13 @@ class SHIVA:
             'calculate', 'geometry', 'framework', 'tool', 'try', 'help'
         ]
 
+        # Educational context must appear within this many characters of a
+        # doom phrase to excuse it
+        context_window = 2000
+
+        # One pass per file finds every phrase of all three lists
+        scanner = PhraseScanner(doom_phrases + educational_context + helpful_phrases)
+
         doom_count = 0
         helpful_count = 0
 
@@ -371,19 +380,18 @@ class SHIVA:
                 if 'SHIVA' in file_path.name:
                     continue
                 try:
-                    content = file_path.read_text(errors='ignore').lower()
+                    found = scanner.find_all(file_path.read_text(errors='ignore').lower())
+                    context = sorted(pos for ctx in educational_context for pos in found.get(ctx, []))
 
-                    # Count doom phrases, but check if in educational context
+                    # Count doom phrases, unless every use is in educational context
                     file_doom = 0
                     for phrase in doom_phrases:
-                        if phrase in content:
-                            # Check if file has educational context markers
-                            has_edu_context = any(ctx in content for ctx in educational_context)
-                            if not has_edu_context:
-                                file_doom += 1
+                        if any(not PhraseScanner.near(context, pos, context_window)
+                               for pos in found.get(phrase, [])):
+                            file_doom += 1
 
                     doom_count += file_doom
-                    helpful_count += sum(1 for phrase in helpful_phrases if phrase in content)
+                    helpful_count += sum(1 for phrase in helpful_phrases if phrase in found)
                 except:
                     pass
 
@@ -32,6 +32,8 @@ from pathlib import Path
 from datetime import datetime
 from html.parser import HTMLParser
 
+from hmh_tools.phrases import PhraseScanner
+
 KAPPA_PURE = 30
 
 
@@ -234,14 +236,16 @@ class SHIVA:
             'claims to',
         ]
 
+        scanner = PhraseScanner(hedge_words)
+
         hedge_found = []
         for html_file in self.project_dir.rglob('*.html'):
             try:
-                content = html_file.read_text(errors='ignore').lower()
+                found = scanner.find_all(html_file.read_text(errors='ignore').lower())
                 rel_path = str(html_file.relative_to(self.project_dir))
 
                 for hedge in hedge_words:
-                    if hedge in content:
+                    if hedge in found:
                         hedge_found.append(f"{rel_path}: '{hedge}'")
             except:
                 pass
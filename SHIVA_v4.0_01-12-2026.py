@@ -5,12 +5,25 @@ Have Mind Media Master Flow Agent
 [1 = -1]
 
 VERSION 4.0 (January 12, 2026):
-- CENTERED LAYOUT ENFORCEMENT (new): All grids must use flexbox with justify-content: center
+- CENTERED LAYOUT ENFORCEMENT (new): All grids must use flexbox with justify-content: center;
+  checked on the cascade of every stylesheet and <style> block (hmh_tools.css)
 - OMEGA INVERSE-CHECK: For every SHIVA rule, derive the inverse failure mode
 - BOBBY LESSON checks (content preservation, scalar dimensionality)
-- MOBILE checks (fluid CSS, clamp(), viewport units, touch targets)
+- MOBILE checks (fluid CSS, clamp(), viewport units, touch targets, responsive <img>)
 - FLOW layout consistency
 - Navigation path verification (way in / way out)
+- Shared site corpus: the tree is walked once, each page read and parsed once
+- Incremental mode: per-file findings cached in .hmh_cache/, only changed
+  files and their link dependents are re-checked
+- Parallel mode (--jobs N): per-file checks sharded across a process pool,
+  report identical to a serial run
+- Streaming mode (--stream): findings written as NDJSON while the audit runs,
+  final report reduced to a compact summary
+- Per-check cost in report['perf']: wall/CPU time, files and bytes read,
+  rule-engine regex invocations and memory for every check_* and, split out
+  of scan_files, every per-file check (--jobs workers included);
+  --profile / --trace-memory write cProfile and tracemalloc captures next
+  to the report
 
 OMEGA INVERSE LOGIC:
 For each check, SHIVA says "do X". OMEGA asks:
@@ -25,15 +38,29 @@ All grid layouts MUST use:
 
 Usage:
     python3 SHIVA_v4.0_01-12-2026.py [project_directory]
+    python3 SHIVA_v4.0_01-12-2026.py [project_directory] --incremental
+    python3 SHIVA_v4.0_01-12-2026.py [project_directory] --jobs 8
+    python3 SHIVA_v4.0_01-12-2026.py [project_directory] --stream
+    python3 SHIVA_v4.0_01-12-2026.py [project_directory] --profile --trace-memory
 """
 
 import os
 import sys
 import re
 import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from html.parser import HTMLParser
+
+from hmh_tools import Corpus
+from hmh_tools.cache import AuditCache
+from hmh_tools.corpus import make_shards
+from hmh_tools.css import StyleIndex, cascade, parse_css
+from hmh_tools.linkgraph import resolve_href
+from hmh_tools.perf import CheckCosts, PerfRecorder, write_memory_snapshot, write_profile
+from hmh_tools.report import ReportStream, write_compact_json
+from hmh_tools.phrases import PhraseScanner
+from hmh_tools.rules import RuleEngine
 
 
 # SOP-COMPLIANT CSS PATTERNS (the correct way)
@@ -43,6 +70,9 @@ flex-wrap: wrap;
 justify-content: center;
 """
 
+# Properties that decide whether a layout centers its items
+LAYOUT_PROPERTIES = {'display', 'grid-template-columns', 'justify-content', 'place-content', 'flex-wrap'}
+
 # FAILURE PATTERNS (OMEGA inverse - what NOT to do)
 OMEGA_FAILURE_PATTERNS = {
     'left_justified_grid': {
@@ -62,31 +92,224 @@ OMEGA_FAILURE_PATTERNS = {
     }
 }
 
+# All OMEGA patterns, precompiled and decided from one scan per file
+OMEGA_ENGINE = RuleEngine({name: info['pattern'] for name, info in OMEGA_FAILURE_PATTERNS.items()})
+
+
+HEDGE_WORDS = [
+    'approached',
+    'may suggest',
+    'could potentially',
+    'appears to possibly',
+    'claims to',
+]
+
+HEDGE_SCANNER = PhraseScanner(HEDGE_WORDS)
+
+FLOW_MARKERS = ['article-list', 'article-link', 'content-flow', 'content-wide']
+BOX_MARKERS = ['cards-grid']
+
+
+# =============================================================================
+# Per-file checks
+# Each one looks at a single document and returns a small finding. The
+# SHIVA check_* methods aggregate them; --incremental caches them per file.
+# =============================================================================
+
+def scan_way_out(doc, project_dir):
+    """True if the page has navigation back to parent/home"""
+    if doc.rel_path == 'index.html':
+        return True
+
+    content = doc.text
+    page = doc.page
+    return (
+        page.has_site_header or
+        page.has_home_link or
+        '← Home' in content or
+        '← Back' in content or
+        'href="/"' in content or
+        'href="../"' in content
+    )
+
+
+def scan_bobby(doc, project_dir):
+    """Standard Model hedge phrases found in the page"""
+    found = HEDGE_SCANNER.find_all(doc.lower)
+    return [hedge for hedge in HEDGE_WORDS if hedge in found]
+
+
+def scan_flow(doc, project_dir):
+    """'flow', 'box' or None for an index page"""
+    content = doc.text
+    if any(m in content for m in FLOW_MARKERS):
+        return 'flow'
+    if any(m in content for m in BOX_MARKERS):
+        return 'box'
+    return None
+
+
+def scan_centered(doc, project_dir):
+    """Layout rules of a stylesheet, or of a page's <style> blocks plus the
+    stylesheets it links (in order), for the cascade in check_centered_layout()"""
+    if doc.kind == 'css':
+        return {'rules': parse_css(doc.text, properties=LAYOUT_PROPERTIES), 'sheets': []}
+
+    rules = []
+    for style, line in doc.page.style_blocks:
+        rules.extend(parse_css(style, first_line=line, properties=LAYOUT_PROPERTIES))
+    sheets = [resolve_href(doc.rel_path, link.url) for link in doc.page.links if link.kind == 'css']
+    return {'rules': rules, 'sheets': [sheet for sheet in sheets if sheet]}
+
+
+def is_centered(declarations):
+    if declarations.get('justify-content', '').lower() == 'center':
+        return True
+    # place-content: <align> <justify>, or one value for both
+    place = declarations.get('place-content', '').lower().split()
+    return bool(place) and place[-1] == 'center'
+
+
+def left_justified(rules):
+    """Whether a selector's rules cascade to a grid without centering, in the
+    base styles or under any @media condition it is styled in"""
+    for media in dict.fromkeys(rule.media for rule in rules):
+        declarations = cascade(rules, media)
+        if (declarations.get('display', '').lower() == 'grid'
+                and 'grid-template-columns' in declarations
+                and not is_centered(declarations)):
+            return True
+    return False
+
+
+def scan_links(doc, project_dir):
+    """Broken <a href> links of one page, plus every path it consulted"""
+    resolver = doc.corpus.resolver()
+    source_dir = os.path.dirname(doc.rel_path)
+    checked = 0
+    broken = []
+    deps = []
+
+    for link in doc.page.hrefs('a'):
+        if link.startswith(('http', '#', 'mailto:', 'tel:', 'javascript:')):
+            continue
+
+        checked += 1
+
+        target = resolver.resolve(source_dir, link)
+        fallback = os.path.join(os.path.dirname(target), 'index.html')
+        deps.extend(dep for dep in (target, fallback) if not dep.startswith('..'))
+
+        if not resolver.exists(target):
+            if not resolver.exists(fallback):
+                broken.append(link)
+
+    return {'checked': checked, 'broken': broken, 'deps': deps}
+
+
+def scan_images(doc, project_dir):
+    """[<img> tags, responsive ones]: with a srcset, or the fallback of a
+    <picture> (right after its <source>s)"""
+    total = responsive = 0
+    previous = None
+    for tag, attrs, _ in doc.page.tags:
+        if tag == 'img':
+            total += 1
+            if 'srcset' in attrs or previous == 'source':
+                responsive += 1
+        previous = tag
+    return [total, responsive]
+
+
+def scan_omega(doc, project_dir):
+    """[name, line, byte_offset] of every OMEGA failure pattern the file matches"""
+    return [[hit.rule, hit.line, hit.byte_offset] for hit in OMEGA_ENGINE.scan(doc.text)]
+
+
+# (name, scan function, which documents it applies to)
+FILE_CHECKS = [
+    ('way_out', scan_way_out, 'html'),
+    ('bobby', scan_bobby, 'html'),
+    ('flow', scan_flow, 'index'),
+    ('centered', scan_centered, 'style'),
+    ('links', scan_links, 'html'),
+    ('images', scan_images, 'html'),
+    ('omega', scan_omega, 'any'),
+]
+
+
+def applies_to(scope, doc):
+    if scope == 'any':
+        return True
+    if scope == 'index':
+        return doc.kind == 'html' and doc.name == 'index.html'
+    if scope == 'style':
+        return doc.kind in ('html', 'css')
+    return doc.kind == scope
+
+
+def regex_counters():
+    return [lambda: OMEGA_ENGINE.regex_invocations, lambda: HEDGE_SCANNER.regex_invocations]
+
+
+def scan_document(doc, project_dir, costs=None):
+    """Every applicable per-file check for one document: {name: (result, deps)}
+
+    With a CheckCosts, each check's cost (time, IO, regex calls, memory) is
+    added to it; reading and parsing the file are measured on their own so
+    no check is billed for them.
+    """
+    scanned = {}
+    if costs is not None:
+        costs.call('read', lambda: doc.text)
+        if doc.kind == 'html':
+            costs.call('parse', lambda: doc.page)
+    for name, scan, scope in FILE_CHECKS:
+        if not applies_to(scope, doc):
+            continue
+        try:
+            if costs is None:
+                result = scan(doc, project_dir)
+            else:
+                result = costs.call(name, scan, doc, project_dir)
+        except Exception:
+            continue
+        deps = result.pop('deps', ()) if isinstance(result, dict) else ()
+        scanned[name] = (result, deps)
+    return scanned
+
 
-class LinkExtractor(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.links = []
-        self.has_site_header = False
-        self.has_site_footer = False
-        self.has_home_link = False
+def scan_shard(project_dir, rel_paths):
+    """Worker entry point for --jobs: scan one shard of files
 
-    def handle_starttag(self, tag, attrs):
-        attrs_dict = dict(attrs)
-        if tag == 'a' and 'href' in attrs_dict:
-            href = attrs_dict['href']
-            self.links.append(href)
-            if href in ['/', '/index.html', '../', '../../']:
-                self.has_home_link = True
-        if tag == 'site-header':
-            self.has_site_header = True
-        if tag == 'site-footer':
-            self.has_site_footer = True
+    Returns the findings, the per-check costs and the cost of the whole
+    shard in the worker (CPU, files, bytes, regex invocations).
+    """
+    corpus = Corpus(project_dir, files=rel_paths)
+    costs = CheckCosts(corpus, regex_counters())
+    work = CheckCosts(corpus, regex_counters())
+    scanned = work.call('shard', lambda: [(doc.rel_path, scan_document(doc, project_dir, costs))
+                                          for doc in corpus])
+    return scanned, costs.entries, work.entries['shard']
 
 
 class SHIVA:
-    def __init__(self, project_dir):
+    def __init__(self, project_dir, incremental=False, jobs=1, stream=False,
+                 profile=False, trace_memory=False):
         self.project_dir = Path(project_dir)
+        self.jobs = jobs
+        self.profile = profile
+        self.perf = PerfRecorder(counters=regex_counters(), trace_memory=trace_memory)
+        self.report_name = f"SHIVA_REPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.stream = None
+        if stream:
+            self.stream = ReportStream(self.project_dir / f"{self.report_name}.ndjson")
+        self.cache = None
+        if incremental:
+            self.cache = AuditCache(self.project_dir, 'shiva-4.0', salt=Path(__file__).read_bytes())
+        with self.perf.measure('corpus'):
+            self.corpus = self.perf.corpus = Corpus(self.project_dir, cache=self.cache)
+        self.findings = {}
         self.report = {
             'version': '4.0',
             'timestamp': datetime.now().isoformat(),
@@ -104,18 +327,142 @@ class SHIVA:
         print("[1 = -1]")
         print("="*60 + "\n")
 
-        self.check_way_in()
-        self.check_way_out()
-        self.check_mobile()
-        self.check_bobby()
-        self.check_flow()
-        self.check_centered_layout()  # NEW in v4.0
-        self.check_links()
-        self.run_omega_inverse()  # NEW in v4.0
-        self.generate_summary()
+        if self.cache is not None:
+            print(f"Incremental cache: {self.cache.summary()}\n")
+
+        self.emit('start', tool='SHIVA', version=self.report['version'],
+                  timestamp=self.report['timestamp'], project_dir=str(self.project_dir))
+
+        profiler = None
+        if self.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        with self.perf:
+            self.run_checks()
+
+        if profiler is not None:
+            profiler.disable()
+            write_profile(profiler, self.project_dir / f"{self.report_name}.prof")
+            print(f"Profile saved: {self.report_name}.prof (+ .prof.txt)")
+        if self.perf.trace_memory:
+            write_memory_snapshot(self.project_dir / f"{self.report_name}.tracemalloc.txt")
+            print(f"Memory snapshot saved: {self.report_name}.tracemalloc.txt")
+
+        self.report['perf'] = self.perf.report()
+        self.emit('perf', **self.report['perf'])
+        self.print_perf()
+
+        if self.cache is not None:
+            self.cache.save()
+        if self.stream is not None:
+            self.stream.close()
 
         return self.report
 
+    def run_checks(self):
+        with self.perf.measure('scan_files'):
+            self.scan_files()
+
+        checks = [
+            ('way_in', self.check_way_in),
+            ('way_out', self.check_way_out),
+            ('mobile', self.check_mobile),
+            ('bobby', self.check_bobby),
+            ('flow', self.check_flow),
+            ('centered', self.check_centered_layout),  # NEW in v4.0
+            ('links', self.check_links),
+        ]
+        for name, check in checks:
+            with self.perf.measure(name):
+                check()
+            self.emit('check', check=name, **self.report['checks'][name])
+
+        with self.perf.measure('omega_inverse'):
+            self.run_omega_inverse()  # NEW in v4.0
+        for name, result in self.report['omega_inverse'].items():
+            self.emit('omega', pattern=name, **result)
+
+        with self.perf.measure('summary'):
+            self.generate_summary()
+        self.emit('summary', **self.report['summary'])
+
+    def print_perf(self):
+        perf = self.report['perf']
+        memory = 'traced peak KB' if self.perf.trace_memory else 'RSS growth KB'
+        print(f"PERF (wall / cpu / files read / engine regex calls / {memory}):")
+        for title, entries in (('checks', perf['checks']), ('per-file checks', perf['file_checks'])):
+            print(f"  {title}:")
+            for name, entry in sorted(entries.items(), key=lambda item: -item[1]['wall_s']):
+                kb = entry.get('traced_peak_kb', 0) if self.perf.trace_memory else entry['rss_growth_kb']
+                print(f"    {name:14} {entry['wall_s']:8.3f}s {entry['cpu_s']:8.3f}s "
+                      f"{entry['files_read']:6} {entry['regex_invocations']:8} {kb:8}")
+        total = perf['total']
+        print(f"  {'total':16} {total['wall_s']:8.3f}s {total['cpu_s']:8.3f}s "
+              f"{total['files_read']:6} {total['regex_invocations']:8}  "
+              f"peak RSS {total['peak_rss_kb'] / 1024:.1f} MB")
+        print(f"  not measured: {', '.join(perf['not_measured'])}\n")
+
+    def emit(self, record_type, **fields):
+        if self.stream is not None:
+            self.stream.emit(record_type, **fields)
+
+    def scan_files(self):
+        """Run every per-file check once per document"""
+        pending = []
+        for doc in self.corpus:
+            findings = self.cached_findings(doc)
+            if findings is None:
+                pending.append(doc)
+            else:
+                self.findings[doc.rel_path] = findings
+                self.emit('file', path=doc.rel_path, findings=findings, cached=True)
+
+        if self.jobs > 1 and len(pending) > 1:
+            print(f"Scanning {len(pending)} files with {self.jobs} worker processes\n")
+            shards = make_shards(self.project_dir, [doc.rel_path for doc in pending], self.jobs * 4)
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                for shard, costs, work in pool.map(
+                        scan_shard, [self.project_dir] * len(shards), shards):
+                    for rel_path, scanned in shard:
+                        self.record_findings(rel_path, scanned)
+                    self.perf.add_file_checks(costs)
+                    self.perf.add_worker('scan_files', work)
+        else:
+            costs = self.perf.check_costs()
+            for doc in pending:
+                self.record_findings(doc.rel_path, scan_document(doc, self.project_dir, costs))
+            self.perf.add_file_checks(costs.entries)
+
+    def record_findings(self, rel_path, scanned):
+        findings = {name: result for name, (result, _) in scanned.items()}
+        self.findings[rel_path] = findings
+        if self.cache is not None:
+            doc = self.corpus.get(rel_path)
+            for name, (result, deps) in scanned.items():
+                self.cache.put(doc, name, result, deps)
+        self.emit('file', path=rel_path, findings=findings)
+
+    def cached_findings(self, doc):
+        """All findings for an unchanged document, or None if any must be recomputed"""
+        if self.cache is None:
+            return None
+        findings = {}
+        for name, _, scope in FILE_CHECKS:
+            if applies_to(scope, doc):
+                if not self.cache.has(doc, name):
+                    return None
+                findings[name] = self.cache.get(doc, name)
+        return findings
+
+    def file_results(self, name, documents):
+        """(doc, finding) for every document that produced one for this check"""
+        for doc in documents:
+            findings = self.findings.get(doc.rel_path, {})
+            if name in findings:
+                yield doc, findings[name]
+
     def check_way_in(self):
         """Check entry points exist and work"""
         print("WAY IN (Entry Points)...")
@@ -151,33 +498,8 @@ class SHIVA:
         issues = []
         passed = []
 
-        html_files = list(self.project_dir.rglob('*.html'))
-        no_nav_back = []
-
-        for html_file in html_files:
-            try:
-                content = html_file.read_text(errors='ignore')
-                parser = LinkExtractor()
-                parser.feed(content)
-
-                rel_path = str(html_file.relative_to(self.project_dir))
-
-                if rel_path == 'index.html':
-                    continue
-
-                has_back = (
-                    parser.has_site_header or
-                    parser.has_home_link or
-                    '← Home' in content or
-                    '← Back' in content or
-                    'href="/"' in content or
-                    'href="../"' in content
-                )
-
-                if not has_back:
-                    no_nav_back.append(rel_path)
-            except:
-                pass
+        no_nav_back = [doc.rel_path for doc, has_back in self.file_results('way_out', self.corpus.html())
+                       if not has_back]
 
         if no_nav_back:
             issues.append(f"{len(no_nav_back)} pages have no navigation back")
@@ -202,11 +524,11 @@ class SHIVA:
         issues = []
         passed = []
 
-        css_file = self.project_dir / 'css' / 'unified-theme.css'
-        if not css_file.exists():
+        css_doc = self.corpus.get(os.path.join('css', 'unified-theme.css'))
+        if css_doc is None:
             issues.append("CRITICAL: No unified-theme.css")
         else:
-            content = css_file.read_text(errors='ignore')
+            content = css_doc.text
 
             clamp_count = content.count('clamp(')
             if clamp_count >= 10:
@@ -227,6 +549,15 @@ class SHIVA:
             else:
                 issues.append("No dvh - mobile browser chrome may cause issues")
 
+        counts = [finding for _, finding in self.file_results('images', self.corpus.html())]
+        images = sum(total for total, _ in counts)
+        responsive = sum(served for _, served in counts)
+        if images and responsive == images:
+            passed.append(f"Responsive images: all {images} <img> have srcset/<picture>")
+        elif images:
+            issues.append(f"{images - responsive} of {images} <img> serve one size to every screen "
+                          "(python3 -m hmh_tools.images)")
+
         self.report['checks']['mobile'] = {
             'status': 'FAIL' if any('CRITICAL' in i for i in issues) else 'WARN' if issues else 'PASS',
             'issues': issues,
@@ -240,25 +571,10 @@ class SHIVA:
         issues = []
         passed = []
 
-        hedge_words = [
-            'approached',
-            'may suggest',
-            'could potentially',
-            'appears to possibly',
-            'claims to',
-        ]
-
         hedge_found = []
-        for html_file in self.project_dir.rglob('*.html'):
-            try:
-                content = html_file.read_text(errors='ignore').lower()
-                rel_path = str(html_file.relative_to(self.project_dir))
-
-                for hedge in hedge_words:
-                    if hedge in content:
-                        hedge_found.append(f"{rel_path}: '{hedge}'")
-            except:
-                pass
+        for doc, hedges in self.file_results('bobby', self.corpus.html()):
+            for hedge in hedges:
+                hedge_found.append(f"{doc.rel_path}: '{hedge}'")
 
         if hedge_found:
             issues.append(f"Standard Model hedges found in {len(hedge_found)} places")
@@ -280,25 +596,14 @@ class SHIVA:
         issues = []
         passed = []
 
-        flow_markers = ['article-list', 'article-link', 'content-flow', 'content-wide']
-        box_markers = ['cards-grid']
-
         flow_pages = 0
         box_pages = 0
 
-        for html_file in self.project_dir.rglob('index.html'):
-            try:
-                content = html_file.read_text(errors='ignore')
-
-                has_flow = any(m in content for m in flow_markers)
-                has_boxes = any(m in content for m in box_markers)
-
-                if has_flow:
-                    flow_pages += 1
-                elif has_boxes:
-                    box_pages += 1
-            except:
-                pass
+        for doc, layout in self.file_results('flow', self.corpus.html()):
+            if layout == 'flow':
+                flow_pages += 1
+            elif layout == 'box':
+                box_pages += 1
 
         if flow_pages > box_pages:
             passed.append(f"Flow layout dominant: {flow_pages} flow, {box_pages} box")
@@ -321,48 +626,35 @@ class SHIVA:
         passed = []
         violations = []
 
-        # Check all HTML files with inline styles
-        for html_file in self.project_dir.rglob('*.html'):
-            try:
-                content = html_file.read_text(errors='ignore')
-                rel_path = str(html_file.relative_to(self.project_dir))
-
-                # Find grid-template-columns without justify-content: center
-                if 'grid-template-columns' in content:
-                    # Check if it's in a style block that also has justify-content: center
-                    # This is a simplified check - looks for the bad pattern
-                    style_blocks = re.findall(r'<style[^>]*>(.*?)</style>', content, re.DOTALL)
-
-                    for style in style_blocks:
-                        # Find class definitions with grid but no flex centering
-                        grid_classes = re.findall(r'(\.[a-zA-Z0-9_-]+)\s*\{[^}]*grid-template-columns[^}]*\}', style)
-
-                        for cls in grid_classes:
-                            # Check if this class uses grid (not flex)
-                            class_match = re.search(rf'{re.escape(cls)}\s*\{{([^}}]*)\}}', style)
-                            if class_match:
-                                class_content = class_match.group(1)
-                                if 'display: grid' in class_content or 'display:grid' in class_content:
-                                    # Check if there's also a flex version
-                                    if 'justify-content: center' not in class_content:
-                                        violations.append(f"{rel_path}: {cls} uses grid without centering")
-
-            except:
-                pass
-
-        # Check CSS files
-        css_file = self.project_dir / 'css' / 'unified-theme.css'
-        if css_file.exists():
-            content = css_file.read_text(errors='ignore')
-
-            # Count centered flex layouts
-            flex_centered = len(re.findall(r'display:\s*flex.*justify-content:\s*center', content, re.DOTALL))
-            grid_layouts = len(re.findall(r'display:\s*grid', content))
-
-            if flex_centered > 0:
-                passed.append(f"Centered flex layouts found: {flex_centered}")
-            if grid_layouts > 0:
-                issues.append(f"CSS Grid layouts found: {grid_layouts} - check if centered")
+        # Every stylesheet, indexed by selector and property
+        sheets = {}
+        all_sheets = StyleIndex()
+        for doc, found in self.file_results('centered', self.corpus.css()):
+            sheets[doc.rel_path] = StyleIndex().add(found['rules'], source=doc.rel_path)
+            all_sheets.add(found['rules'], source=doc.rel_path)
+
+        # Selectors a page styles itself: its linked sheets cascade first
+        for doc, found in self.file_results('centered', self.corpus.html()):
+            page = StyleIndex().add(found['rules'], source=doc.rel_path)
+            linked = [sheets[path] for path in found['sheets'] if path in sheets]
+            for selector in page.selectors():
+                rules = [rule for sheet in linked for rule in sheet.rules_for(selector)]
+                if left_justified(rules + page.rules_for(selector)):
+                    violations.append(f"{doc.rel_path}: {selector} uses grid without centering")
+
+        # Selectors of the stylesheets, reported once per sheet
+        for path, sheet in sheets.items():
+            for selector in sheet.selectors():
+                if left_justified(sheet.rules_for(selector)):
+                    violations.append(f"{path}: {selector} uses grid without centering")
+
+        flex_centered = sum(1 for rule in all_sheets.with_property('display', 'flex')
+                            if is_centered({d.property: d.value for d in rule.declarations}))
+        grid_layouts = len(all_sheets.with_property('display', 'grid'))
+        if flex_centered > 0:
+            passed.append(f"Centered flex layouts found: {flex_centered}")
+        if grid_layouts > 0:
+            issues.append(f"CSS Grid layouts found: {grid_layouts} - check if centered")
 
         if violations:
             issues.append(f"{len(violations)} grid layouts may left-justify")
@@ -390,32 +682,10 @@ class SHIVA:
         broken = []
         checked = 0
 
-        for html_file in self.project_dir.rglob('*.html'):
-            try:
-                content = html_file.read_text(errors='ignore')
-                parser = LinkExtractor()
-                parser.feed(content)
-
-                file_dir = html_file.parent
-
-                for link in parser.links:
-                    if link.startswith(('http', '#', 'mailto:', 'tel:', 'javascript:')):
-                        continue
-
-                    checked += 1
-
-                    if link.startswith('/'):
-                        target = self.project_dir / link.lstrip('/')
-                    else:
-                        target = file_dir / link
-
-                    target = target.resolve()
-                    if not target.exists():
-                        if not (target.parent / 'index.html').exists():
-                            rel_source = str(html_file.relative_to(self.project_dir))
-                            broken.append(f"{rel_source} → {link}")
-            except:
-                pass
+        for doc, result in self.file_results('links', self.corpus.html()):
+            checked += result['checked']
+            for link in result['broken']:
+                broken.append(f"{doc.rel_path} → {link}")
 
         if broken:
             issues.append(f"{len(broken)} broken links found")
@@ -439,25 +709,19 @@ class SHIVA:
         print("\nOMEGA INVERSE-CHECK...")
 
         omega_results = {}
+        files = self.corpus.html() + self.corpus.css()
 
         for name, pattern_info in OMEGA_FAILURE_PATTERNS.items():
-            violations = []
-
-            # Check all HTML and CSS files
-            for file_path in list(self.project_dir.rglob('*.html')) + list(self.project_dir.rglob('*.css')):
-                try:
-                    content = file_path.read_text(errors='ignore')
-                    rel_path = str(file_path.relative_to(self.project_dir))
-
-                    if re.search(pattern_info['pattern'], content, re.IGNORECASE | re.DOTALL):
-                        violations.append(rel_path)
-                except:
-                    pass
+            hits = [{'file': doc.rel_path, 'line': line, 'byte_offset': byte_offset}
+                    for doc, matched in self.file_results('omega', files)
+                    for rule, line, byte_offset in matched if rule == name]
+            violations = [hit['file'] for hit in hits]
 
             omega_results[name] = {
                 'problem': pattern_info['problem'],
                 'fix': pattern_info['fix'],
                 'violations': violations[:10],  # Limit to 10
+                'hits': hits[:10],
                 'count': len(violations)
             }
 
@@ -509,9 +773,21 @@ class SHIVA:
         print("="*60 + "\n")
 
     def save_report(self):
-        output = self.project_dir / f"SHIVA_REPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(output, 'w') as f:
-            json.dump(self.report, f, indent=2)
+        output = self.project_dir / f"{self.report_name}.json"
+        if self.stream is not None:
+            # Full findings are already in the NDJSON stream
+            write_compact_json(output, {
+                'version': self.report['version'],
+                'timestamp': self.report['timestamp'],
+                'stream': self.stream.path.name,
+                'records': self.stream.records,
+                'summary': self.report['summary'],
+                'perf': self.report['perf'],
+            })
+            print(f"Findings streamed: {self.stream.path}")
+        else:
+            with open(output, 'w') as f:
+                json.dump(self.report, f, indent=2)
         print(f"Report saved: {output}")
 
 
@@ -519,9 +795,20 @@ def main():
     import argparse
     parser = argparse.ArgumentParser(description='SHIVA v4.0 + OMEGA')
     parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Reuse findings for unchanged files from .hmh_cache/')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Worker processes for the per-file checks (default: 1)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Write findings as NDJSON while running; final report is a compact summary')
+    parser.add_argument('--profile', action='store_true',
+                        help='Write a cProfile capture (.prof, .prof.txt) next to the report')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Track allocations with tracemalloc; per-check peaks plus a snapshot file')
     args = parser.parse_args()
 
-    shiva = SHIVA(args.project_dir)
+    shiva = SHIVA(args.project_dir, incremental=args.incremental, jobs=args.jobs, stream=args.stream,
+                  profile=args.profile, trace_memory=args.trace_memory)
     shiva.run()
     shiva.save_report()
 
@@ -0,0 +1,13 @@
+"""
+HMH Tools - shared building blocks for the SHIVA / OMEGA / ALPHA scripts
+Have Mind Media Site Verification System
+[1 = -1]
+
+The audit scripts at the repo root and in scripts/ import from here so the
+site tree is walked once and every page is read once per run.
+"""
+
+from .corpus import Corpus, Document
+from .parse import Link, Page, parse_page
+
+__all__ = ['Corpus', 'Document', 'Link', 'Page', 'parse_page']
@@ -0,0 +1,75 @@
+"""
+HMH Tools - Atomic File Writes
+
+Every file the tools write (caches, manifests, generated pages and
+assets) goes through atomic_write(): the data is written to a fsynced
+temp file in the target's directory and renamed over the target, so a
+reader, a concurrent run or a crash sees the old file or the new one,
+never half of it.
+
+transaction.py builds its multi-file batches on the same primitives.
+
+Usage:
+    atomic_write(root / 'sitemap.xml', text)
+    atomic_write(cache_path, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+TEMP_PREFIX = '.hmh-stage-'
+
+# Permission bits of a new file, as open() would create it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def write_synced(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def temp_file(target, data):
+    """Fsynced temp file next to target holding data, with target's mode
+    (or a new file's, if target does not exist yet)."""
+    fd, temp = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=Path(target).parent)
+    os.close(fd)
+    try:
+        write_synced(temp, data)
+        try:
+            shutil.copymode(target, temp)
+        except FileNotFoundError:
+            os.chmod(temp, 0o666 & ~_UMASK)
+    except BaseException:
+        os.unlink(temp)
+        raise
+    return temp
+
+
+def atomic_write(path, data):
+    """Replace path with data (bytes, or str written as UTF-8) in one rename."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    temp = temp_file(path, data)
+    try:
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
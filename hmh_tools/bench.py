@@ -0,0 +1,426 @@
+"""
+HMH Tools - Benchmark Harness
+
+Generates synthetic site trees and times the audit toolchain on them, so
+a change to SHIVA, the triaxial audit or link_checker.py can be measured
+instead of guessed at.
+
+A synthetic site has the shape of the real one: nested section
+directories with an index.html each, pages with a shared stylesheet, an
+inline <style> block, navigation back home, internal links (a share of
+them broken or with #fragments), external links, images, a sitemap. Size,
+link density, inline style size and nesting depth are parameters; the
+same seed always produces the same tree.
+
+For every site the harness records
+  - each entry point run as its own process: wall time and peak RSS
+  - each check of each tool run in-process: wall time and peak RSS after it
+and writes everything to BENCH_REPORT_<timestamp>.json. Two reports can
+be compared with --compare.
+
+Usage:
+    python3 -m hmh_tools.bench --pages 1000 10000 100000
+    python3 -m hmh_tools.bench --pages 1000 --links 40 --style-kb 8 --depth 4
+    python3 -m hmh_tools.bench --pages 1000 --incremental
+    python3 -m hmh_tools.bench --compare BENCH_REPORT_old.json BENCH_REPORT_new.json
+"""
+
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHIVA_SCRIPT = REPO_ROOT / 'SHIVA_v4.0_01-12-2026.py'
+TRIAXIAL_SCRIPT = REPO_ROOT / 'scripts' / 'triaxial-audit.py'
+LINK_CHECKER_SCRIPT = REPO_ROOT / 'link_checker.py'
+
+# Entry points as separate processes; {site} is the synthetic tree
+ENTRY_POINTS = {
+    'shiva': [str(SHIVA_SCRIPT), '{site}'],
+    'triaxial': [str(TRIAXIAL_SCRIPT), '--root', '{site}'],
+    'link_checker': [str(LINK_CHECKER_SCRIPT), '{site}'],
+}
+INCREMENTAL_ENTRY_POINTS = {
+    'shiva --incremental': [str(SHIVA_SCRIPT), '{site}', '--incremental'],
+    'triaxial --incremental': [str(TRIAXIAL_SCRIPT), '--root', '{site}', '--incremental'],
+    'link_checker --incremental': [str(LINK_CHECKER_SCRIPT), '{site}', '--incremental'],
+}
+
+# Top-level sections SHIVA's WAY IN check looks for come first
+SECTION_NAMES = ['physics', 'biology', 'tools', 'games', 'weirdos',
+                 'documents', 'education', 'apps', 'ancient-mysteries']
+PAGES_PER_DIR = 50
+IMAGE_COUNT = 20
+WORDS = ('geometry kappa field wave lattice signal pattern resonance frame '
+         'spiral theorem proof model orbit cycle symmetry ratio vector').split()
+HEDGES = ['may suggest', 'claims to', 'could potentially']
+
+# A 1x1 transparent PNG
+PIXEL_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082')
+
+
+# -- synthetic sites --
+
+def _section_dirs(depth, fanout):
+    dirs = ['']
+    level = ['']
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fanout):
+                name = SECTION_NAMES[i] if not parent and i < len(SECTION_NAMES) else f"section-{i}"
+                next_level.append(os.path.join(parent, name))
+        dirs.extend(next_level)
+        level = next_level
+    return dirs
+
+
+def _style_block(rng, size):
+    rules = []
+    total = 0
+    n = 0
+    while total < size:
+        kind = rng.random()
+        if kind < 0.3:
+            body = 'display: grid; grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); gap: 1rem;'
+        elif kind < 0.6:
+            body = 'display: flex; flex-wrap: wrap; justify-content: center; gap: 1rem;'
+        elif kind < 0.75:
+            body = 'display: flex; align-items: center;'
+        else:
+            body = 'font-size: clamp(1rem, 2.5vw, 1.4rem); padding: 0 4vw; max-width: 60rem;'
+        rule = f".c{n} {{ {body} }}\n"
+        rules.append(rule)
+        total += len(rule)
+        n += 1
+    return ''.join(rules)
+
+
+def _paragraph(rng, links):
+    words = [rng.choice(WORDS) for _ in range(40)]
+    if rng.random() < 0.05:
+        words.insert(rng.randrange(len(words)), rng.choice(HEDGES))
+    for link in links:
+        words.insert(rng.randrange(len(words)), link)
+    return '<p>' + ' '.join(words) + '</p>\n'
+
+
+def generate_site(root, pages=1000, links=20, style_kb=2.0, depth=3,
+                  broken_ratio=0.02, fragment_ratio=0.1, external_ratio=0.1, seed=1729):
+    """Write a synthetic site with `pages` HTML pages under root.
+
+    Returns the parameters used (for the report).
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    fanout = max(2, math.ceil((pages / PAGES_PER_DIR) ** (1 / max(depth, 1))))
+    dirs = _section_dirs(depth, fanout)
+    dirs = dirs[:max(1, min(len(dirs), math.ceil(pages / 2)))]
+
+    # Every directory gets an index.html, the rest is spread round-robin
+    paths = [os.path.join(d, 'index.html') for d in dirs]
+    for i in range(pages - len(paths)):
+        paths.append(os.path.join(dirs[i % len(dirs)], f"page-{i}.html"))
+    paths = paths[:pages]
+
+    for d in dirs:
+        (root / d).mkdir(parents=True, exist_ok=True)
+    (root / 'css').mkdir(parents=True, exist_ok=True)
+    (root / 'images').mkdir(parents=True, exist_ok=True)
+    for i in range(IMAGE_COUNT):
+        (root / 'images' / f"img-{i}.png").write_bytes(PIXEL_PNG)
+    (root / 'css' / 'site.css').write_text(
+        _style_block(rng, 4096) + "body { background: url('../images/img-0.png'); }\n")
+    (root / 'sitemap.xml').write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n<urlset>\n'
+        + ''.join(f"  <url><loc>https://example.org/{p}</loc></url>\n" for p in paths[::3])
+        + '</urlset>\n')
+
+    style_size = int(style_kb * 1024)
+    for rel_path in paths:
+        here = os.path.dirname(rel_path) or '.'
+
+        def rel(target):
+            return os.path.relpath(target, here)
+
+        hrefs = []
+        for _ in range(links):
+            roll = rng.random()
+            if roll < broken_ratio:
+                hrefs.append(rel(f"missing/page-{rng.randrange(10**6)}.html"))
+            elif roll < broken_ratio + external_ratio:
+                hrefs.append(f"https://example.org/ref/{rng.randrange(1000)}")
+            else:
+                href = rel(rng.choice(paths))
+                if rng.random() < fragment_ratio:
+                    href += f"#s{rng.randrange(4)}"
+                hrefs.append(href)
+        anchors = [f'<a href="{h}">{rng.choice(WORDS)}</a>' for h in hrefs]
+
+        body = []
+        for s in range(3):
+            chunk = anchors[s::3]
+            body.append(f'<h2 id="s{s}">{rng.choice(WORDS).title()}</h2>\n')
+            body.append(_paragraph(rng, chunk))
+        body.append(f'<img src="{rel(f"images/img-{rng.randrange(IMAGE_COUNT)}.png")}" alt="">\n')
+
+        html = (
+            '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+            f'<title>{rel_path}</title>\n'
+            f'<link rel="stylesheet" href="{rel("css/site.css")}">\n'
+            f'<style>\n{_style_block(rng, style_size)}</style>\n'
+            '</head>\n<body>\n<site-header></site-header>\n'
+            f'<nav><a href="{rel("index.html")}">Home</a> <a href="../">Back</a></nav>\n'
+            '<main class="content-flow">\n' + ''.join(body) + '</main>\n'
+            '<site-footer></site-footer>\n</body>\n</html>\n'
+        )
+        (root / rel_path).write_text(html)
+
+    return {'pages': len(paths), 'dirs': len(dirs), 'links': links, 'style_kb': style_kb,
+            'depth': depth, 'broken_ratio': broken_ratio, 'seed': seed}
+
+
+# -- measurement --
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@contextlib.contextmanager
+def timed(results, name):
+    """Record wall time and peak RSS (so far) of the block under results[name]."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = results.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        entry['seconds'] = round(entry['seconds'] + time.perf_counter() - started, 4)
+        entry['calls'] += 1
+        entry['peak_rss_kb'] = peak_rss_kb()
+
+
+def wrap(results, name, func):
+    def timed_call(*args, **kwargs):
+        with timed(results, name):
+            return func(*args, **kwargs)
+    return timed_call
+
+
+def run_entry_point(argv, site):
+    """Wall time, peak RSS and exit status of one tool run in its own process."""
+    cmd = [sys.executable] + [a.format(site=site) for a in argv]
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=site, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        'seconds': round(time.perf_counter() - started, 4),
+        'peak_rss_kb': usage.ru_maxrss,
+        'exit': proc.returncode,
+    }
+
+
+def load_script(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_shiva(site):
+    """Per-check timings of SHIVA v4, including every per-file scan function."""
+    results = {}
+    shiva = load_script(SHIVA_SCRIPT, 'bench_shiva')
+    shiva.FILE_CHECKS[:] = [(name, wrap(results, f"file:{name}", scan), scope)
+                            for name, scan, scope in shiva.FILE_CHECKS]
+    with timed(results, 'corpus'):
+        audit = shiva.SHIVA(site)
+    for name in dir(audit):
+        if name.startswith('check_') or name in ('scan_files', 'run_omega_inverse'):
+            setattr(audit, name, wrap(results, name, getattr(audit, name)))
+    with timed(results, 'total'):
+        audit.run()
+    return results
+
+
+def bench_triaxial(site):
+    results = {}
+    triaxial = load_script(TRIAXIAL_SCRIPT, 'bench_triaxial')
+    triaxial.SITE_ROOT = Path(site)
+    cwd = os.getcwd()
+    os.chdir(site)
+    try:
+        with timed(results, 'corpus'):
+            triaxial.site_corpus()
+        for name in ('run_shiva', 'run_omega', 'run_alpha'):
+            with timed(results, name):
+                getattr(triaxial, name)()
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def bench_link_checker(site):
+    results = {}
+    link_checker = load_script(LINK_CHECKER_SCRIPT, 'bench_link_checker')
+    link_checker.check_page = wrap(results, 'check_page', link_checker.check_page)
+    link_checker.check_fragments = wrap(results, 'check_fragments', link_checker.check_fragments)
+    with timed(results, 'scan_website'):
+        link_checker.scan_website(str(site))
+    return results
+
+
+CHECK_BENCHES = {
+    'shiva': bench_shiva,
+    'triaxial': bench_triaxial,
+    'link_checker': bench_link_checker,
+}
+
+
+def bench_site(site, incremental=False):
+    entry_points = {name: run_entry_point(argv, site) for name, argv in ENTRY_POINTS.items()}
+    if incremental:
+        for name, argv in INCREMENTAL_ENTRY_POINTS.items():
+            run_entry_point(argv, site)      # cold run fills .hmh_cache/
+            entry_points[name + ' (warm)'] = run_entry_point(argv, site)
+
+    checks = {}
+    for name, bench in CHECK_BENCHES.items():
+        # Each tool gets a fresh process so peak RSS is its own
+        checks[name] = _in_child(bench, site)
+    return {'entry_points': entry_points, 'checks': checks}
+
+
+def _in_child(bench, site):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                data = {'result': bench(site)}
+        except Exception as e:
+            data = {'error': f"{type(e).__name__}: {e}"}
+        with os.fdopen(write_fd, 'w') as f:
+            json.dump(data, f)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        data = json.loads(f.read() or '{"error": "no result"}')
+    os.waitpid(pid, 0)
+    return data.get('result', data)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -- comparison --
+
+def _flatten(report):
+    metrics = {}
+    for site in report['sites']:
+        label = f"{site['params']['pages']}p"
+        for name, run in site['entry_points'].items():
+            metrics[f"{label} {name}"] = (run['seconds'], run['peak_rss_kb'])
+        for tool, checks in site['checks'].items():
+            for name, run in checks.items():
+                if isinstance(run, dict):
+                    metrics[f"{label} {tool}.{name}"] = (run['seconds'], run.get('peak_rss_kb'))
+    return metrics
+
+
+def compare(old_path, new_path):
+    old = _flatten(json.loads(Path(old_path).read_text()))
+    new = _flatten(json.loads(Path(new_path).read_text()))
+    print(f"{'metric':<52} {'old s':>9} {'new s':>9} {'ratio':>7} {'old MB':>8} {'new MB':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        (t0, m0), (t1, m1) = old[key], new[key]
+        ratio = f"{t1 / t0:.2f}x" if t0 else '-'
+        mb0 = f"{m0 / 1024:.0f}" if m0 else '-'
+        mb1 = f"{m1 / 1024:.0f}" if m1 else '-'
+        print(f"{key:<52} {t0:>9.3f} {t1:>9.3f} {ratio:>7} {mb0:>8} {mb1:>8}")
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{key:<52} only in {'old' if key in old else 'new'}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the HMH audit tools on synthetic sites')
+    parser.add_argument('--pages', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--links', type=int, default=20, help='Links per page')
+    parser.add_argument('--style-kb', type=float, default=2.0, help='Inline <style> size per page')
+    parser.add_argument('--depth', type=int, default=3, help='Section nesting depth')
+    parser.add_argument('--broken-ratio', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=1729)
+    parser.add_argument('--incremental', action='store_true',
+                        help='Also time warm --incremental runs of every entry point')
+    parser.add_argument('--workdir', help='Where to generate sites (default: a temp dir)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated sites')
+    parser.add_argument('--output', help='Report path (default: BENCH_REPORT_<timestamp>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two reports')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='hmh-bench-'))
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'sites': [],
+    }
+    try:
+        for pages in args.pages:
+            site = workdir / f"site-{pages}"
+            if site.exists():
+                shutil.rmtree(site)
+            started = time.perf_counter()
+            params = generate_site(site, pages, args.links, args.style_kb, args.depth,
+                                   args.broken_ratio, seed=args.seed)
+            generated = time.perf_counter() - started
+            print(f"Generated {pages} pages in {generated:.1f}s, benchmarking...", flush=True)
+
+            result = bench_site(site, args.incremental)
+            report['sites'].append({'params': params, 'generate_seconds': round(generated, 3), **result})
+            for name, run in result['entry_points'].items():
+                print(f"  {name:<32} {run['seconds']:>9.3f}s {run['peak_rss_kb'] / 1024:>8.1f} MB")
+            if not args.keep:
+                shutil.rmtree(site)
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or f"BENCH_REPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
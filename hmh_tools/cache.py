@@ -0,0 +1,181 @@
+"""
+HMH Tools - Incremental Audit Cache
+
+Persistent cache that lets an audit skip every file that has not changed
+since the last run. Files are keyed by relative path and fingerprinted by
+(mtime, size, sha1):
+
+  - same mtime and size      -> unchanged, nothing is read
+  - different mtime or size  -> read and hashed; same hash is unchanged
+  - different hash           -> every cached result for the file is dropped
+
+Per-file results are stored together with the paths they depend on (for
+example the link targets a page points at). When files are added or
+removed, results that depended on those paths are dropped too, so link
+dependents of a new or deleted page get re-checked.
+
+Parsed Pages are stored by content hash under .hmh_cache/pages/ and shared
+between every tool. The per-tool index is .hmh_cache/<namespace>.pickle
+and is discarded whenever the auditing script or any hmh_tools module
+changes (salt).
+
+Usage:
+    cache = AuditCache(root, 'shiva-4.0', salt=script_bytes)
+    corpus = Corpus(root, cache=cache)
+    result = cache.get(doc, 'links')
+    ...
+    cache.put(doc, 'links', result, deps=[...])
+    cache.save()
+"""
+
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+from .atomic import atomic_write
+
+CACHE_DIR = '.hmh_cache'
+CACHE_FORMAT = 1
+
+_PARSER_SOURCE = Path(__file__).with_name('parse.py')
+PARSER_SIGNATURE = hashlib.sha1(_PARSER_SOURCE.read_bytes()).hexdigest()[:12]
+
+# Cached findings are only as good as the shared code that produced them
+_TOOLS_SOURCES = sorted(Path(__file__).parent.glob('*.py'))
+TOOLS_SIGNATURE = hashlib.sha1(b''.join(p.read_bytes() for p in _TOOLS_SOURCES)).hexdigest()[:12]
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class AuditCache:
+    """On-disk per-file result cache for one audit tool."""
+
+    def __init__(self, root, namespace, salt=b''):
+        self.root = Path(root)
+        self.dir = self.root / CACHE_DIR
+        self.path = self.dir / f"{namespace}.pickle"
+        self.pages_dir = self.dir / 'pages' / PARSER_SIGNATURE
+        salt = salt if isinstance(salt, bytes) else str(salt).encode()
+        self.salt = content_hash(salt + TOOLS_SIGNATURE.encode())
+        self.entries = {}
+        self.files = set()
+        self.stats = {'unchanged': 0, 'changed': 0, 'new': 0, 'removed': 0, 'invalidated': 0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return
+        if data.get('format') != CACHE_FORMAT or data.get('salt') != self.salt:
+            return
+        self.entries = data['entries']
+        self.files = data['files']
+
+    def save(self):
+        self.dir.mkdir(exist_ok=True)
+        atomic_write(self.path, pickle.dumps({
+            'format': CACHE_FORMAT,
+            'salt': self.salt,
+            'entries': self.entries,
+            'files': self.files,
+        }, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def sync(self, corpus):
+        """Fingerprint every document and drop stale results.
+
+        Called by Corpus after its walk. Unchanged documents get their
+        digest from the cache so they are never read.
+        """
+        current = {}
+        for doc in corpus:
+            try:
+                st = os.stat(doc.path)
+            except OSError:
+                continue
+            stamp = (st.st_mtime_ns, st.st_size)
+            entry = self.entries.get(doc.rel_path)
+
+            if entry and entry['stamp'] == stamp:
+                doc._digest = entry['sha1']
+                self.stats['unchanged'] += 1
+            else:
+                try:
+                    digest = doc.digest
+                except OSError:
+                    continue
+                if entry and entry['sha1'] == digest:
+                    entry['stamp'] = stamp
+                    self.stats['unchanged'] += 1
+                else:
+                    self.stats['changed' if entry else 'new'] += 1
+                    entry = {'stamp': stamp, 'sha1': digest, 'results': {}}
+            current[doc.rel_path] = entry
+
+        self.stats['removed'] = len(set(self.entries) - set(current))
+        self.entries = current
+
+        files = set(corpus.files)
+        if self.files:
+            self._invalidate_dependents(files ^ self.files)
+        self.files = files
+
+    def _invalidate_dependents(self, changed_paths):
+        """Drop results whose dependencies were added or removed."""
+        if not changed_paths:
+            return
+        touched = set()
+        for rel_path in changed_paths:
+            while rel_path:
+                touched.add(rel_path)
+                rel_path = os.path.dirname(rel_path)
+
+        for entry in self.entries.values():
+            stale = [key for key, (_, deps) in entry['results'].items()
+                     if deps and not touched.isdisjoint(deps)]
+            for key in stale:
+                del entry['results'][key]
+                self.stats['invalidated'] += 1
+
+    def get(self, doc, key, default=None):
+        entry = self.entries.get(doc.rel_path)
+        if entry is None or key not in entry['results']:
+            return default
+        return entry['results'][key][0]
+
+    def has(self, doc, key):
+        entry = self.entries.get(doc.rel_path)
+        return entry is not None and key in entry['results']
+
+    def put(self, doc, key, result, deps=()):
+        entry = self.entries.get(doc.rel_path)
+        if entry is not None:
+            entry['results'][key] = (result, frozenset(deps))
+
+    def discard(self, doc, prefix):
+        """Drop a file's results whose key starts with prefix."""
+        entry = self.entries.get(doc.rel_path)
+        if entry is not None:
+            for key in [k for k in entry['results'] if k.startswith(prefix)]:
+                del entry['results'][key]
+
+    def load_page(self, digest):
+        try:
+            with open(self.pages_dir / f"{digest}.pickle", 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return None
+
+    def store_page(self, digest, page):
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.pages_dir / f"{digest}.pickle",
+                     pickle.dumps(page, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def summary(self):
+        s = self.stats
+        return (f"{s['unchanged']} unchanged, {s['changed']} changed, {s['new']} new, "
+                f"{s['removed']} removed, {s['invalidated']} dependent results invalidated")
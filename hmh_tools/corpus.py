@@ -0,0 +1,244 @@
+"""
+HMH Tools - Site Corpus
+
+Walks the project directory once and hands out one Document per HTML/CSS
+file. A Document reads its file the first time its text is asked for and
+keeps it, along with its parsed Page, so checks that used to call rglob()
+and read_text() on their own now share the same in-memory copy.
+
+With an AuditCache attached (see cache.py), unchanged documents are never
+read: their digest comes from the cache and their Page is unpickled from
+the content-addressed page store.
+
+make_shards() splits a list of files into size-balanced shards for the
+scripts' --jobs worker pools.
+
+Usage:
+    corpus = Corpus('.')
+    for doc in corpus.html():
+        print(doc.rel_path, len(doc.text))
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+from .parse import parse_page
+
+EXCLUDE_DIRS = {'.git', 'node_modules', '__pycache__', '.hmh_cache', '_build'}
+
+DOCUMENT_KINDS = {
+    '.html': 'html',
+    '.css': 'css',
+}
+
+
+def make_shards(root, items, count, key=None):
+    """Split items into at most count shards of roughly equal total file size.
+
+    items are paths relative to root, or anything key(item) maps to one;
+    the shards hold the items themselves. Largest first, each into the
+    lightest shard so far, so one big page does not keep a worker busy
+    after the others are done.
+    """
+    def size(item):
+        try:
+            return os.path.getsize(os.path.join(root, key(item) if key else item))
+        except OSError:
+            return 0
+
+    shards = [[] for _ in range(count)]
+    totals = [0] * count
+    for weight, item in sorted(((size(item), item) for item in items),
+                               key=lambda sized: sized[0], reverse=True):
+        i = totals.index(min(totals))
+        shards[i].append(item)
+        totals[i] += weight
+    return [shard for shard in shards if shard]
+
+
+class Document:
+    """One HTML or CSS file of the site, read at most once."""
+
+    def __init__(self, corpus, rel_path, kind):
+        self.corpus = corpus
+        self.rel_path = rel_path
+        self.kind = kind
+        self.name = os.path.basename(rel_path)
+        self._text = None
+        self._digest = None
+        self._lower = None
+        self._page = None
+
+    def __repr__(self):
+        return f"Document({self.rel_path!r})"
+
+    @property
+    def path(self):
+        return self.corpus.root / self.rel_path
+
+    @property
+    def text(self):
+        if self._text is None:
+            self.corpus.load(self)
+        return self._text
+
+    @property
+    def digest(self):
+        """sha1 of the file bytes"""
+        if self._digest is None:
+            self.corpus.load(self)
+        return self._digest
+
+    @property
+    def lower(self):
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    @property
+    def page(self):
+        """Single tokenization of an HTML document (see parse.py)."""
+        if self._page is None:
+            cache = self.corpus.cache
+            if cache is not None:
+                self._page = cache.load_page(self.digest)
+            if self._page is None:
+                self._page = parse_page(self.text)
+                self.corpus.pages_parsed += 1
+                if cache is not None:
+                    cache.store_page(self.digest, self._page)
+        return self._page
+
+
+class Corpus:
+    """Every file under root, walked once, with HTML/CSS documents on top."""
+
+    def __init__(self, root, exclude_dirs=EXCLUDE_DIRS, cache=None, files=None):
+        """Walk root, or take an explicit list of relative paths (files=)
+        when a worker process only needs its own shard."""
+        self.root = Path(root)
+        self.exclude_dirs = set(exclude_dirs)
+        self.cache = cache
+        self.files = []
+        self.documents = {}
+        self.files_read = 0
+        self.bytes_read = 0
+        self.pages_parsed = 0
+        self._link_graph = None
+        self._resolver = None
+        self.complete = files is None
+        if files is None:
+            self._walk()
+        else:
+            for rel_path in files:
+                self._add(rel_path)
+        if cache is not None:
+            cache.sync(self)
+
+    def _walk(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if d not in self.exclude_dirs)
+            rel_dir = os.path.relpath(dirpath, self.root)
+
+            for name in sorted(filenames):
+                self._add(name if rel_dir == '.' else os.path.join(rel_dir, name))
+
+    def _add(self, rel_path):
+        self.files.append(rel_path)
+        kind = DOCUMENT_KINDS.get(os.path.splitext(rel_path)[1])
+        if kind:
+            self.documents[rel_path] = Document(self, rel_path, kind)
+
+    def load(self, doc):
+        """Read a document as text the way the SHIVA scripts always have."""
+        data = doc.path.read_bytes()
+        self.files_read += 1
+        self.bytes_read += len(data)
+        doc._digest = hashlib.sha1(data).hexdigest()
+        doc._text = data.decode('utf-8', errors='ignore')
+
+    def get(self, rel_path):
+        return self.documents.get(rel_path)
+
+    def anchors(self, rel_path):
+        """Fragment targets of an HTML document, or None if it is not one.
+
+        A directory path means its index.html.
+        """
+        doc = self.documents.get(rel_path) or self.documents.get(os.path.join(rel_path, 'index.html'))
+        if doc is None or doc.kind != 'html':
+            return None
+        return doc.page.anchors
+
+    def apply_changes(self, rel_paths):
+        """Bring a long-lived corpus up to date with files that changed on disk.
+
+        Each path is classified by looking at the disk: changed documents
+        get a fresh Document (re-read and re-parsed on first use), added
+        and removed files update the file list, resolver and link graph.
+        Returns (changed, added, removed) sets of relative paths.
+        """
+        changed, added, removed = set(), set(), set()
+        known = set(self.files)
+        for rel_path in rel_paths:
+            present = os.path.isfile(self.root / rel_path)
+            if present and rel_path in known:
+                if rel_path in self.documents:
+                    doc = self.documents[rel_path]
+                    self.documents[rel_path] = Document(self, rel_path, doc.kind)
+                    changed.add(rel_path)
+            elif present:
+                added.add(rel_path)
+            elif rel_path in known:
+                removed.add(rel_path)
+
+        for rel_path in removed:
+            self.files.remove(rel_path)
+            self.documents.pop(rel_path, None)
+        for rel_path in sorted(added):
+            self._add(rel_path)
+        if added or removed:
+            self._resolver = None
+
+        graph = self._link_graph
+        if graph is not None:
+            if added or removed:
+                # Directory references may now map to a different node
+                self._link_graph = None
+            else:
+                for rel_path in changed:
+                    graph.remove_source(rel_path)
+                    graph.add_document(self.documents[rel_path])
+        return changed, added, removed
+
+    def resolver(self):
+        """PathResolver over every file of the site, built once.
+
+        A worker corpus that only holds its own shard walks the tree here
+        so existence checks still see the whole site.
+        """
+        if self._resolver is None:
+            from .resolver import PathResolver
+            files = self.files if self.complete else Corpus(self.root, self.exclude_dirs).files
+            self._resolver = PathResolver(self.root, files)
+        return self._resolver
+
+    def link_graph(self):
+        """LinkGraph of every reference in the corpus, built once."""
+        if self._link_graph is None:
+            from .linkgraph import LinkGraph
+            self._link_graph = LinkGraph.build(self)
+        return self._link_graph
+
+    def html(self):
+        return [d for d in self.documents.values() if d.kind == 'html']
+
+    def css(self):
+        return [d for d in self.documents.values() if d.kind == 'css']
+
+    def __iter__(self):
+        return iter(self.documents.values())
+
+    def __len__(self):
+        return len(self.documents)
@@ -0,0 +1,381 @@
+"""
+HMH Tools - Critical CSS
+
+Offline analyzer for the stylesheets every page loads (css/unified-theme.css
+by default): each page's element tree (hmh_tools.dom) is matched against
+the sheet's rules, and the page gets
+
+  critical    the rules that style what is on screen before the first
+              scroll - elements starting within ABOVE_FOLD_BYTES of <body>,
+              without :hover/:focus states - plus @import, @font-face and
+              the @keyframes those rules animate with; to inline in <head>
+  deferred    every rule the page uses, in the sheet's order, to load
+              without blocking render. It repeats the critical rules so
+              the cascade ends exactly as with the whole sheet. Written
+              once per distinct rule set as critical-css/<hash>.css, so
+              pages using the same rules share one cached file.
+
+Rules no element matches are dropped. Class names, ids, tags and attributes
+that appear in the page's scripts (inline, on* attributes and linked
+local .js files) may be added at run time, so conditions on them count
+as matched for the deferred sheet; selectors the matcher cannot read are
+always kept.
+
+critical-css/manifest.json maps every page to its critical CSS and
+deferred file for each analyzed sheet it links; --show PAGE prints the <head> markup for one page. Pages
+are matched in a process pool (--jobs N), and results are cached in
+.hmh_cache/critical.pickle keyed on the page hash, the stylesheet hash
+and the hash of the scripts it loads.
+
+Usage:
+    python3 -m hmh_tools.critical [project_directory]
+    python3 -m hmh_tools.critical [project_directory] --jobs 8
+    python3 -m hmh_tools.critical [project_directory] --sheet css/geometry-math.css
+    python3 -m hmh_tools.critical [project_directory] --show about.html
+"""
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from .cache import AuditCache
+from .atomic import atomic_write
+from .corpus import Corpus, make_shards
+from .css import parse_declarations, statement_spans
+from .dom import build_dom, parse_selectors
+from .linkgraph import resolve_href
+from .minify import minify_css
+
+OUTPUT_DIR = 'critical-css'
+MANIFEST = 'manifest.json'
+MANIFEST_FORMAT = 1
+SHEETS = ('css/unified-theme.css',)
+
+ABOVE_FOLD_BYTES = 8 * 1024     # of markup after <body>: roughly the first screen
+
+GROUPING_AT_RULES = {'media', 'supports', 'layer', 'container'}
+
+# kind: 'style', 'import', 'font-face', 'keyframes' or 'other'; groups: the
+# enclosing @media/@supports preludes, outermost first; selectors: parsed
+# list (None: not understood); names: @keyframes a style rule animates
+# with, or the name of a @keyframes
+SheetItem = namedtuple('SheetItem', 'kind css groups selectors names')
+
+_SCRIPT = re.compile(r'<script\b[^>]*>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+_NAME = re.compile(r'[A-Za-z_][\w-]*')
+_KEYFRAMES_NAME = re.compile(r'@(?:-\w+-)?keyframes\s+([\w-]+)', re.IGNORECASE)
+
+
+def _minified(css):
+    return ''.join(text for _, text in minify_css(css))
+
+
+def _animation_names(body):
+    names = set()
+    for declaration in parse_declarations(body, {'animation', 'animation-name'}):
+        names.update(_NAME.findall(declaration.value))
+    return names
+
+
+def parse_sheet(text):
+    """SheetItem of every rule and at-rule of a stylesheet, in order."""
+    items = []
+
+    def walk(start, end, groups):
+        for s, e in statement_spans(text, start, end):
+            statement = text[s:e]
+            brace = statement.find('{')
+            if statement.startswith('@'):
+                name = re.match(r'@([\w-]*)', statement).group(1).lower()
+                if name in GROUPING_AT_RULES and brace > 0:
+                    walk(s + brace + 1, e - 1, groups + (_minified(statement[:brace]),))
+                elif name == 'import':
+                    items.append(SheetItem('import', _minified(statement), groups, None, frozenset()))
+                elif name == 'font-face':
+                    items.append(SheetItem('font-face', _minified(statement), groups, None, frozenset()))
+                elif name.endswith('keyframes'):
+                    m = _KEYFRAMES_NAME.match(statement)
+                    items.append(SheetItem('keyframes', _minified(statement), groups, None,
+                                           frozenset([m.group(1)] if m else ())))
+                elif name != 'charset':
+                    items.append(SheetItem('other', _minified(statement), groups, None, frozenset()))
+            elif brace > 0:
+                items.append(SheetItem('style', _minified(statement), groups,
+                                       parse_selectors(statement[:brace].strip()),
+                                       frozenset(_animation_names(statement[brace + 1:-1]))))
+
+    walk(0, len(text), ())
+    return items
+
+
+def render(items, chosen):
+    """CSS of the chosen item indices, in order, inside their @media blocks."""
+    parts = []
+    open_groups = ()
+    for i, item in enumerate(items):
+        if i not in chosen:
+            continue
+        common = 0
+        while common < min(len(open_groups), len(item.groups)) \
+                and open_groups[common] == item.groups[common]:
+            common += 1
+        parts.append('}' * (len(open_groups) - common))
+        parts.extend(f"{group}{{" for group in item.groups[common:])
+        parts.append(item.css)
+        open_groups = item.groups
+    parts.append('}' * len(open_groups))
+    return ''.join(parts)
+
+
+def split_sheet(items, used, critical):
+    """(critical CSS, deferred CSS) from a page's used and critical style rules."""
+    def with_keyframes(rules):
+        names = set().union(*(items[i].names for i in rules))
+        return set(rules) | {i for i, item in enumerate(items)
+                             if item.kind == 'keyframes' and item.names & names}
+    inline = with_keyframes(critical) | {i for i, item in enumerate(items)
+                                         if item.kind in ('import', 'font-face')}
+    deferred = with_keyframes(used) | {i for i, item in enumerate(items)
+                                       if item.kind in ('font-face', 'other')}
+    return render(items, inline), render(items, deferred)
+
+
+# -- worker --
+
+_script_names = {}      # path -> (mtime_ns, names), per worker process
+
+
+def _file_names(path):
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return set()
+    cached = _script_names.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, set(_NAME.findall(path.read_text(encoding='utf-8', errors='replace'))))
+        _script_names[path] = cached
+    return cached[1]
+
+
+def runtime_names(root, rel_path, text, dom):
+    """Words a script of the page could add as a class, id, tag or attribute."""
+    names = set()
+    for script in _SCRIPT.findall(text):
+        names.update(_NAME.findall(script))
+    for element in dom.elements:
+        for attr, value in element.attrs.items():
+            if attr.startswith('on'):
+                names.update(_NAME.findall(value))
+        if element.tag == 'script' and element.attrs.get('src'):
+            target = resolve_href(rel_path, element.attrs['src'])
+            if target is not None:
+                names |= _file_names(Path(root) / target)
+    return names
+
+
+def analyze_page(root, rel_path, text, page, items):
+    """Worker: (used, critical) style rule indices of one page (its text
+    and parse_page())."""
+    dom = build_dom(page)
+    names = runtime_names(root, rel_path, text, dom)
+    body = dom.offset_of('body') or 0
+    fold = body + ABOVE_FOLD_BYTES
+    used, critical = [], []
+    for i, item in enumerate(items):
+        if item.kind != 'style':
+            continue
+        if item.selectors is None:
+            used.append(i)
+            critical.append(i)
+            continue
+        if any(dom.matches(s, names) for s in item.selectors):
+            used.append(i)
+            if any(dom.matches(s, interactive=False, before=fold) for s in item.selectors):
+                critical.append(i)
+    return tuple(used), tuple(critical)
+
+
+def analyze_shard(root, items, pages):
+    """pages: (rel_path, text, page) of each page to match."""
+    return [(rel_path, analyze_page(root, rel_path, text, page, items)) for rel_path, text, page in pages]
+
+
+class CriticalCSS:
+    """Pages of a site, the stylesheets they link and what each page uses."""
+
+    def __init__(self, root, sheets=SHEETS):
+        self.root = Path(root)
+        self.dir = self.root / OUTPUT_DIR
+        self.sheets = [sheet.replace('/', os.sep) for sheet in sheets]
+        self.cache = AuditCache(self.root, 'critical')
+        self.corpus = Corpus(self.root, cache=self.cache)
+        self.analyzed = 0
+        self.cached = 0
+
+    def pages(self, sheet):
+        """Pages that link a stylesheet."""
+        for doc in sorted(self.corpus.html(), key=lambda d: d.rel_path):
+            if any(link.kind == 'css' and resolve_href(doc.rel_path, link.url) == sheet
+                   for link in doc.page.links):
+                yield doc
+
+    def _key(self, doc, sheet_doc):
+        """Cache key: stylesheet hash plus the hashes of the page's local scripts
+        (the page hash is the cache entry's own)."""
+        scripts = []
+        for link in doc.page.links:
+            if link.kind == 'src' and link.tag == 'script':
+                script = self.corpus.get(resolve_href(doc.rel_path, link.url) or '')
+                if script is not None:
+                    scripts.append(script.digest)
+        scripts_hash = hashlib.sha1(' '.join(scripts).encode()).hexdigest()[:12]
+        return f"critical:{sheet_doc.rel_path}:{sheet_doc.digest}:{scripts_hash}"
+
+    def analyze(self, jobs=None):
+        """{sheet: (items, {page: (used, critical)})}"""
+        analysis = {}
+        for sheet in self.sheets:
+            sheet_doc = self.corpus.get(sheet)
+            if sheet_doc is None:
+                continue
+            items = parse_sheet(sheet_doc.text)
+            results, pending, keys = {}, [], {}
+            for doc in self.pages(sheet):
+                key = self._key(doc, sheet_doc)
+                if self.cache.has(doc, key):
+                    results[doc.rel_path] = self.cache.get(doc, key)
+                    self.cached += 1
+                else:
+                    pending.append((doc.rel_path, doc.text, doc.page))
+                    keys[doc.rel_path] = (doc, key)
+
+            if jobs == 1 or len(pending) < 2:
+                done = analyze_shard(self.root, items, pending)
+            else:
+                workers = jobs or os.cpu_count() or 1
+                shards = make_shards(self.root, pending, workers * 4, key=lambda item: item[0])
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    done = [item for shard in pool.map(analyze_shard, [self.root] * len(shards),
+                                                       [items] * len(shards), shards)
+                            for item in shard]
+            for rel_path, result in done:
+                doc, key = keys[rel_path]
+                # results for an older stylesheet or script version are dropped
+                self.cache.discard(doc, f"critical:{sheet}:")
+                self.cache.put(doc, key, result)
+                results[rel_path] = result
+            self.analyzed += len(done)
+            analysis[sheet] = (items, results)
+        self.cache.save()
+        return analysis
+
+    def build(self, jobs=None):
+        """(manifest, {deferred file name: bytes}); the manifest's pages map
+        each page to {sheet: entry} for every analyzed sheet it links."""
+        pages = {}
+        files = {}
+        sheets = {}
+        for sheet, (items, results) in self.analyze(jobs).items():
+            sheet_url = sheet.replace(os.sep, '/')
+            sheets[sheet_url] = len([item for item in items if item.kind == 'style'])
+            for rel_path, (used, critical) in sorted(results.items()):
+                inline, deferred = split_sheet(items, used, critical)
+                data = deferred.encode('utf-8')
+                name = f"{hashlib.sha1(data).hexdigest()[:12]}.css"
+                files[name] = data
+                pages.setdefault(rel_path.replace(os.sep, '/'), {})[sheet_url] = {
+                    'critical': inline,
+                    'deferred': f"{OUTPUT_DIR}/{name}",
+                    'rules': [len(used), len(critical)],
+                }
+        return {'format': MANIFEST_FORMAT, 'sheets': sheets, 'pages': pages}, files
+
+    def write(self, manifest, files):
+        """Write new deferred sheets and the manifest, remove unused sheets.
+        Returns (written, removed) file names."""
+        existing = {p.name for p in self.dir.glob('*.css')} if self.dir.is_dir() else set()
+        written = sorted(set(files) - existing)
+        removed = sorted(existing - set(files))
+        self.dir.mkdir(exist_ok=True)
+        for name in written:
+            atomic_write(self.dir / name, files[name])
+        atomic_write(self.dir / MANIFEST, json.dumps(manifest, indent=1, ensure_ascii=False))
+        for name in removed:
+            os.unlink(self.dir / name)
+        return written, removed
+
+
+def head_markup(rel_path, entry):
+    """<head> markup replacing a page's <link> to one stylesheet."""
+    href = posixpath.relpath(entry['deferred'], posixpath.dirname(rel_path) or '.')
+    return (f"<style>{entry['critical']}</style>\n"
+            f"<link rel=\"preload\" href=\"{href}\" as=\"style\" "
+            f"onload=\"this.onload=null;this.rel='stylesheet'\">\n"
+            f"<noscript><link rel=\"stylesheet\" href=\"{href}\"></noscript>")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Per-page critical CSS and pruned deferred stylesheets')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Matching processes (default: one per CPU)')
+    parser.add_argument('--sheet', action='append',
+                        help=f"Stylesheet to split (repeatable, default: {', '.join(SHEETS)})")
+    parser.add_argument('--show', metavar='PAGE', help='Print the <head> markup of one page, then exit')
+    args = parser.parse_args()
+
+    if args.show:
+        with open(Path(args.project_dir) / OUTPUT_DIR / MANIFEST, encoding='utf-8') as f:
+            entries = json.load(f)['pages'].get(args.show)
+        if not entries:
+            print(f"{args.show}: not in {OUTPUT_DIR}/{MANIFEST} (run the analyzer first)")
+            return 1
+        for sheet, entry in entries.items():
+            print(f"<!-- {sheet} -->")
+            print(head_markup(args.show, entry))
+        return 0
+
+    critical = CriticalCSS(args.project_dir, args.sheet or SHEETS)
+    manifest, files = critical.build(args.jobs)
+    written, removed = critical.write(manifest, files)
+
+    pages = manifest['pages']
+    print(f"Pages: {len(pages)} ({critical.analyzed} matched, {critical.cached} from cache)")
+    sheet_sizes = {sheet: (critical.root / sheet).stat().st_size for sheet in manifest['sheets']}
+    for sheet, rules in manifest['sheets'].items():
+        entries = [sheets[sheet] for sheets in pages.values() if sheet in sheets]
+        if not entries:
+            continue
+        used = sum(e['rules'][0] for e in entries) / len(entries)
+        inline = sum(len(e['critical'].encode()) for e in entries) / len(entries)
+        deferred = sum(len(files[e['deferred'].rsplit('/', 1)[1]]) for e in entries) / len(entries)
+        print(f"  {sheet} ({sheet_sizes[sheet] / 1024:.1f} KB, {rules} rules): "
+              f"{used:.0f} rules used per page, {inline / 1024:.1f} KB critical, "
+              f"{deferred / 1024:.1f} KB deferred on average")
+    print(f"Deferred sheets: {len(files)} ({len(written)} written, {len(removed)} removed)")
+
+    report = {
+        'summary': {'pages': len(pages), 'deferred_sheets': len(files), 'sheets': manifest['sheets']},
+        'pages': [{'path': rel_path, 'sheet': sheet, 'rules_used': e['rules'][0],
+                   'rules_critical': e['rules'][1], 'critical_bytes': len(e['critical'].encode()),
+                   'deferred': e['deferred']}
+                  for rel_path, sheets in pages.items() for sheet, e in sheets.items()],
+    }
+    report_name = f"CRITICAL_REPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(Path(args.project_dir) / report_name, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved: {report_name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
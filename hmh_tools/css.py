@@ -0,0 +1,304 @@
+"""
+HMH Tools - CSS Model
+
+Tokenizes stylesheets and <style> blocks into rules, indexes the rules by
+selector and by property, and answers cascade questions without
+re-searching any style text.
+
+  statement_spans(text)      -> [(start, end)] of each top-level rule,
+                                at-rule block or ';' statement
+  is_pinned(css)             -> True if a url()/@import is page-relative,
+                                so the CSS cannot move to another directory
+  parse_css(text)            -> [Rule]; comments and strings are skipped
+                                correctly, @media / @supports / @layer /
+                                @container blocks are descended into (the
+                                condition is kept on each rule), other
+                                at-rule blocks (@keyframes, @font-face)
+                                are passed over; properties= keeps only
+                                the declarations a check looks at
+  StyleIndex                 -> rules of any number of sheets, indexed
+      .with_property(p, v)      every rule that declares p (optionally: = v)
+      .rules_for(selector)      every rule for one selector, source order
+      .cascade(selector, media) declarations after the cascade for that
+                                selector: later wins, !important beats
+                                normal, media rules apply over the base
+
+Selectors are compared as written (whitespace collapsed), which is how the
+site's layout classes are used; matching selectors against a page's
+elements is hmh_tools.dom's job.
+
+Usage:
+    index = StyleIndex()
+    index.add(parse_css(sheet_text), source='css/unified-theme.css')
+    for rule in index.with_property('display', 'grid'):
+        print(rule.source, rule.line, rule.selectors)
+"""
+
+import re
+from collections import defaultdict, namedtuple
+
+# selectors: tuple of selector strings; declarations: tuple of Declaration;
+# media: tuple of enclosing @media/@supports preludes, outermost first;
+# body: (start, end) offsets of the text between the braces
+Rule = namedtuple('Rule', 'selectors declarations line media source body', defaults=(None,))
+Declaration = namedtuple('Declaration', 'property value important')
+# One declaration located in its text: start..end runs from the property
+# name through the closing ';' (if any), value_start..value_end is the value
+# without '!important'
+DeclarationSpan = namedtuple('DeclarationSpan',
+                             'property value important start end value_start value_end')
+
+# At-rules whose block holds more rules
+GROUPING_AT_RULES = {'media', 'supports', 'layer', 'container', 'document'}
+
+# One chunk of text (strings and comments kept whole) up to the next brace
+_CHUNK = re.compile(r'''
+    ((?:[^{}"'/]+ | "(?:\\.|[^"\\\n])*"? | '(?:\\.|[^'\\\n])*'? | /\*.*?(?:\*/|\Z) | /)*)
+    ([{}]|\Z)
+''', re.VERBOSE | re.DOTALL)
+_COMMENT_OR_STRING = re.compile(r'''/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?''', re.DOTALL)
+_STATEMENT = re.compile(r'''(?:[^;"']+|"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?)+''')
+_STATEMENT_SPAN = re.compile(r'''
+    ((?:[^;"'/{}]+ | "(?:\\.|[^"\\\n])*"? | '(?:\\.|[^'\\\n])*'? | /\*.*?(?:\*/|\Z) | /)+)
+    (;?)
+''', re.VERBOSE | re.DOTALL)
+_BLANK = re.compile(r'(?:\s+|/\*.*?(?:\*/|\Z))*', re.DOTALL)
+_URL = re.compile(r'''url\(\s*(?:"([^"]*)"|'([^']*)'|([^)"'\s]*))|@import\s*(?:"([^"]*)"|'([^']*)')''',
+                  re.IGNORECASE)
+# URLs that resolve the same from any directory of the site
+_LOCATION_FREE = ('data:', 'http:', 'https:', '//', '/')
+_TOKEN = re.compile(r'''/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?|\s+|[{};]|[^\s"'/{};]+|/''',
+                    re.DOTALL)
+
+
+def _clean(text):
+    return ' '.join(text.split())
+
+
+def _blank_comment(m):
+    """A comment becomes its newlines (line numbers stay right); strings stay."""
+    token = m.group()
+    return token if token[0] != '/' else '\n' * token.count('\n')
+
+
+def _statements(text):
+    """text split at ';' outside strings"""
+    if '"' not in text and "'" not in text:
+        return text.split(';')
+    return _STATEMENT.findall(text)
+
+
+def parse_declarations(text, properties=None):
+    """'a: b; c: d !important' -> (Declaration, ...), only the given
+    properties if any"""
+    declarations = []
+    for part in _statements(text):
+        prop, colon, value = part.partition(':')
+        prop = prop.strip().lower()
+        if not colon or not prop or (properties is not None and prop not in properties):
+            continue
+        value = _clean(value)
+        important = value[-10:].lower() == '!important'
+        if important:
+            value = value[:-10].rstrip()
+        declarations.append(Declaration(prop, value, important))
+    return tuple(declarations)
+
+
+def declaration_spans(text, start=0, end=None):
+    """DeclarationSpan of every declaration in text[start:end] (a rule body
+    or a style="" value), with offsets into text."""
+    end = len(text) if end is None else end
+    pos = start
+    while pos < end:
+        m = _STATEMENT_SPAN.match(text, pos, end)
+        if m is None:
+            pos += 1    # a lone ';' (or a brace of a nested rule)
+            continue
+        pos = m.end()
+        decl_start = _BLANK.match(text, m.start(), m.end(1)).end()
+        statement = text[decl_start:m.end(1)].rstrip()
+        colon = statement.find(':')
+        prop = statement[:colon].strip().lower() if colon > 0 else ''
+        if not prop:
+            continue
+        value_start = decl_start + colon + 1
+        value_end = decl_start + len(statement)
+        value_start += len(text[value_start:value_end]) - len(text[value_start:value_end].lstrip())
+        important = text[value_start:value_end][-10:].lower() == '!important'
+        if important:
+            value_end = value_start + len(text[value_start:value_end - 10].rstrip())
+        decl_end = m.end() if m.group(2) else decl_start + len(statement)
+        yield DeclarationSpan(prop, _clean(text[value_start:value_end]), important,
+                              decl_start, decl_end, value_start, value_end)
+
+
+def statement_spans(text, start=0, end=None):
+    """(start, end) of every top-level statement of text[start:end]: a rule
+    or at-rule with its whole block, or a statement ending in ';' such as
+    @import. Comments and whitespace between statements belong to none."""
+    end = len(text) if end is None else end
+    spans = []
+    depth = 0
+    opened = None
+    for m in _TOKEN.finditer(text, start, end):
+        token = m.group()
+        if token[0].isspace() or token.startswith('/*'):
+            continue
+        if opened is None:
+            opened = m.start()
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth = max(depth - 1, 0)
+            if depth == 0:
+                spans.append((opened, m.end()))
+                opened = None
+        elif token == ';' and depth == 0:
+            spans.append((opened, m.end()))
+            opened = None
+        last = m.end()
+    if opened is not None:
+        spans.append((opened, last))
+    return spans
+
+
+def is_pinned(css):
+    """True when css refers to something relative to the file it is in."""
+    for m in _URL.finditer(css):
+        url = next((g for g in m.groups() if g is not None), '').strip()
+        if url and not url.lower().startswith(_LOCATION_FREE):
+            return True
+    return False
+
+
+def _prelude_start(chunk):
+    """Offset where the text before a '{' starts: after the last ';' outside strings"""
+    if '"' not in chunk and "'" not in chunk:
+        return chunk.rfind(';') + 1
+    start = 0
+    for m in _STATEMENT.finditer(chunk):
+        start = m.start()
+    # a chunk ending in ';' has an empty prelude
+    return len(chunk) if chunk.rstrip().endswith(';') else start
+
+
+def parse_css(text, source=None, first_line=1, properties=None):
+    """Every style rule of a stylesheet, in source order.
+
+    With properties (a set of lowercase names) only those declarations are
+    kept, and rules declaring none of them are dropped - bodies that do not
+    mention any of the names are not even split.
+    """
+    rules = []
+    # Each frame: (kind, data) with kind 'group' (data = media tuple),
+    # 'rule' (data = [selectors, line, media, declaration chunks, body start])
+    # or 'skip'
+    stack = [('group', ())]
+    line = first_line
+
+    for m in _CHUNK.finditer(text):
+        chunk, brace = m.groups()
+        chunk_line = line
+        line += chunk.count('\n')
+        if '/*' in chunk:
+            chunk = _COMMENT_OR_STRING.sub(_blank_comment, chunk)
+        frame_kind, frame = stack[-1]
+
+        if brace == '{':
+            start = _prelude_start(chunk)
+            if frame_kind == 'rule':
+                frame[3].append(chunk[:start])
+            head = chunk[start:]
+            stripped = head.lstrip()
+            rule_line = chunk_line + chunk.count('\n', 0, len(chunk) - len(stripped))
+            head = _clean(stripped)
+
+            if frame_kind == 'skip':
+                stack.append(('skip', None))
+            elif head.startswith('@'):
+                name = head[1:].split(None, 1)[0].lower() if len(head) > 1 else ''
+                media = frame if frame_kind == 'group' else frame[2]
+                if name in GROUPING_AT_RULES:
+                    stack.append(('group', media + (head,)))
+                else:
+                    stack.append(('skip', None))
+            else:
+                # A rule nested in a rule (CSS nesting) keeps the parent's media
+                media = frame[2] if frame_kind == 'rule' else frame
+                selectors = tuple(_clean(s) for s in head.split(',') if s.strip())
+                stack.append(('rule', [selectors, rule_line, media, [], m.end()]))
+        else:
+            if frame_kind == 'rule':
+                frame[3].append(chunk)
+                selectors, rule_line, media, chunks, body_start = frame
+                body = ';'.join(chunks)
+                if selectors and (properties is None or any(p in body for p in properties)):
+                    declarations = parse_declarations(body, properties)
+                    if declarations or properties is None:
+                        rules.append(Rule(selectors, declarations, rule_line, media, source,
+                                          (body_start, m.start(2))))
+            if len(stack) > 1:
+                stack.pop()
+            if not brace:
+                break
+    return rules
+
+
+class StyleIndex:
+    """Rules of many stylesheets, indexed by selector and by property."""
+
+    def __init__(self):
+        self.rules = []
+        self.by_selector = defaultdict(list)
+        self.by_property = defaultdict(list)
+
+    def add(self, rules, source=None):
+        for rule in rules:
+            if source is not None and rule.source is None:
+                rule = rule._replace(source=source)
+            self.rules.append(rule)
+            for selector in rule.selectors:
+                self.by_selector[selector].append(rule)
+            for prop in {d.property for d in rule.declarations}:
+                self.by_property[prop].append(rule)
+        return self
+
+    def with_property(self, prop, value=None):
+        """Rules declaring prop (with exactly value, if given)."""
+        rules = self.by_property.get(prop, [])
+        if value is None:
+            return list(rules)
+        value = value.lower()
+        return [rule for rule in rules
+                if any(d.property == prop and d.value.lower() == value for d in rule.declarations)]
+
+    def rules_for(self, selector):
+        return self.by_selector.get(_clean(selector), [])
+
+    def selectors(self):
+        return self.by_selector.keys()
+
+    def cascade(self, selector, media=None):
+        """Cascaded {property: value} for one selector.
+
+        media=None: rules outside any @media. A media tuple: the base
+        rules, then the rules under exactly that condition on top.
+        """
+        return cascade(self.rules_for(selector), media)
+
+
+def cascade(rules, media=None):
+    """Fold rules (in source order) into {property: value}."""
+    normal = {}
+    important = {}
+    for layer in ((),) if not media else ((), tuple(media)):
+        for rule in rules:
+            if rule.media != layer:
+                continue
+            for d in rule.declarations:
+                if d.important:
+                    important[d.property] = d.value
+                else:
+                    normal[d.property] = d.value
+    return {**normal, **important}
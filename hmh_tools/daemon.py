@@ -0,0 +1,360 @@
+"""
+HMH Tools - Audit Daemon
+
+A long-running audit service for the site. It walks and checks the tree
+once, then keeps everything hot in memory:
+
+  - the Corpus (file list, text and parsed Page of every document)
+  - the LinkGraph (every reference, indexed both ways)
+  - the per-file results of SHIVA v4's FILE_CHECKS, with their deps
+  - the per-page results of link_checker.py (check_page; #fragments are
+    checked against the target's current anchors on every query)
+  - the per-page results of triaxial-audit.py's ALPHA scans (internal
+    .html links and 404-prone link patterns)
+
+and watches the tree (inotify, or polling as a fallback). When files
+change, only those documents are re-read and re-parsed, and only they
+plus the results whose deps name an added or removed path (link
+dependents) are re-checked.
+
+Answers are served as one-line JSON over a Unix socket in
+.hmh_cache/daemon.sock, so an editor or pre-commit hook gets them in
+milliseconds instead of starting three cold audits. The audits' own
+cross-file passes (SHIVA's site-wide checks, OMEGA, external link checks)
+are not served: run the scripts for those.
+
+Requests ({"cmd": ...}, one per line):
+    status                      files, documents, watcher, last update
+    file      path=P            every check result for one file
+    check     name=N            files with a non-empty result for check N
+                                (a FILE_CHECKS name, link_checker, alpha_links
+                                or alpha_suspicious)
+    broken                      every broken reference (link graph)
+    links-to  path=P            references pointing at P
+    orphans                     HTML pages nothing links to
+    refresh   paths=[...]       re-check paths now (don't wait for the watch)
+
+Usage:
+    python3 -m hmh_tools.daemon [project_directory]
+    python3 -m hmh_tools.daemon [project_directory] --query status
+    python3 -m hmh_tools.daemon [project_directory] --query file --path index.html
+"""
+
+import importlib.util
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+from .cache import CACHE_DIR
+from .corpus import Corpus
+from .report import dumps_compact
+from .watch import PollingWatcher, make_watcher
+
+SOCKET_NAME = 'daemon.sock'
+
+# Per-file checks come from the current SHIVA script; per-page link checks
+# from link_checker.py and triaxial-audit.py's ALPHA
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CHECKS = PROJECT_DIR / 'SHIVA_v4.0_01-12-2026.py'
+LINK_CHECKER = PROJECT_DIR / 'link_checker.py'
+TRIAXIAL = PROJECT_DIR / 'scripts' / 'triaxial-audit.py'
+
+# Editors save in bursts (write, rename, chmod); wait this long for quiet
+DEBOUNCE = 0.05
+
+
+def _load(script_path, name):
+    spec = importlib.util.spec_from_file_location(name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_scanner(script_path):
+    """scan_document(doc, project_dir) from an audit script with FILE_CHECKS."""
+    return _load(script_path, 'hmh_daemon_checks').scan_document
+
+
+class PageLinkChecks:
+    """link_checker.py and ALPHA per-page scans, run against a live corpus."""
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.link_checker = _load(LINK_CHECKER, 'hmh_daemon_link_checker')
+        self.alpha = _load(TRIAXIAL, 'hmh_daemon_triaxial')
+        # ALPHA resolves through site_corpus(): point it at the live corpus
+        self.alpha.site_corpus = lambda: self.corpus
+        self.fragments = {}
+
+    def scan(self, doc):
+        """{name: (result, deps)} for one HTML page, like scan_document."""
+        _, broken, _, fragments, deps = self.link_checker.check_page(doc, self.corpus.resolver())
+        self.fragments[doc.rel_path] = fragments
+        (_, alpha_broken), alpha_deps = self.alpha.alpha_scan_links(doc)
+        suspicious, _ = self.alpha.alpha_scan_suspicious(doc)
+        return {
+            'link_checker': (broken, deps),
+            'alpha_links': (alpha_broken, alpha_deps),
+            'alpha_suspicious': (suspicious, ()),
+        }
+
+    def forget(self, rel_path):
+        self.fragments.pop(rel_path, None)
+
+    def broken_anchors(self, rel_paths):
+        """{path: [broken #fragment links]}, against the targets' anchors now."""
+        found = {rel_path: [] for rel_path in rel_paths}
+        stats = {'broken_anchors': 0}
+        self.link_checker.check_fragments(
+            {p: self.fragments[p] for p in rel_paths if self.fragments.get(p)},
+            self.corpus, found, stats)
+        return found
+
+
+def socket_path(root):
+    return os.path.join(root, CACHE_DIR, SOCKET_NAME)
+
+
+class AuditService:
+    """Corpus, link graph and per-file results kept current across changes."""
+
+    def __init__(self, root, scan_document):
+        self.root = Path(root)
+        self.scan_document = scan_document
+        self.corpus = Corpus(self.root)
+        self.page_checks = PageLinkChecks(self.corpus)
+        self.results = {}
+        self.watcher = None
+        self.updates = 0
+        self.last_update = None
+        for doc in self.corpus:
+            self._scan(doc)
+        self.corpus.link_graph()
+
+    def _scan(self, doc):
+        scanned = self.scan_document(doc, self.root)
+        if doc.kind == 'html':
+            scanned.update(self.page_checks.scan(doc))
+        self.results[doc.rel_path] = scanned
+
+    def _results(self, rel_paths, name=None):
+        """{path: {check: result}}, with #fragment breakage added to link_checker."""
+        anchors = self.page_checks.broken_anchors(rel_paths)
+        results = {}
+        for rel_path in rel_paths:
+            current = {check: result for check, (result, _) in self.results[rel_path].items()
+                       if name is None or check == name}
+            if 'link_checker' in current:
+                current['link_checker'] = current['link_checker'] + anchors[rel_path]
+            results[rel_path] = current
+        return results
+
+    def _dependents(self, paths):
+        """Documents with a result that depends on any of paths (or a parent)."""
+        touched = set()
+        for rel_path in paths:
+            while rel_path:
+                touched.add(rel_path)
+                rel_path = os.path.dirname(rel_path)
+        return {rel_path for rel_path, scanned in self.results.items()
+                if any(not touched.isdisjoint(deps) for _, deps in scanned.values())}
+
+    def _expand(self, rel_paths):
+        """Turn 'dir/' markers (a removed directory) into the files below it."""
+        expanded = set()
+        for rel_path in rel_paths:
+            if rel_path.endswith(os.sep):
+                expanded.update(f for f in self.corpus.files if f.startswith(rel_path))
+            else:
+                expanded.add(rel_path)
+        return expanded
+
+    def update(self, rel_paths):
+        """Apply changed paths; returns a summary of what was re-checked."""
+        started = time.perf_counter()
+        changed, added, removed = self.corpus.apply_changes(self._expand(rel_paths))
+        if not (changed or added or removed):
+            return None
+
+        for rel_path in removed:
+            self.results.pop(rel_path, None)
+            self.page_checks.forget(rel_path)
+        rescan = {p for p in changed | added if self.corpus.get(p)}
+        rescan |= self._dependents(added | removed)
+        for rel_path in sorted(rescan):
+            doc = self.corpus.get(rel_path)
+            if doc is not None:
+                self._scan(doc)
+        self.corpus.link_graph()
+
+        self.updates += 1
+        self.last_update = {
+            'changed': sorted(changed),
+            'added': sorted(added),
+            'removed': sorted(removed),
+            'rechecked': len(rescan),
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+        return self.last_update
+
+    # -- queries --
+
+    def handle(self, request):
+        cmd = request.get('cmd')
+        graph = self.corpus.link_graph()
+        if cmd == 'status':
+            return {'files': len(self.corpus.files), 'documents': len(self.corpus),
+                    'watcher': self.watcher, 'updates': self.updates, 'last_update': self.last_update}
+        if cmd == 'file':
+            path = os.path.normpath(request.get('path', ''))
+            if path not in self.results:
+                return {'error': f"not a checked document: {path}"}
+            return {'path': path, 'results': self._results([path])[path]}
+        if cmd == 'check':
+            name = request.get('name')
+            checked = [rel_path for rel_path, scanned in self.results.items() if name in scanned]
+            return {'check': name, 'files': {
+                rel_path: results[name] for rel_path, results in self._results(checked, name).items()
+                if results[name]}}
+        if cmd == 'broken':
+            return {'broken': [edge._asdict() for edge in graph.broken()]}
+        if cmd == 'links-to':
+            path = os.path.normpath(request.get('path', ''))
+            return {'path': path, 'links': [edge._asdict() for edge in graph.links_to(path)]}
+        if cmd == 'orphans':
+            return {'orphans': graph.orphans()}
+        if cmd == 'refresh':
+            return {'update': self.update(request.get('paths', []))}
+        return {'error': f"unknown command: {cmd}"}
+
+
+def serve(root, scan_document, poll_interval=1.0, force_polling=False):
+    """Run the service until interrupted."""
+    root = Path(root)
+    started = time.perf_counter()
+    service = AuditService(root, scan_document)
+    if force_polling:
+        watcher = PollingWatcher(root, interval=poll_interval)
+    else:
+        watcher = make_watcher(root, poll_interval=poll_interval)
+    service.watcher = watcher.kind
+    print(f"Audited {len(service.corpus)} documents in {time.perf_counter() - started:.2f}s, "
+          f"watching with {watcher.kind}", flush=True)
+
+    path = socket_path(root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    print(f"Listening on {path}", flush=True)
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ, 'server')
+    if watcher.fileno() is not None:
+        selector.register(watcher.fileno(), selectors.EVENT_READ, 'watch')
+    polling = watcher.fileno() is None
+    # Service managers stop daemons with SIGTERM: clean up the socket too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    next_poll = time.monotonic() + poll_interval
+
+    try:
+        while True:
+            timeout = max(0.0, next_poll - time.monotonic()) if polling else None
+            ready = {key.data for key, _ in selector.select(timeout)}
+            if 'server' in ready:
+                conn, _ = server.accept()
+                with conn:
+                    _answer(service, conn)
+
+            if 'watch' in ready:
+                time.sleep(DEBOUNCE)
+            elif not (polling and time.monotonic() >= next_poll):
+                continue
+            next_poll = time.monotonic() + poll_interval
+            update = service.update(watcher.changes())
+            if update:
+                print(f"Re-checked {update['rechecked']} files in {update['ms']} ms "
+                      f"({len(update['changed'])} changed, {len(update['added'])} added, "
+                      f"{len(update['removed'])} removed)", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        selector.close()
+        server.close()
+        watcher.close()
+        if os.path.exists(path):
+            os.unlink(path)
+    return 0
+
+
+def _answer(service, conn):
+    conn.settimeout(5)
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    try:
+        response = service.handle(json.loads(data or b'{}'))
+    except Exception as e:
+        response = {'error': f"{type(e).__name__}: {e}"}
+    conn.sendall(dumps_compact(response).encode() + b'\n')
+
+
+def query(root, request, timeout=10.0):
+    """Send one request to a running daemon and return its answer."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path(root))
+        client.sendall(dumps_compact(request).encode() + b'\n')
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HMH audit daemon')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--checks', default=str(DEFAULT_CHECKS),
+                        help='Audit script providing scan_document() (default: SHIVA v4)')
+    parser.add_argument('--poll', type=float, default=1.0, metavar='SECONDS',
+                        help='Polling interval when inotify is unavailable')
+    parser.add_argument('--force-polling', action='store_true', help='Do not use inotify')
+    parser.add_argument('--query', metavar='CMD', help='Ask a running daemon instead of starting one')
+    parser.add_argument('--path', help='path argument for file / links-to')
+    parser.add_argument('--name', help='check name for check')
+    args = parser.parse_args()
+
+    if args.query:
+        request = {'cmd': args.query}
+        if args.path:
+            request['path'] = args.path
+            request['paths'] = [args.path]
+        if args.name:
+            request['name'] = args.name
+        try:
+            print(json.dumps(query(args.project_dir, request), indent=2, ensure_ascii=False))
+        except OSError as e:
+            print(f"No daemon running for {args.project_dir}: {e}")
+            return 1
+        return 0
+
+    return serve(args.project_dir, load_scanner(args.checks), args.poll, args.force_polling)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
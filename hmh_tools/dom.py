@@ -0,0 +1,392 @@
+"""
+HMH Tools - DOM and Selector Matching
+
+Builds an element tree from a page's shared parse (hmh_tools.parse) and
+tells which CSS selectors match an element of it, so stylesheet rules
+can be checked against the pages that load them.
+
+  build_dom(page)           -> Dom: every element of a parse_page() in
+                               document order with its parent, element
+                               siblings and source offset; end tags the
+                               page forgot (<li>, <p>, <td>, ...) are
+                               closed the way a browser would
+  parse_selectors(text)     -> [Selector] of a selector list, or None when
+                               it uses syntax the matcher does not know
+  Dom.matches(selector, names=, interactive=, before=)
+                            -> True if some element matches
+
+Supported: type, *, #id, .class, [attr], [attr=|~=|^=|$=|*=||= value i],
+the four combinators, :root, :first/last/only-child, :first/last/only-of-type,
+:nth-(last-)child/of-type(an+b), :not(), :is(), :where(), :matches().
+Pseudo-elements are matched on their element. Any other pseudo-class
+(:hover, :checked, :has(), ...) counts as matching - the answer errs
+toward "used".
+
+names is a set of words that may turn up at run time (class names, ids,
+tags and attributes a script can add): a condition on one of them
+matches any element. interactive=False makes user-action pseudo-classes
+(:hover, :focus, ...) not match, for "what shows on first paint".
+
+Usage:
+    dom = build_dom(doc.page)
+    for selector in parse_selectors('.nav a:hover, #top > h1') or ():
+        print(dom.matches(selector))
+"""
+
+import re
+from collections import defaultdict, namedtuple
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+             'param', 'source', 'track', 'wbr'}
+# open tag -> tags whose start closes it
+IMPLIED_END = {
+    'li': {'li'},
+    'dt': {'dt', 'dd'},
+    'dd': {'dt', 'dd'},
+    'tr': {'tr'},
+    'td': {'td', 'th', 'tr'},
+    'th': {'td', 'th', 'tr'},
+    'option': {'option', 'optgroup'},
+    'p': {'address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl', 'fieldset',
+          'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+          'header', 'hr', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'ul'},
+}
+USER_ACTION = {'hover', 'focus', 'active', 'focus-visible', 'focus-within', 'visited', 'target'}
+STRUCTURAL = {'root', 'first-child', 'last-child', 'only-child', 'first-of-type', 'last-of-type',
+              'only-of-type', 'nth-child', 'nth-last-child', 'nth-of-type', 'nth-last-of-type'}
+SELECTOR_LISTS = {'not', 'is', 'where', 'matches', '-webkit-any', '-moz-any'}
+
+
+class Element:
+    __slots__ = ('tag', 'attrs', 'classes', 'parent', 'children', 'offset')
+
+    def __init__(self, tag, attrs, parent, offset):
+        self.tag = tag
+        self.attrs = attrs
+        self.classes = frozenset((attrs.get('class') or '').split())
+        self.parent = parent
+        self.children = []
+        self.offset = offset
+
+    def __repr__(self):
+        return f"<{self.tag} @{self.offset}>"
+
+
+class Dom:
+    """Elements of one page, indexed by id, class and tag."""
+
+    def __init__(self, root, elements):
+        self.root = root
+        self.elements = elements
+        self.by_id = defaultdict(list)
+        self.by_class = defaultdict(list)
+        self.by_tag = defaultdict(list)
+        for element in elements:
+            self.by_tag[element.tag].append(element)
+            if element.attrs.get('id'):
+                self.by_id[element.attrs['id']].append(element)
+            for name in element.classes:
+                self.by_class[name].append(element)
+
+    def offset_of(self, tag):
+        """Source offset of the first element of a tag, or None."""
+        found = self.by_tag.get(tag)
+        return found[0].offset if found else None
+
+    def candidates(self, compound, names):
+        """Elements that can match a compound; all of them when its key is
+        a run-time name."""
+        if compound.ids:
+            key = compound.ids[0]
+            return self.elements if names and key in names else self.by_id.get(key, ())
+        if compound.classes:
+            key = compound.classes[0]
+            return self.elements if names and key in names else self.by_class.get(key, ())
+        if compound.tag:
+            return self.elements if names and compound.tag in names else self.by_tag.get(compound.tag, ())
+        return self.elements
+
+    def matches(self, selector, names=None, interactive=True, before=None):
+        """True if an element (starting before source offset `before`, if
+        given) matches the selector."""
+        state = (names, interactive)
+        for element in self.candidates(selector.compounds[-1], names):
+            if before is not None and element.offset >= before:
+                continue
+            if _match(element, selector, len(selector.compounds) - 1, state):
+                return True
+        return False
+
+
+def build_dom(page):
+    """Dom of a parsed page, from its start and end tags (Page.events())."""
+    root = Element('#document', {}, None, 0)
+    stack = [root]
+    elements = []
+    for kind, tag, attrs, start, _ in page.events():
+        if kind == 'end':
+            for i in range(len(stack) - 1, 0, -1):
+                if stack[i].tag == tag:
+                    del stack[i:]
+                    break
+            continue
+        while len(stack) > 1 and tag in IMPLIED_END.get(stack[-1].tag, ()):
+            stack.pop()
+        parent = stack[-1]
+        element = Element(tag, {name: value or '' for name, value in attrs.items()}, parent, start)
+        parent.children.append(element)
+        elements.append(element)
+        if tag not in VOID_TAGS:
+            stack.append(element)
+    return Dom(root, elements)
+
+
+# -- selectors --
+
+# combinators[i] joins compounds[i - 1] and compounds[i]: ' ', '>', '+' or '~'
+Selector = namedtuple('Selector', 'compounds combinators')
+# pseudos: (name, argument) - argument is (a, b) for nth-*, [Selector] for
+# :not()/:is()/..., None otherwise
+Compound = namedtuple('Compound', 'tag ids classes attrs pseudos')
+
+_IDENT = r'-?[A-Za-z_][\w-]*'
+_SIMPLE = re.compile(rf'''
+    (?P<tag>\*|{_IDENT})
+  | \#(?P<id>-?[\w-]+)
+  | \.(?P<cls>{_IDENT})
+  | \[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[^\s\]]+))
+        \s*(?P<flag>[iIsS])?\s*)?\]
+  | (?P<colons>::?)(?P<pseudo>{_IDENT})(?P<paren>\()?
+''', re.VERBOSE)
+_COMBINATOR = re.compile(r'\s*([>+~])\s*|\s+')
+_NTH = re.compile(r'^\s*(?:(odd)|(even)|([+-]?\d*)n\s*(?:([+-])\s*(\d+))?|([+-]?\d+))\s*$', re.IGNORECASE)
+
+
+def _split_list(text):
+    """Split at commas outside parentheses, brackets and strings."""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, c in enumerate(text):
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in '"\'':
+            quote = c
+        elif c in '([':
+            depth += 1
+        elif c in ')]':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _closing_paren(text, start):
+    depth = 1
+    for i in range(start, len(text)):
+        if text[i] == '(':
+            depth += 1
+        elif text[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def _nth(argument):
+    m = _NTH.match(argument)
+    if not m:
+        return None
+    odd, even, a, sign, b, number = m.groups()
+    if odd:
+        return 2, 1
+    if even:
+        return 2, 0
+    if number is not None:
+        return 0, int(number)
+    a = 1 if a in ('', '+') else -1 if a == '-' else int(a)
+    b = int(b) if b else 0
+    return a, -b if sign == '-' else b
+
+
+def _parse_selector(text):
+    compounds, combinators = [], []
+    tag, ids, classes, attrs, pseudos = None, [], [], [], []
+    started = False
+    pos, n = 0, len(text)
+
+    def finish():
+        compounds.append(Compound(tag, tuple(ids), tuple(classes), tuple(attrs), tuple(pseudos)))
+
+    while pos < n:
+        m = _COMBINATOR.match(text, pos)
+        if m:
+            pos = m.end()
+            if pos >= n:
+                break
+            if not started:
+                if m.group(1):
+                    return None         # a relative selector
+                continue
+            finish()
+            combinators.append(m.group(1) or ' ')
+            tag, ids, classes, attrs, pseudos = None, [], [], [], []
+            started = False
+            continue
+        m = _SIMPLE.match(text, pos)
+        if not m:
+            return None
+        started = True
+        pos = m.end()
+        if m.group('tag'):
+            tag = None if m.group('tag') == '*' else m.group('tag').lower()
+        elif m.group('id'):
+            ids.append(m.group('id'))
+        elif m.group('cls'):
+            classes.append(m.group('cls'))
+        elif m.group('attr'):
+            value = next((v for v in (m.group('dq'), m.group('sq'), m.group('bare')) if v is not None), None)
+            attrs.append((m.group('attr').lower(), m.group('op'), value, (m.group('flag') or '').lower() == 'i'))
+        else:
+            name = m.group('pseudo').lower()
+            argument = None
+            if m.group('paren'):
+                end = _closing_paren(text, pos)
+                if end < 0:
+                    return None
+                raw = text[pos:end]
+                pos = end + 1
+                if m.group('colons') == '::':
+                    continue
+                if name in SELECTOR_LISTS:
+                    argument = parse_selectors(raw)
+                    if argument is None:
+                        return None
+                elif name.startswith('nth-'):
+                    argument = _nth(raw)
+                    if argument is None:
+                        return None
+            if m.group('colons') == ':':
+                pseudos.append((name, argument))
+    if not started:
+        return None
+    finish()
+    return Selector(tuple(compounds), tuple(combinators))
+
+
+def parse_selectors(text):
+    """[Selector] of a comma-separated selector list, or None if any part
+    is not understood (escapes, namespaces, relative selectors, ...)."""
+    if '\\' in text or '|' in text.replace('|=', ''):
+        return None
+    selectors = []
+    for part in _split_list(text):
+        selector = _parse_selector(part.strip())
+        if selector is None:
+            return None
+        selectors.append(selector)
+    return selectors
+
+
+# -- matching --
+
+def _siblings(element):
+    return element.parent.children if element.parent is not None else [element]
+
+
+def _nth_match(position, a, b):
+    """position (1-based) = a*n + b for some n >= 0"""
+    if a == 0:
+        return position == b
+    return (position - b) % a == 0 and (position - b) // a >= 0
+
+
+def _structural(element, name, argument):
+    if name == 'root':
+        return element.parent is not None and element.parent.tag == '#document'
+    siblings = _siblings(element)
+    if name.endswith('of-type'):
+        siblings = [s for s in siblings if s.tag == element.tag]
+    index = siblings.index(element)
+    if name in ('first-child', 'first-of-type'):
+        return index == 0
+    if name in ('last-child', 'last-of-type'):
+        return index == len(siblings) - 1
+    if name in ('only-child', 'only-of-type'):
+        return len(siblings) == 1
+    position = len(siblings) - index if 'last' in name else index + 1
+    return _nth_match(position, *argument)
+
+
+def _attr_match(element, name, op, value, fold):
+    actual = element.attrs.get(name)
+    if actual is None:
+        return False
+    if op is None:
+        return True
+    if fold:
+        actual, value = actual.lower(), value.lower()
+    if op == '=':
+        return actual == value
+    if op == '~=':
+        return value in actual.split()
+    if op == '|=':
+        return actual == value or actual.startswith(value + '-')
+    if op == '^=':
+        return bool(value) and actual.startswith(value)
+    if op == '$=':
+        return bool(value) and actual.endswith(value)
+    return bool(value) and value in actual
+
+
+def _compound_match(element, compound, state):
+    names, interactive = state
+    if compound.tag and compound.tag != element.tag and not (names and compound.tag in names):
+        return False
+    for name in compound.ids:
+        if element.attrs.get('id') != name and not (names and name in names):
+            return False
+    for name in compound.classes:
+        if name not in element.classes and not (names and name in names):
+            return False
+    for attr in compound.attrs:
+        if not _attr_match(element, *attr) and not (names and attr[0] in names):
+            return False
+    for name, argument in compound.pseudos:
+        if name in STRUCTURAL:
+            if not _structural(element, name, argument):
+                return False
+        elif name == 'not':
+            # a script may change what the argument matches
+            if names is None and any(_match(element, s, len(s.compounds) - 1, state) for s in argument):
+                return False
+        elif name in SELECTOR_LISTS:
+            if not any(_match(element, s, len(s.compounds) - 1, state) for s in argument):
+                return False
+        elif name in USER_ACTION and not interactive:
+            return False
+    return True
+
+
+def _match(element, selector, i, state):
+    """Does element match selector.compounds[:i + 1]?"""
+    if not _compound_match(element, selector.compounds[i], state):
+        return False
+    if i == 0:
+        return True
+    combinator = selector.combinators[i - 1]
+    if combinator in ' >':
+        parent = element.parent
+        while parent is not None and parent.tag != '#document':
+            if _match(parent, selector, i - 1, state):
+                return True
+            if combinator == '>':
+                return False
+            parent = parent.parent
+        return False
+    siblings = _siblings(element)
+    index = siblings.index(element)
+    if combinator == '+':
+        return index > 0 and _match(siblings[index - 1], selector, i - 1, state)
+    return any(_match(s, selector, i - 1, state) for s in siblings[:index])
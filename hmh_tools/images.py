@@ -0,0 +1,408 @@
+"""
+HMH Tools - Responsive Image Variants
+
+Build stage for the photos and drawings pages show in <img>: every PNG or
+JPEG source gets resized, recompressed AVIF and WebP variants, and the
+<img> tags pointing at it are wrapped in a <picture> with one srcset per
+format. The original file stays the <img> fallback.
+
+  variants    optimized/<source path>-<width>-<hash>.<avif|webp>, one per
+              width in WIDTHS below the source's own width (plus the
+              source width, capped at the largest). The content hash in
+              the name means a variant never changes once published.
+  manifest    optimized/manifest.json: source -> sha1, encode settings
+              and variant files. A source whose sha1 and settings match
+              is skipped; variants of a changed or deleted source are
+              removed. The sha1 comes from the media inventory cache, so
+              unchanged sources are not even read.
+  encoding    in a process pool (--jobs N), with Pillow; AVIF needs a
+              Pillow built with libavif or the pillow-avif-plugin package
+              and is skipped otherwise. Without Pillow, pages can still be
+              rewritten from the variants already in the manifest.
+  pages       <img src> of a source with variants becomes
+              <picture><source type=avif><source type=webp><img></picture>;
+              pictures written by an earlier run are regenerated in place,
+              <img srcset> and hand-written <picture>s are left alone. All
+              pages are committed as one transaction (hmh_tools.transaction),
+              so --undo restores them. <img> and <picture> offsets come
+              from the shared page parse (Page.events()); the <img> targets
+              of each page are kept in .hmh_cache/images.pickle
+              (AuditCache), so unchanged pages are not parsed again.
+
+Usage:
+    python3 -m hmh_tools.images [project_directory]
+    python3 -m hmh_tools.images [project_directory] --jobs 8
+    python3 -m hmh_tools.images [project_directory] --dry-run
+    python3 -m hmh_tools.images [project_directory] --undo
+"""
+
+import io
+import json
+import os
+import posixpath
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from .atomic import atomic_write
+from .cache import AuditCache
+from .corpus import Corpus
+from .linkgraph import resolve_href
+from .media import MediaInventory
+from .rewrite import FileRewrite, Patch, apply_patches
+from .transaction import ConflictError, Transaction, list_transactions, undo
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:     # no encoding without Pillow; page rewriting still works
+    Image = ImageOps = None
+else:
+    try:
+        import pillow_avif  # noqa: F401  (registers AVIF on Pillow builds without it)
+    except ImportError:
+        pass
+
+TOOL_NAME = 'hmh-images'
+VARIANT_DIR = 'optimized'
+MANIFEST = 'manifest.json'
+
+WIDTHS = (480, 960, 1440, 1920)
+QUALITY = {'avif': 55, 'webp': 80}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+SOURCE_FORMATS = ('png', 'jpeg')
+
+
+def encoders():
+    """Variant formats this Pillow can write, best first."""
+    if Image is None:
+        return ()
+    Image.init()
+    return tuple(fmt for fmt in ('avif', 'webp') if fmt.upper() in Image.SAVE)
+
+
+def settings_key(formats):
+    """Changes whenever a variant would be encoded differently."""
+    return json.dumps({'widths': WIDTHS, 'quality': {f: QUALITY[f] for f in formats}}, sort_keys=True)
+
+
+def variant_widths(width):
+    widths = [w for w in WIDTHS if w < width]
+    widths.append(min(width, WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def variant_path(rel_path, sha1, width, fmt):
+    stem = posixpath.splitext(rel_path.replace(os.sep, '/'))[0]
+    return f"{VARIANT_DIR}/{stem}-{width}-{sha1[:8]}.{fmt}"
+
+
+def encode(root, rel_path, sha1, formats):
+    """Worker: write every variant of one source; returns its manifest entry."""
+    root = Path(root)
+    with Image.open(root / rel_path) as image:
+        image = ImageOps.exif_transpose(image)
+        alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if alpha else 'RGB')
+        variants = {fmt: [] for fmt in formats}
+        for width in variant_widths(image.width):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                path = variant_path(rel_path, sha1, width, fmt)
+                target = root / path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                encoded = io.BytesIO()
+                resized.save(encoded, fmt.upper(), quality=QUALITY[fmt])
+                atomic_write(target, encoded.getvalue())
+                variants[fmt].append([width, path, target.stat().st_size])
+        return {'sha1': sha1, 'width': image.width, 'height': image.height, 'variants': variants}
+
+
+class VariantManifest:
+    """optimized/manifest.json: what was encoded from which source content."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.path = self.root / VARIANT_DIR / MANIFEST
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.settings = data.get('settings')
+        self.sources = data.get('sources', {})
+
+    def current(self, rel_path, sha1, settings):
+        """True when the variants of rel_path match its content and settings."""
+        entry = self.sources.get(rel_path)
+        if entry is None or entry['sha1'] != sha1 or self.settings != settings:
+            return False
+        return all((self.root / path).exists()
+                   for variants in entry['variants'].values() for _, path, _ in variants)
+
+    def replace(self, rel_path, entry):
+        """Record a new entry; variant files of the old one are deleted."""
+        old = self.sources.get(rel_path)
+        self.sources[rel_path] = entry
+        if old is not None:
+            self._remove_files(old, keep=entry)
+
+    def drop(self, rel_path):
+        self._remove_files(self.sources.pop(rel_path), keep=None)
+
+    def _remove_files(self, entry, keep):
+        kept = set()
+        if keep is not None:
+            kept = {path for variants in keep['variants'].values() for _, path, _ in variants}
+        for variants in entry['variants'].values():
+            for _, path, _ in variants:
+                if path not in kept:
+                    try:
+                        os.unlink(self.root / path)
+                    except FileNotFoundError:
+                        pass
+
+    def save(self, settings):
+        self.settings = settings
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, json.dumps({'settings': settings,
+                                            'sources': dict(sorted(self.sources.items()))}, indent=1))
+
+
+# -- page rewriting --
+
+def locate_images(rel_path, page):
+    """Offsets of the <img> tags of one page and of the <picture>s around
+    them, from its parse: (images, pictures).
+
+    images are (start, end, attrs, picture), picture None outside one;
+    pictures are (start, end, img index) of the pictures written by this tool.
+    """
+    images = []
+    pictures = []
+    picture = None      # {'start', 'generated', 'img'} of the open <picture>
+    for kind, tag, attrs, start, end in page.events():
+        if kind == 'end':
+            if tag == 'picture' and picture is not None:
+                if picture['generated'] and picture['img'] is not None:
+                    pictures.append((picture['start'], end, picture['img']))
+                picture = None
+        elif tag == 'picture':
+            picture = {'start': start, 'generated': False, 'img': None}
+        elif tag == 'source' and picture is not None:
+            srcset = (attrs.get('srcset') or '').split()
+            target = resolve_href(rel_path, unquote(srcset[0])) if srcset else None
+            if target is not None and target.startswith(VARIANT_DIR + os.sep):
+                picture['generated'] = True
+        elif tag == 'img':
+            if picture is not None:
+                picture['img'] = len(images)
+            images.append((start, end, attrs, picture))
+    return images, pictures
+
+
+def _variant_url(page, path, rooted):
+    if rooted:
+        return quote(f"/{path}")
+    return quote(posixpath.relpath(path, posixpath.dirname(page.replace(os.sep, '/')) or '.'))
+
+
+def picture_markup(page, img_tag, attrs, entry):
+    """<picture> around an unchanged <img> tag, one <source> per format."""
+    rooted = (attrs.get('src') or '').startswith('/')
+    width = attrs.get('width', '')
+    sizes = f"(max-width: {width}px) 100vw, {width}px" if width.isdigit() else '100vw'
+    sources = []
+    for fmt in ('avif', 'webp'):
+        variants = entry['variants'].get(fmt)
+        if not variants:
+            continue
+        srcset = ', '.join(f"{_variant_url(page, path, rooted)} {w}w" for w, path, _ in variants)
+        sources.append(f'<source type="{MIME_TYPES[fmt]}" srcset="{srcset}" sizes="{sizes}">')
+    return f"<picture>{''.join(sources)}{img_tag}</picture>"
+
+
+def page_patches(rel_path, text, page, sources):
+    """Patches turning the <img>s of one page (text and its parse_page())
+    into <picture>s, given {source rel_path: manifest entry}."""
+    images, pictures = locate_images(rel_path, page)
+    patches = []
+    regenerated = set()
+    for start, end, index in pictures:
+        img_start, img_end, attrs, _ = images[index]
+        regenerated.add(index)
+        target = resolve_href(rel_path, unquote(attrs.get('src') or ''))
+        entry = sources.get(target)
+        img_tag = text[img_start:img_end]
+        new = picture_markup(rel_path, img_tag, attrs, entry) if entry else img_tag
+        if new != text[start:end]:
+            patches.append(Patch(start, end, new, 'picture'))
+    for index, (start, end, attrs, picture) in enumerate(images):
+        if picture is not None or index in regenerated or attrs.get('srcset'):
+            continue
+        entry = sources.get(resolve_href(rel_path, unquote(attrs.get('src') or '')))
+        if entry is not None:
+            patches.append(Patch(start, end, picture_markup(rel_path, text[start:end], attrs, entry), 'picture'))
+    return patches
+
+
+def rewrite_pages(root, corpus, sources):
+    """FileRewrite of every page whose <img> markup changes."""
+    changes = []
+    for doc in corpus.html():
+        if doc.rel_path.startswith(VARIANT_DIR + os.sep) or '<img' not in doc.text:
+            continue
+        patches = page_patches(doc.rel_path, doc.text, doc.page, sources)
+        if patches:
+            old = doc.path.read_bytes()
+            new = apply_patches(doc.text, patches).encode('utf-8')
+            if new != old:
+                changes.append(FileRewrite(doc.path, old, new, patches))
+    return changes
+
+
+def page_images(doc):
+    """Files the <img src>s of one page point at."""
+    targets = set()
+    for tag, attrs, _ in doc.page.tags:
+        if tag == 'img' and attrs.get('src'):
+            target = resolve_href(doc.rel_path, unquote(attrs['src']))
+            if target is not None:
+                targets.add(target)
+    return targets
+
+
+def image_sources(corpus, records, cache=None):
+    """Media records of the PNG/JPEG files some page shows in an <img>."""
+    used = set()
+    for doc in corpus.html():
+        if cache is not None and cache.has(doc, 'img'):
+            targets = cache.get(doc, 'img')
+        else:
+            targets = page_images(doc)
+            if cache is not None:
+                cache.put(doc, 'img', targets)
+        used |= targets
+    return {rel_path: record for rel_path, record in records.items()
+            if rel_path in used and record.format in SOURCE_FORMATS}
+
+
+def build(root, jobs=None, dry_run=False):
+    """Encode what changed and rewrite the pages; returns a summary dict."""
+    root = Path(root)
+    cache = AuditCache(root, 'images')
+    corpus = Corpus(root, cache=cache)
+    inventory = MediaInventory(root, corpus)
+    records = inventory.scan()
+    inventory.save()
+    sources = image_sources(corpus, records, cache)
+    cache.save()
+    manifest = VariantManifest(root)
+    formats = encoders()
+
+    pending = []
+    if formats:
+        settings = settings_key(formats)
+        pending = [rel_path for rel_path, record in sorted(sources.items())
+                   if not manifest.current(rel_path, record.sha1, settings)]
+    summary = {'sources': len(sources), 'formats': formats, 'encoded': [], 'failed': [],
+               'removed': [], 'pages': [], 'txid': None}
+
+    if dry_run:
+        summary['encoded'] = pending
+    else:
+        try:
+            if pending:
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    futures = {pool.submit(encode, root, rel_path, records[rel_path].sha1, formats): rel_path
+                               for rel_path in pending}
+                    for future in as_completed(futures):
+                        rel_path = futures[future]
+                        try:
+                            manifest.replace(rel_path, future.result())
+                            summary['encoded'].append(rel_path)
+                        except Exception as e:
+                            summary['failed'].append(f"{rel_path}: {e}")
+            for rel_path in [p for p in manifest.sources if p not in records]:
+                manifest.drop(rel_path)
+                summary['removed'].append(rel_path)
+        finally:
+            if formats and (summary['encoded'] or summary['removed']):
+                manifest.save(settings_key(formats))
+
+    # Only variants that exist on disk end up in a srcset
+    usable = {rel_path: entry for rel_path, entry in manifest.sources.items()
+              if rel_path in records and entry['sha1'] == records[rel_path].sha1}
+    changes = rewrite_pages(root, corpus, usable)
+    summary['pages'] = [str(change.path.relative_to(root)) for change in changes]
+    summary['bytes_before'] = sum(records[p].bytes for p in usable)
+    summary['bytes_after'] = sum(min(v[-1][2] for v in entry['variants'].values() if v)
+                                 for entry in usable.values() if any(entry['variants'].values()))
+    if dry_run:
+        summary['diff'] = ''.join(change.diff(str(change.path.relative_to(root))) for change in changes)
+    elif changes:
+        with Transaction(root, TOOL_NAME) as tx:
+            for change in changes:
+                tx.stage(str(change.path.relative_to(root)), change.old, change.new)
+        summary['txid'] = tx.txid
+    return summary
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate AVIF/WebP variants and <picture> markup')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Encoding processes (default: one per CPU)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='List what would be encoded, print the page diff, write nothing')
+    parser.add_argument('--undo', nargs='?', const='latest', metavar='TXID',
+                        help='Restore the pages of the latest (or given) run and exit')
+    args = parser.parse_args()
+
+    if args.undo:
+        txid = args.undo
+        if txid == 'latest':
+            runs = [m for m in list_transactions(args.project_dir)
+                    if m['tool'] == TOOL_NAME and m['status'] == 'committed']
+            if not runs:
+                print("Nothing to undo")
+                return 1
+            txid = runs[-1]['txid']
+        restored, skipped = undo(args.project_dir, txid)
+        print(f"Restored {len(restored)} pages, skipped {len(skipped)} edited since")
+        return 1 if skipped else 0
+
+    if Image is None:
+        print("Pillow not installed: no variants are encoded (pip install Pillow)")
+    elif 'avif' not in encoders():
+        print("AVIF encoder not available: WebP variants only (pip install pillow-avif-plugin)")
+
+    try:
+        summary = build(args.project_dir, args.jobs, args.dry_run)
+    except ConflictError as e:
+        print(f"ABORTED, pages unchanged: {e}")
+        return 1
+
+    if args.dry_run:
+        sys.stdout.write(summary['diff'])
+    print(f"Sources in <img>: {summary['sources']}")
+    print(f"{'To encode' if args.dry_run else 'Encoded'}: {len(summary['encoded'])}"
+          f"{' (' + ', '.join(summary['formats']) + ')' if summary['formats'] else ''}")
+    for failure in summary['failed']:
+        print(f"  FAILED: {failure}")
+    if summary['removed']:
+        print(f"Variants removed for {len(summary['removed'])} deleted sources")
+    if summary['bytes_before']:
+        print(f"Largest variant vs source: {summary['bytes_after'] / 1e6:.1f} MB "
+              f"of {summary['bytes_before'] / 1e6:.1f} MB")
+    print(f"Pages {'to rewrite' if args.dry_run else 'rewritten'}: {len(summary['pages'])}")
+    if summary['txid']:
+        print(f"Undo: python3 -m hmh_tools.images --undo {summary['txid']}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+HMH Tools - Site Link Graph
+
+Nodes are the files of the site (relative paths), edges are href / src /
+stylesheet references from HTML pages and url() / @import references from
+CSS files. Every edge keeps its kind and line number, and the graph keeps
+an inbound index next to the outbound one, so
+
+  - who links here?                 -> graph.links_to(path)
+  - what breaks if I delete this?   -> graph.impact_of_deleting(path)
+  - which pages nobody links to?    -> graph.orphans()
+
+are lookups proportional to the node's degree instead of a rescan.
+
+Usage:
+    python3 -m hmh_tools.linkgraph [project_directory] --links-to about.html
+    python3 -m hmh_tools.linkgraph [project_directory] --orphans
+    python3 -m hmh_tools.linkgraph [project_directory] --impact css/styles.css
+"""
+
+import os
+import posixpath
+import re
+import sys
+from collections import defaultdict, namedtuple
+
+# target is a site-relative path, or None for URLs outside the site tree
+Edge = namedtuple('Edge', 'source target kind line url')
+
+EXTERNAL_PREFIXES = ('http://', 'https://', '//', 'mailto:', 'tel:', 'javascript:', 'data:')
+
+# Pages that are reachable without an inbound link
+ENTRY_POINTS = {'index.html', '404.html'}
+
+CSS_URL = re.compile(r'''url\(\s*['"]?([^'")]+?)['"]?\s*\)|@import\s+['"]([^'"]+)['"]''')
+
+
+def resolve_href(source, url):
+    """Site-relative path a reference points at, or None if it leaves the site.
+
+    Query strings and fragments are dropped; a reference to a directory
+    ('../', 'physics/') resolves to that directory's index.html.
+    """
+    if not url or url.startswith(EXTERNAL_PREFIXES) or url.startswith('#'):
+        return None
+    clean = url.split('#')[0].split('?')[0]
+    if not clean:
+        return None
+
+    source = source.replace(os.sep, '/')
+    if clean.startswith('/'):
+        target = posixpath.normpath(clean.lstrip('/') or '.')
+    else:
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(source), clean))
+
+    if target == '..' or target.startswith('../'):
+        return None
+    if target == '.':
+        return 'index.html'
+    if clean.endswith('/'):
+        target = f"{target}/index.html"
+    return target.replace('/', os.sep)
+
+
+class LinkGraph:
+    """Files of the site and every reference between them, indexed both ways."""
+
+    def __init__(self, nodes=()):
+        self.nodes = set(nodes)
+        self.outbound = defaultdict(list)
+        self.inbound = defaultdict(list)
+
+    def node_for(self, target):
+        """Map a directory reference without trailing slash to its index.html."""
+        if target is not None and target not in self.nodes:
+            index = os.path.join(target, 'index.html')
+            if index in self.nodes:
+                return index
+        return target
+
+    def add_edge(self, edge):
+        self.outbound[edge.source].append(edge)
+        if edge.target is not None:
+            self.inbound[edge.target].append(edge)
+
+    def remove_source(self, source):
+        """Drop every edge leaving source (before re-adding a changed page)."""
+        for edge in self.outbound.pop(source, []):
+            if edge.target is not None:
+                edges = self.inbound[edge.target]
+                edges.remove(edge)
+                if not edges:
+                    del self.inbound[edge.target]
+
+    def links_from(self, path):
+        return self.outbound.get(path, [])
+
+    def links_to(self, path):
+        return self.inbound.get(path, [])
+
+    def broken(self):
+        """Edges whose target is inside the site but is not a file."""
+        return [edge for edges in self.outbound.values() for edge in edges
+                if edge.target is not None and edge.target not in self.nodes]
+
+    def impact_of_deleting(self, path):
+        """Edges from other files that would break if path were removed."""
+        return [edge for edge in self.links_to(path) if edge.source != path]
+
+    def orphans(self, entry_points=ENTRY_POINTS):
+        """HTML pages that no other file links to."""
+        return sorted(
+            node for node in self.nodes
+            if node.endswith('.html') and node not in entry_points
+            and not any(edge.source != node for edge in self.links_to(node))
+        )
+
+    def add_document(self, doc):
+        """Add every outbound reference of one corpus Document."""
+        if doc.kind == 'html':
+            for link in doc.page.links:
+                target = self.node_for(resolve_href(doc.rel_path, link.url))
+                self.add_edge(Edge(doc.rel_path, target, link.kind, link.line, link.url))
+        elif doc.kind == 'css':
+            text = doc.text
+            for match in CSS_URL.finditer(text):
+                url = match.group(1) or match.group(2)
+                kind = 'url' if match.group(1) else 'import'
+                line = text.count('\n', 0, match.start()) + 1
+                target = self.node_for(resolve_href(doc.rel_path, url))
+                self.add_edge(Edge(doc.rel_path, target, kind, line, url))
+
+    @classmethod
+    def build(cls, corpus):
+        graph = cls(corpus.files)
+        for doc in corpus:
+            graph.add_document(doc)
+        return graph
+
+
+def main():
+    import argparse
+    from .corpus import Corpus
+
+    parser = argparse.ArgumentParser(description='HMH site link graph')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--links-to', metavar='PATH', help='Files that reference PATH')
+    parser.add_argument('--impact', metavar='PATH', help='References that break if PATH is deleted')
+    parser.add_argument('--orphans', action='store_true', help='HTML pages nothing links to')
+    args = parser.parse_args()
+
+    graph = LinkGraph.build(Corpus(args.project_dir))
+    print(f"{len(graph.nodes)} files, {sum(len(e) for e in graph.outbound.values())} references")
+
+    if args.links_to:
+        edges = graph.links_to(args.links_to)
+        print(f"\n{len(edges)} references to {args.links_to}:")
+        for edge in edges:
+            print(f"  {edge.source}:{edge.line} [{edge.kind}] {edge.url}")
+    if args.impact:
+        edges = graph.impact_of_deleting(args.impact)
+        print(f"\nDeleting {args.impact} breaks {len(edges)} references:")
+        for edge in edges:
+            print(f"  {edge.source}:{edge.line} [{edge.kind}] {edge.url}")
+    if args.orphans:
+        orphans = graph.orphans()
+        print(f"\n{len(orphans)} orphaned pages:")
+        for path in orphans:
+            print(f"  {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+HMH Tools - Stand-in Link Server
+
+A local HTTP/1.1 server on 127.0.0.1 that plays the outbound sites, and
+a set of scenarios that drive ExternalLinkChecker.check_all against it,
+so the external checker can be re-verified offline in seconds:
+
+  statuses      200, 404, HEAD answered 405 (GET fallback), redirects,
+                a redirect to a 404, a refused connection
+  per-host      requests in flight to one host never exceed per_host,
+                while a second host name (localhost) runs alongside;
+                keep-alive connections are reused across requests
+  ttl           a fresh result comes from the cache; ttl=0 re-checks;
+                failures use error_ttl
+  sweep         many URLs with added latency: cold, then warm from cache
+
+Paths the server knows (any other path is a 404):
+    /ok/...             200 for HEAD and GET
+    /no-head/...        405 for HEAD, 200 for GET
+    /redirect/...       301 to /ok/...
+    /gone/...           302 to /missing/...
+
+--latency adds a delay to every response. With --serve the server just
+runs, for pointing link_checker.py --external at it by hand.
+
+Usage:
+    python3 -m hmh_tools.linkserver
+    python3 -m hmh_tools.linkserver --sweep 305 --latency 0.05
+    python3 -m hmh_tools.linkserver --serve --port 8765
+"""
+
+import asyncio
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from .external import ExternalLinkChecker
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, location=None, body=b''):
+        server = self.server
+        host = self.headers.get('Host', '').split(':')[0]
+        with server.lock:
+            server.in_flight[host] += 1
+            server.peak[host] = max(server.peak[host], server.in_flight[host])
+            server.requests[self.command] += 1
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            self.send_response(status)
+            if location:
+                self.send_header('Location', location)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight[host] -= 1
+
+    def _route(self):
+        path = self.path
+        if path.startswith('/ok/'):
+            return self._respond(200, body=b'ok')
+        if path.startswith('/no-head/'):
+            return self._respond(405 if self.command == 'HEAD' else 200, body=b'ok')
+        if path.startswith('/redirect/'):
+            return self._respond(301, location='/ok/' + path[len('/redirect/'):])
+        if path.startswith('/gone/'):
+            return self._respond(302, location='/missing/' + path[len('/gone/'):])
+        return self._respond(404, body=b'not found')
+
+    do_HEAD = _route
+    do_GET = _route
+
+
+class StandInServer:
+    """ThreadingHTTPServer on 127.0.0.1 in a background thread.
+
+    Counts requests per method and the peak number of requests in flight
+    per Host header.
+    """
+
+    def __init__(self, port=0, latency=0.0):
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.lock = threading.Lock()
+        self.reset()
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def url(self, path, host='127.0.0.1'):
+        return f"http://{host}:{self.port}{path}"
+
+    def reset(self):
+        self.server.in_flight = Counter()
+        self.server.peak = Counter()
+        self.server.requests = Counter()
+
+    @property
+    def peak(self):
+        return self.server.peak
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def refused_url():
+    """URL of a local port nothing listens on."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/ok/"
+
+
+def _check(checker, urls):
+    return asyncio.run(checker.check_all(urls))
+
+
+def scenario_statuses(server, cache_dir):
+    checker = ExternalLinkChecker(cache_path=cache_dir / 'statuses.pickle')
+    expect = {
+        server.url('/ok/a'): (200, True, 'HEAD', server.url('/ok/a')),
+        server.url('/missing/a'): (404, False, 'GET', server.url('/missing/a')),
+        server.url('/no-head/a'): (200, True, 'GET', server.url('/no-head/a')),
+        server.url('/redirect/a'): (200, True, 'HEAD', server.url('/ok/a')),
+        server.url('/gone/a'): (404, False, 'GET', server.url('/missing/a')),
+        refused_url(): (None, False, 'GET', None),
+    }
+    results = _check(checker, list(expect))
+    failures = []
+    for url, (status, ok, method, final) in expect.items():
+        got = results[url]
+        if (got.status, got.ok, got.method) != (status, ok, method) or (final and got.url != final):
+            failures.append(f"{url}: expected {status}/{ok}/{method}, got "
+                            f"{got.status}/{got.ok}/{got.method} {got.url} {got.error or ''}")
+    refused = results[list(expect)[-1]]
+    if refused.error is None:
+        failures.append("refused connection reported no error")
+    return failures
+
+
+def scenario_per_host(server, cache_dir):
+    server.reset()
+    latency, server.server.latency = server.server.latency, max(server.server.latency, 0.05)
+    try:
+        checker = ExternalLinkChecker(cache_path=cache_dir / 'per-host.pickle', per_host=3)
+        urls = [server.url(f"/ok/{i}") for i in range(24)]
+        urls += [server.url(f"/ok/{i}", host='localhost') for i in range(24)]
+        _check(checker, urls)
+    finally:
+        server.server.latency = latency
+    failures = []
+    for host in ('127.0.0.1', 'localhost'):
+        if not 1 <= server.peak[host] <= 3:
+            failures.append(f"{host}: {server.peak[host]} requests in flight, limit 3")
+    if checker.stats['connections'] >= checker.stats['requests']:
+        failures.append(f"no connection reuse: {checker.summary()}")
+    return failures
+
+
+def scenario_ttl(server, cache_dir):
+    path = cache_dir / 'ttl.pickle'
+    urls = [server.url('/ok/ttl'), server.url('/missing/ttl'), refused_url()]
+    checker = ExternalLinkChecker(cache_path=path)
+    _check(checker, urls)
+    checker.save()
+
+    failures = []
+    server.reset()
+    warm = ExternalLinkChecker(cache_path=path)
+    _check(warm, urls)
+    if warm.stats['cached'] != len(urls) or sum(server.requests.values()):
+        failures.append(f"warm run was not served from cache: {warm.summary()}")
+
+    expired = ExternalLinkChecker(cache_path=path, ttl=0)
+    _check(expired, urls)
+    # ttl=0 re-checks the answered URLs; the refused one keeps its error_ttl
+    if expired.stats['checked'] != 2 or expired.stats['cached'] != 1:
+        failures.append(f"ttl=0 should re-check 2 and keep 1: {expired.summary()}")
+
+    errors_expired = ExternalLinkChecker(cache_path=path, error_ttl=0)
+    _check(errors_expired, urls)
+    if errors_expired.stats['checked'] != 1:
+        failures.append(f"error_ttl=0 should re-check only the failure: {errors_expired.summary()}")
+    return failures
+
+
+SCENARIOS = [
+    ('statuses', scenario_statuses),
+    ('per-host', scenario_per_host),
+    ('ttl', scenario_ttl),
+]
+
+
+def sweep(server, count, cache_dir):
+    """Cold then warm check of count URLs; prints the timings."""
+    kinds = ['/ok/', '/no-head/', '/redirect/', '/missing/']
+    urls = [server.url(f"{kinds[i % len(kinds)]}{i}") for i in range(count)]
+    checker = ExternalLinkChecker(cache_path=cache_dir / 'sweep.pickle')
+    started = time.perf_counter()
+    _check(checker, urls)
+    cold = time.perf_counter() - started
+    checker.save()
+    warm_checker = ExternalLinkChecker(cache_path=cache_dir / 'sweep.pickle')
+    started = time.perf_counter()
+    _check(warm_checker, urls)
+    warm = time.perf_counter() - started
+    print(f"  sweep: {count} URLs cold {cold:.2f}s ({checker.summary()}), warm {warm:.2f}s")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Check the external link checker against a local server')
+    parser.add_argument('--latency', type=float, default=0.0, metavar='SECONDS',
+                        help='Delay added to every response')
+    parser.add_argument('--sweep', type=int, default=0, metavar='N', help='Also time a sweep of N URLs')
+    parser.add_argument('--serve', action='store_true', help='Only run the server')
+    parser.add_argument('--port', type=int, default=0)
+    args = parser.parse_args()
+
+    with StandInServer(args.port, args.latency) as server:
+        if args.serve:
+            print(f"Serving on {server.url('/')} (Ctrl-C to stop)", flush=True)
+            try:
+                server.thread.join()
+            except KeyboardInterrupt:
+                pass
+            return 0
+
+        failed = 0
+        with tempfile.TemporaryDirectory(prefix='hmh-linkserver-') as tmp:
+            for name, scenario in SCENARIOS:
+                failures = scenario(server, Path(tmp))
+                print(f"  {'FAIL' if failures else 'ok  '} {name}")
+                for failure in failures:
+                    print(f"       {failure}")
+                failed += bool(failures)
+            if args.sweep:
+                sweep(server, args.sweep, Path(tmp))
+    print(f"{len(SCENARIOS) - failed}/{len(SCENARIOS)} scenarios passed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
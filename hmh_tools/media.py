@@ -0,0 +1,501 @@
+"""
+HMH Tools - Media Inventory
+
+Indexes every image and video of the site: format (from the file's
+magic bytes, not its extension), bytes, dimensions
+(duration for video), a sha1 of the content and, when Pillow is
+installed, a 64-bit perceptual hash (dHash) of images. Each file is
+streamed once; dimensions come from the container headers (PNG IHDR,
+JPEG SOFn, WebP VP8/VP8L/VP8X, GIF, SVG width/height/viewBox, MP4
+tkhd/mvhd), so no decoder is needed for them.
+
+Records, and the media references of every page, stylesheet and
+script, are cached in .hmh_cache/media.pickle by (mtime, size): a repeat
+run only stats the files.
+
+The report lists
+  duplicates      identical content (sha1) under different paths, and
+                  near-duplicates (same dHash) with Pillow
+  oversized       images over the byte or pixel budget, videos over the
+                  byte budget
+  mismatched      content in another format than the extension says
+  invalid         not media at all (an error page saved as .png)
+  unreferenced    media no HTML/CSS reference resolves to: href, src,
+                  srcset, poster, data-src, url() in stylesheets, <style>
+                  and style="" - and whose name no page or script
+                  mentions either
+
+Usage:
+    python3 -m hmh_tools.media [project_directory]
+    python3 -m hmh_tools.media [project_directory] --max-image-kb 300 --max-pixels 2048
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import struct
+import sys
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from .atomic import atomic_write
+from .cache import CACHE_DIR
+from .corpus import Corpus
+from .linkgraph import CSS_URL, resolve_href
+from .report import is_tool_report
+
+try:
+    from PIL import Image
+except ImportError:     # perceptual hashes are skipped without Pillow
+    Image = None
+
+MEDIA_FORMATS = {
+    '.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg', '.webp': 'webp', '.gif': 'gif',
+    '.svg': 'svg', '.mp4': 'mp4', '.m4v': 'mp4', '.mov': 'mp4', '.webm': 'webm',
+}
+VIDEO_FORMATS = {'mp4', 'webm'}
+
+# Budgets for the oversized list (overridable on the command line)
+MAX_IMAGE_BYTES = 500 * 1024
+MAX_IMAGE_PIXELS = 2560          # longest side
+MAX_VIDEO_BYTES = 50 * 1024 * 1024
+
+CACHE_FORMAT = 2
+CHUNK = 1 << 20
+
+# format is sniffed from the content (None: not a media file), extension
+# is what the file name claims; width/height in pixels (None if unknown),
+# duration in seconds (video)
+MediaRecord = namedtuple('MediaRecord',
+                         'path format extension bytes width height duration sha1 phash')
+
+# Quoted or bare mentions of a media file name in page/script text
+MEDIA_MENTION = re.compile(r'[\w./%-]+\.(?:png|jpe?g|webp|gif|svg|mp4|m4v|mov|webm)\b', re.IGNORECASE)
+
+# Attributes that hold a media URL besides href/src (srcset is a list)
+MEDIA_ATTRS = ('poster', 'data-src', 'data-bg', 'content')
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_SVG_LENGTH = re.compile(r'([\d.]+)\s*(px)?\s*$')
+
+
+def sniff(head):
+    """Media format of a file from its first bytes, or None."""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[:4] == b'GIF8':
+        return 'gif'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'webm'
+    if b'<svg' in head[:1024].lower():
+        return 'svg'
+    return None
+
+
+# -- header parsers: (width, height, duration) from an open binary file --
+
+def _png_size(f):
+    head = f.read(24)
+    if head[12:16] != b'IHDR':
+        return None, None, None
+    width, height = struct.unpack('>II', head[16:24])
+    return width, height, None
+
+
+def _gif_size(f):
+    head = f.read(10)
+    width, height = struct.unpack('<HH', head[6:10])
+    return width, height, None
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None, None, None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue        # no length field
+        if marker == 0xD9:
+            return None, None, None
+        length = f.read(2)
+        if len(length) < 2:
+            return None, None, None
+        size = struct.unpack('>H', length)[0]
+        if marker in _SOF_MARKERS:
+            data = f.read(5)
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height, None
+        f.seek(size - 2, os.SEEK_CUR)
+
+
+def _webp_size(f):
+    head = f.read(30)
+    chunk = head[12:16]
+    if chunk == b'VP8 ':
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3FFF, height & 0x3FFF, None
+    if chunk == b'VP8L':
+        b0, b1, b2, b3 = head[21:25]
+        width = 1 + (((b1 & 0x3F) << 8) | b0)
+        height = 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+        return width, height, None
+    if chunk == b'VP8X':
+        width = 1 + int.from_bytes(head[24:27], 'little')
+        height = 1 + int.from_bytes(head[27:30], 'little')
+        return width, height, None
+    return None, None, None
+
+
+def _svg_size(f):
+    head = f.read(8192).decode('utf-8', errors='ignore')
+    m = re.search(r'<svg\b[^>]*>', head)
+    if not m:
+        return None, None, None
+    attrs = dict(re.findall(r'([\w:-]+)\s*=\s*["\']([^"\']*)["\']', m.group()))
+    width = _SVG_LENGTH.match(attrs.get('width', ''))
+    height = _SVG_LENGTH.match(attrs.get('height', ''))
+    if width and height:
+        return round(float(width.group(1))), round(float(height.group(1))), None
+    box = attrs.get('viewBox', '').replace(',', ' ').split()
+    if len(box) == 4:
+        try:
+            return round(float(box[2])), round(float(box[3])), None
+        except ValueError:
+            pass
+    return None, None, None
+
+
+def _mp4_boxes(f, start, end):
+    """(type, payload offset, payload end) of the boxes in [start, end)."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack('>I4s', header)
+        offset = pos + 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            offset += 8
+        elif size == 0:
+            size = end - pos
+        if size < 8:
+            return
+        yield kind, offset, min(pos + size, end)
+        pos += size
+
+
+def _mp4_size(f):
+    end = f.seek(0, os.SEEK_END)
+    width = height = duration = None
+    for kind, offset, box_end in _mp4_boxes(f, 0, end):
+        if kind != b'moov':
+            continue
+        for sub, sub_offset, sub_end in _mp4_boxes(f, offset, box_end):
+            if sub == b'mvhd':
+                f.seek(sub_offset)
+                version = f.read(1)[0]
+                f.seek(sub_offset + (20 if version == 1 else 12))
+                if version == 1:
+                    timescale, length = struct.unpack('>IQ', f.read(12))
+                else:
+                    timescale, length = struct.unpack('>II', f.read(8))
+                if timescale:
+                    duration = round(length / timescale, 2)
+            elif sub == b'trak':
+                for box, box_offset, box_stop in _mp4_boxes(f, sub_offset, sub_end):
+                    if box == b'tkhd' and box_stop - box_offset >= 8:
+                        # width/height are the last two 16.16 fixed-point fields
+                        f.seek(box_stop - 8)
+                        w, h = struct.unpack('>II', f.read(8))
+                        if (w >> 16) * (h >> 16) > (width or 0) * (height or 0):
+                            width, height = w >> 16, h >> 16
+        break
+    return width, height, duration
+
+
+HEADER_PARSERS = {
+    'png': _png_size, 'gif': _gif_size, 'jpeg': _jpeg_size,
+    'webp': _webp_size, 'svg': _svg_size, 'mp4': _mp4_size,
+}
+
+
+def _dhash(path):
+    """64-bit difference hash of an image as 16 hex digits (Pillow only)."""
+    with Image.open(path) as image:
+        pixels = list(image.convert('L').resize((9, 8)).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def inspect(root, rel_path):
+    """MediaRecord of one file: header fields, then one streamed sha1 pass."""
+    extension = MEDIA_FORMATS[os.path.splitext(rel_path)[1].lower()]
+    full = Path(root) / rel_path
+    width = height = duration = None
+    sha1 = hashlib.sha1()
+    with open(full, 'rb') as f:
+        fmt = sniff(f.read(1024))
+        f.seek(0)
+        parser = HEADER_PARSERS.get(fmt)
+        if parser is not None:
+            try:
+                width, height, duration = parser(f)
+            except (struct.error, IndexError, ValueError, OSError):
+                pass
+            f.seek(0)
+        size = 0
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            sha1.update(chunk)
+            size += len(chunk)
+    phash = None
+    if Image is not None and fmt in ('png', 'jpeg', 'webp', 'gif'):
+        try:
+            phash = _dhash(full)
+        except Exception:
+            pass
+    return MediaRecord(rel_path, fmt, extension, size, width, height, duration, sha1.hexdigest(), phash)
+
+
+class MediaInventory:
+    """Every media file of the site, inspected once and cached by stamp."""
+
+    def __init__(self, root, corpus=None):
+        self.root = Path(root)
+        self.corpus = corpus or Corpus(self.root)
+        self.cache_path = self.root / CACHE_DIR / 'media.pickle'
+        self.records = {}
+        self.inspected = 0
+        self._cached = {}       # rel_path -> (stamp, MediaRecord)
+        self._refs = {}         # source rel_path -> (stamp, resolved, mentioned)
+        self._load()
+
+    def _stamp(self, rel_path):
+        stat = (self.root / rel_path).stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return
+        if data.get('format') != CACHE_FORMAT or data.get('pillow') != (Image is not None):
+            return
+        self._cached = data['records']
+        self._refs = data['references']
+
+    def save(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.cache_path, pickle.dumps({'format': CACHE_FORMAT, 'pillow': Image is not None,
+                                                    'records': self._cached, 'references': self._refs},
+                                                   protocol=pickle.HIGHEST_PROTOCOL))
+
+    def scan(self):
+        """Inspect new or changed media; returns {rel_path: MediaRecord}."""
+        current = {}
+        for rel_path in self.corpus.files:
+            if os.path.splitext(rel_path)[1].lower() not in MEDIA_FORMATS:
+                continue
+            stamp = self._stamp(rel_path)
+            cached = self._cached.get(rel_path)
+            if cached is not None and cached[0] == stamp:
+                record = cached[1]
+            else:
+                record = inspect(self.root, rel_path)
+                self.inspected += 1
+            current[rel_path] = (stamp, record)
+        self._cached = current
+        self.records = {rel_path: record for rel_path, (_, record) in current.items()}
+        return self.records
+
+    # -- references --
+
+    def _source_references(self, rel_path):
+        """(resolved targets, mentioned file names) of one page, sheet or script."""
+        resolved = set()
+        mentioned = set()
+
+        def add(url):
+            target = resolve_href(rel_path, url.strip())
+            if target is not None:
+                resolved.add(target)
+
+        doc = self.corpus.get(rel_path)
+        if doc is None:     # a script
+            text = (self.root / rel_path).read_text(encoding='utf-8', errors='ignore')
+            mentioned.update(os.path.basename(m) for m in MEDIA_MENTION.findall(text))
+            return resolved, mentioned
+
+        if doc.kind == 'html':
+            page = doc.page
+            for link in page.links:
+                add(link.url)
+            for _, attrs, _ in page.tags:
+                for name in MEDIA_ATTRS:
+                    if attrs.get(name):
+                        add(attrs[name])
+                if attrs.get('srcset'):
+                    for candidate in attrs['srcset'].split(','):
+                        if candidate.strip():
+                            add(candidate.split()[0])
+            css = [style for style, _ in page.style_blocks] + [style for style, _ in page.inline_styles]
+            # inline scripts build image paths too
+            mentioned.update(os.path.basename(m) for m in MEDIA_MENTION.findall(doc.text))
+        else:
+            css = [doc.text]
+        for text in css:
+            for m in CSS_URL.finditer(text):
+                add(m.group(1) or m.group(2))
+        return resolved, mentioned
+
+    def references(self):
+        """(resolved paths, mentioned names) of media across pages, sheets, scripts.
+
+        Only sources whose (mtime, size) changed since the last run are read.
+        """
+        resolved = set()
+        mentioned = set()
+        refs = {}
+        for rel_path in self.corpus.files:
+            if not rel_path.endswith(('.html', '.css', '.js', '.json')):
+                continue
+            if is_tool_report(rel_path):     # lists media paths, not a reference
+                continue
+            stamp = self._stamp(rel_path)
+            cached = self._refs.get(rel_path)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, *self._source_references(rel_path))
+            refs[rel_path] = cached
+            resolved |= cached[1]
+            mentioned |= cached[2]
+        self._refs = refs
+        return resolved, mentioned
+
+    # -- report --
+
+    def report(self, max_image_bytes=MAX_IMAGE_BYTES, max_pixels=MAX_IMAGE_PIXELS,
+               max_video_bytes=MAX_VIDEO_BYTES):
+        records = self.records
+        by_sha1 = defaultdict(list)
+        by_phash = defaultdict(list)
+        for record in records.values():
+            by_sha1[record.sha1].append(record.path)
+            if record.phash:
+                by_phash[record.phash].append(record)
+        duplicates = [sorted(paths) for paths in by_sha1.values() if len(paths) > 1]
+        near_duplicates = [sorted(r.path for r in group) for group in by_phash.values()
+                           if len({r.sha1 for r in group}) > 1]
+        invalid = sorted(r.path for r in records.values() if r.format is None)
+        mismatched = [{'path': r.path, 'extension': r.extension, 'content': r.format}
+                      for _, r in sorted(records.items()) if r.format and r.format != r.extension]
+
+        oversized = []
+        for record in records.values():
+            if record.format in VIDEO_FORMATS:
+                if record.bytes > max_video_bytes:
+                    oversized.append({'path': record.path, 'bytes': record.bytes, 'reason': 'bytes'})
+                continue
+            reasons = []
+            if record.bytes > max_image_bytes:
+                reasons.append('bytes')
+            if max(record.width or 0, record.height or 0) > max_pixels:
+                reasons.append('pixels')
+            if reasons:
+                oversized.append({'path': record.path, 'bytes': record.bytes, 'width': record.width,
+                                  'height': record.height, 'reason': '+'.join(reasons)})
+        oversized.sort(key=lambda item: -item['bytes'])
+
+        resolved, mentioned = self.references()
+        unreferenced = sorted(path for path in records
+                              if path not in resolved and os.path.basename(path) not in mentioned)
+
+        by_format = defaultdict(lambda: {'files': 0, 'bytes': 0})
+        for record in records.values():
+            by_format[record.format or 'invalid']['files'] += 1
+            by_format[record.format or 'invalid']['bytes'] += record.bytes
+
+        wasted = sum(records[p].bytes for group in duplicates for p in group[1:])
+        return {
+            'summary': {
+                'files': len(records),
+                'bytes': sum(r.bytes for r in records.values()),
+                'by_format': dict(sorted(by_format.items())),
+                'duplicate_groups': len(duplicates),
+                'duplicate_bytes': wasted,
+                'near_duplicate_groups': len(near_duplicates),
+                'oversized': len(oversized),
+                'mismatched': len(mismatched),
+                'invalid': len(invalid),
+                'unreferenced': len(unreferenced),
+                'unreferenced_bytes': sum(records[p].bytes for p in unreferenced),
+                'perceptual_hash': Image is not None,
+            },
+            'duplicates': duplicates,
+            'near_duplicates': near_duplicates,
+            'oversized': oversized,
+            'mismatched': mismatched,
+            'invalid': invalid,
+            'unreferenced': unreferenced,
+            'files': [record._asdict() for _, record in sorted(records.items())],
+        }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HMH media inventory')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--max-image-kb', type=int, default=MAX_IMAGE_BYTES // 1024)
+    parser.add_argument('--max-pixels', type=int, default=MAX_IMAGE_PIXELS,
+                        help='Longest image side before it counts as oversized')
+    parser.add_argument('--max-video-mb', type=int, default=MAX_VIDEO_BYTES // (1024 * 1024))
+    args = parser.parse_args()
+
+    inventory = MediaInventory(args.project_dir)
+    inventory.scan()
+    report = inventory.report(args.max_image_kb * 1024, args.max_pixels, args.max_video_mb * 1024 * 1024)
+    inventory.save()
+
+    summary = report['summary']
+    print(f"Media files: {summary['files']} ({summary['bytes'] / 1e6:.1f} MB), "
+          f"{inventory.inspected} inspected, {summary['files'] - inventory.inspected} from cache")
+    for fmt, stats in summary['by_format'].items():
+        print(f"  {fmt:<5} {stats['files']:>5} files  {stats['bytes'] / 1e6:>8.1f} MB")
+    print(f"Duplicates: {summary['duplicate_groups']} groups, {summary['duplicate_bytes'] / 1e6:.1f} MB redundant")
+    if summary['perceptual_hash']:
+        print(f"Near-duplicates: {summary['near_duplicate_groups']} groups")
+    else:
+        print("Near-duplicates: skipped (Pillow not installed)")
+    print(f"Oversized: {summary['oversized']}")
+    print(f"Wrong extension: {summary['mismatched']}, not media at all: {summary['invalid']}")
+    print(f"Unreferenced: {summary['unreferenced']} ({summary['unreferenced_bytes'] / 1e6:.1f} MB)")
+
+    report_name = f"MEDIA_REPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(Path(args.project_dir) / report_name, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved: {report_name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
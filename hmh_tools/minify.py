@@ -0,0 +1,697 @@
+"""
+HMH Tools - Minified Build Output
+
+Writes a minified copy of the site to a separate build directory
+(_build/ by default); the source tree is never touched.
+
+  HTML    comments dropped (conditional <!--[if ...]> and <!--! ...> kept),
+          whitespace runs in text collapsed to one space or newline,
+          <style> and <script> contents minified. Pages whose CSS sets
+          white-space: pre/pre-wrap/break-spaces keep their text as is;
+          <pre> and <textarea> always do.
+  CSS     comments dropped (/*! kept), whitespace removed around { } ; , >
+          and after :, the last ; of a block dropped. Strings are copied.
+  JS      comments dropped (/*! kept), whitespace runs become one space or
+          one newline; a newline is only removed where no semicolon could
+          be inserted. Strings, template literals and regex literals are
+          copied. Identifiers are never renamed.
+  styles  <style> blocks that minify to the same CSS on two or more pages
+          are written once to css/shared/<hash>.css and linked instead,
+          unless a url() or @import in them is page-relative.
+  other   files are hard-linked into the build (copied across devices).
+
+Every minified file gets an offset map in <build>/.offsets/<path>.json:
+output offsets of the copied pieces and the source offsets they came
+from, so a finding on the build output can be traced back to the source
+line (--locate). Minifying runs in a process pool (--jobs N) and is
+incremental: results are cached by (mtime, size) in .hmh_cache/minify.pickle,
+and a file whose source and linked shared styles are unchanged is not
+rendered or rewritten.
+
+Usage:
+    python3 -m hmh_tools.minify [project_directory]
+    python3 -m hmh_tools.minify [project_directory] --out /tmp/site --jobs 8
+    python3 -m hmh_tools.minify [project_directory] --locate _build/about.html:3:1250
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import sys
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .atomic import atomic_write
+from .cache import CACHE_DIR
+from .corpus import EXCLUDE_DIRS, Corpus, make_shards
+from .css import is_pinned
+from .linkgraph import resolve_href
+from .report import is_tool_report
+
+BUILD_DIR = '_build'
+OFFSETS_DIR = '.offsets'
+SHARED_CSS_DIR = 'css/shared'
+CACHE_FORMAT = 1
+MINIFIED = ('.html', '.css', '.js')
+
+# Bump when the output of the minifiers changes
+MINIFY_VERSION = 1
+
+
+# -- offset maps --
+
+class OffsetMap:
+    """Output offset -> source offset, from the starts of copied pieces."""
+
+    def __init__(self, source, out_starts, src_starts):
+        self.source = source
+        self.out_starts = out_starts
+        self.src_starts = src_starts
+
+    @classmethod
+    def from_pieces(cls, source, pieces):
+        """pieces: (source offset, emitted text); adjacent verbatim pieces merge."""
+        out_starts, src_starts = [], []
+        out = 0
+        for src, text in pieces:
+            if not text:
+                continue
+            if not out_starts or src - src_starts[-1] != out - out_starts[-1]:
+                out_starts.append(out)
+                src_starts.append(src)
+            out += len(text)
+        return cls(source, out_starts, src_starts)
+
+    def source_offset(self, offset):
+        i = bisect_right(self.out_starts, offset) - 1
+        if i < 0:
+            return 0
+        return self.src_starts[i] + offset - self.out_starts[i]
+
+    def to_json(self):
+        def deltas(values):
+            return [b - a for a, b in zip([0] + values, values)]
+        return {'source': self.source, 'out': deltas(self.out_starts), 'src': deltas(self.src_starts)}
+
+    @classmethod
+    def from_json(cls, data):
+        def running(deltas):
+            total, values = 0, []
+            for delta in deltas:
+                total += delta
+                values.append(total)
+            return values
+        return cls(data['source'], running(data['out']), running(data['src']))
+
+
+def line_col(text, offset):
+    """1-based (line, column) of an offset."""
+    line = text.count('\n', 0, offset) + 1
+    return line, offset - (text.rfind('\n', 0, offset) + 1) + 1
+
+
+# -- CSS --
+
+_CSS_TOKEN = re.compile(r'''/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?|\s+|[{};:,>()!]|[^\s"'/{};:,>()!]+|/''',
+                        re.DOTALL)
+CSS_TIGHT_AFTER = set('{};:,>(')
+CSS_TIGHT_BEFORE = set('{};,>)!')
+
+
+def minify_css(text, base=0):
+    """(source offset, text) pieces of minified CSS."""
+    pieces = []
+    last = ''
+    space = None        # source offset of skipped whitespace/comments
+    for m in _CSS_TOKEN.finditer(text):
+        token = m.group()
+        if token[0].isspace() or (token.startswith('/*') and not token.startswith('/*!')):
+            if space is None:
+                space = base + m.start()
+            continue
+        if space is not None and last and last not in CSS_TIGHT_AFTER and token[0] not in CSS_TIGHT_BEFORE:
+            pieces.append((space, ' '))
+        space = None
+        if token == '}' and pieces and pieces[-1][1] == ';':
+            pieces.pop()
+        pieces.append((base + m.start(), token))
+        last = token[-1]
+    return pieces
+
+
+# -- JS --
+
+JS_REGEX_AFTER_WORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                        'throw', 'case', 'do', 'else', 'yield', 'await'}
+JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^}')
+JS_SPACE_DROP = set('{}()[];,:=?&|')
+JS_NEWLINE_DROP_AFTER = set('{([;,:=?&|')
+JS_NEWLINE_DROP_BEFORE = set('})];,')
+
+_JS_WORD = re.compile(r'[\w$\u0080-\uffff]+')
+_JS_SPACE = re.compile(r'[ \t\r\n\f\v\u00a0\u2028\u2029\ufeff]+')
+_JS_LINE_BREAK = re.compile(r'[\n\u2028\u2029]')
+
+
+def _js_string(text, i):
+    quote = text[i]
+    j = i + 1
+    while j < len(text):
+        c = text[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == quote or c == '\n':
+            return j + 1
+        j += 1
+    return len(text)
+
+
+def _js_template(text, i):
+    """End of a template chunk starting at i (after ` or }): (end, opens ${)"""
+    j = i
+    while j < len(text):
+        c = text[j]
+        if c == '\\':
+            j += 2
+        elif c == '`':
+            return j + 1, False
+        elif c == '$' and text.startswith('${', j):
+            return j + 2, True
+        else:
+            j += 1
+    return len(text), False
+
+
+def _js_regex(text, i):
+    j = i + 1
+    in_class = False
+    while j < len(text):
+        c = text[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == '\n':
+            return j
+        if in_class:
+            in_class = c != ']'
+        elif c == '[':
+            in_class = True
+        elif c == '/':
+            j += 1
+            while j < len(text) and (text[j].isalnum() or text[j] in '_$'):
+                j += 1
+            return j
+        j += 1
+    return len(text)
+
+
+def minify_js(text, base=0):
+    """(source offset, text) pieces of minified JavaScript."""
+    pieces = []
+    last = ''           # last emitted character
+    previous = ''       # last significant token, for regex detection
+    space = None        # (source offset, contains a newline) of skipped whitespace
+    templates = []      # brace depth at each open ${ substitution
+    depth = 0
+    i = 0
+    n = len(text)
+
+    while i < n:
+        c = text[i]
+        m = _JS_SPACE.match(text, i)
+        if m:
+            end = m.end()
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            end = n if end < 0 else end
+        elif text.startswith('/*', i) and not text.startswith('/*!', i):
+            end = text.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+        else:
+            end = None
+        if end is not None:
+            newline = _JS_LINE_BREAK.search(text, i, end) is not None
+            if space is None:
+                space = (base + i, newline)
+            elif newline:
+                space = (space[0], True)
+            i = end
+            continue
+
+        if c in '"\'':
+            end = _js_string(text, i)
+        elif c == '`':
+            end, opens = _js_template(text, i + 1)
+            if opens:
+                templates.append(depth)
+                depth = 0
+        elif c == '}' and templates and depth == 0:
+            end, opens = _js_template(text, i + 1)
+            if not opens:
+                depth = templates.pop()
+        elif c == '/' and text.startswith('/*!', i):
+            end = text.find('*/', i + 3)
+            end = n if end < 0 else end + 2
+        elif c == '/' and (not previous or previous in JS_REGEX_AFTER or previous in JS_REGEX_AFTER_WORDS):
+            end = _js_regex(text, i)
+        else:
+            m = _JS_WORD.match(text, i)
+            end = m.end() if m else i + 1
+            if c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+        token = text[i:end]
+
+        if space is not None and last:
+            start, newline = space
+            if newline:
+                if last not in JS_NEWLINE_DROP_AFTER and token[0] not in JS_NEWLINE_DROP_BEFORE:
+                    pieces.append((start, '\n'))
+            elif last not in JS_SPACE_DROP and token[0] not in JS_SPACE_DROP:
+                pieces.append((start, ' '))
+        space = None
+        pieces.append((base + i, token))
+        last = token[-1]
+        previous = token if _JS_WORD.fullmatch(token) or len(token) == 1 else 'literal'
+        i = end
+    return pieces
+
+
+# -- HTML --
+
+_HTML_TOKEN = re.compile(r'<!--.*?(?:-->|\Z)|<(script|style|pre|textarea)\b[^>]*>|<[^>]*>?|[^<]+', re.DOTALL | re.IGNORECASE)
+_TEXT_SPACE = re.compile(r'\s+')
+_PLAIN_STYLE = re.compile(r'''<style((?:\s+(?:media|type)\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+))*)\s*>''', re.IGNORECASE)
+_MEDIA = re.compile(r'''media\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+_SCRIPT_TYPE = re.compile(r'''type\s*=\s*["']?([^"'\s>]+)''', re.IGNORECASE)
+JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module', 'text/ecmascript'}
+
+# CSS that makes whitespace in text significant
+PRESERVED_WHITESPACE = re.compile(r'white-space\s*:\s*(?:pre|pre-wrap|break-spaces)\s*(?:[;}!"\']|$)',
+                                  re.IGNORECASE | re.MULTILINE)
+
+
+def minify_html(text, keep_text=False):
+    """(pieces, style blocks). A style block is (index of its first piece,
+    index after its last, media, minified css, source offset of the css)
+    for every plain <style> element, so it can be replaced by a <link>."""
+    pieces = []
+    styles = []
+    pos = 0
+    n = len(text)
+    while pos < n:
+        m = _HTML_TOKEN.match(text, pos)
+        token = m.group()
+        raw_tag = m.group(1)
+        if token.startswith('<!--'):
+            if token.startswith(('<!--[if', '<!--!', '<!--<![endif]')):
+                pieces.append((pos, token))
+            pos = m.end()
+            continue
+        if raw_tag:
+            name = raw_tag.lower()
+            close = re.compile(rf'</{name}\s*>', re.IGNORECASE).search(text, m.end())
+            content_end = close.start() if close else n
+            end = close.end() if close else n
+            first = len(pieces)
+            pieces.append((pos, token))
+            content = text[m.end():content_end]
+            if name == 'style':
+                css = minify_css(content, m.end())
+                pieces.extend(css)
+            elif name == 'script' and (_script_type(token) in JS_TYPES) and 'src=' not in token.lower():
+                pieces.extend(minify_js(content, m.end()))
+            else:
+                pieces.append((m.end(), content))
+            if close:
+                pieces.append((content_end, close.group()))
+            if name == 'style' and close:
+                plain = _PLAIN_STYLE.fullmatch(token)
+                if plain:
+                    media = _MEDIA.search(plain.group(1))
+                    media = next(g for g in media.groups() if g is not None) if media else None
+                    styles.append((first, len(pieces), media, ''.join(t for _, t in css), m.end()))
+            pos = end
+            continue
+        if token.startswith('<') or keep_text:
+            pieces.append((pos, token))
+        else:
+            for part in _split_text(token, pos):
+                pieces.append(part)
+        pos = m.end()
+    return pieces, styles
+
+
+def _script_type(tag):
+    m = _SCRIPT_TYPE.search(tag)
+    return m.group(1).lower() if m else ''
+
+
+def _split_text(text, base):
+    last = 0
+    for m in _TEXT_SPACE.finditer(text):
+        if m.start() > last:
+            yield base + last, text[last:m.start()]
+        run = m.group()
+        yield base + m.start(), '\n' if '\n' in run else ' '
+        last = m.end()
+    if last < len(text):
+        yield base + last, text[last:]
+
+
+# -- worker --
+
+def minify_file(root, rel_path, keep_text):
+    """Worker: minified text of one file with its offset map and style
+    blocks, or None when it is not UTF-8.
+
+    A style block here is (output start, output end, source start, source
+    end, media, css) of a whole <style> element.
+    """
+    data = (Path(root) / rel_path).read_bytes()
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    ext = os.path.splitext(rel_path)[1].lower()
+    styles = []
+    if ext == '.html':
+        pieces, blocks = minify_html(text, keep_text)
+        starts = [0]
+        for _, piece in pieces:
+            starts.append(starts[-1] + len(piece))
+        for first, end, media, css, _ in blocks:
+            src_end = pieces[end][0] if end < len(pieces) else len(text)
+            styles.append((starts[first], starts[end], pieces[first][0], src_end, media, css))
+    elif ext == '.css':
+        pieces = minify_css(text)
+    else:
+        pieces = minify_js(text)
+    offsets = OffsetMap.from_pieces(rel_path.replace(os.sep, '/'), pieces)
+    return {'text': ''.join(piece for _, piece in pieces), 'out': offsets.out_starts,
+            'src': offsets.src_starts, 'styles': styles, 'bytes': len(data)}
+
+
+def minify_shard(root, items):
+    return [(rel_path, minify_file(root, rel_path, keep_text)) for rel_path, keep_text in items]
+
+
+def splice(text, offsets, replacements):
+    """Replace (output start, output end, source start, source end, new text)
+    spans of a minified text, keeping its OffsetMap in step."""
+    parts, out_starts, src_starts = [], [], []
+    entries = list(zip(offsets.out_starts, offsets.src_starts))
+    i = 0
+    done = 0            # output offset of text consumed so far
+    shift = 0
+    for start, end, src_start, src_end, new in replacements:
+        while i < len(entries) and entries[i][0] < start:
+            out_starts.append(entries[i][0] + shift)
+            src_starts.append(entries[i][1])
+            i += 1
+        parts.append(text[done:start])
+        out_starts.append(start + shift)
+        src_starts.append(src_start)
+        parts.append(new)
+        shift += len(new) - (end - start)
+        while i < len(entries) and entries[i][0] <= end:
+            i += 1
+        out_starts.append(end + shift)
+        src_starts.append(src_end)
+        done = end
+    parts.append(text[done:])
+    for out, src in entries[i:]:
+        out_starts.append(out + shift)
+        src_starts.append(src)
+    return ''.join(parts), OffsetMap(offsets.source, out_starts, src_starts)
+
+
+class MinifiedBuild:
+    """Minified mirror of a site in a build directory."""
+
+    def __init__(self, root, out=None):
+        self.root = Path(root)
+        self.out = Path(out) if out else self.root / BUILD_DIR
+        exclude = set(EXCLUDE_DIRS)
+        try:
+            exclude.add(str(self.out.resolve().relative_to(self.root.resolve())).split(os.sep)[0])
+        except ValueError:
+            pass
+        self.corpus = Corpus(self.root, exclude_dirs=exclude)
+        self.cache_path = self.root / CACHE_DIR / 'minify.pickle'
+        self.results = {}       # rel_path -> (stamp, keep_text, result)
+        self.rendered = {}      # rel_path -> ((stamp, keep_text), shared files linked, output bytes)
+        self.outputs = {}       # output rel_path -> sha1, or link:<mtime>:<size>
+        self.sheets = None      # stylesheets that preserved whitespace last run
+        self.minified = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return
+        if data.get('format') != CACHE_FORMAT or data.get('version') != MINIFY_VERSION \
+                or data.get('out') != str(self.out.resolve()):
+            return
+        self.results = data['results']
+        self.rendered = data['rendered']
+        self.outputs = data['outputs']
+        self.sheets = data['sheets']
+
+    def save(self):
+        self.cache_path.parent.mkdir(exist_ok=True)
+        atomic_write(self.cache_path, pickle.dumps(
+            {'format': CACHE_FORMAT, 'version': MINIFY_VERSION, 'out': str(self.out.resolve()),
+             'results': self.results, 'rendered': self.rendered, 'outputs': self.outputs,
+             'sheets': self.sheets}, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _stamp(self, rel_path):
+        stat = (self.root / rel_path).stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def preserved_sheets(self):
+        return {doc.rel_path for doc in self.corpus.css() if PRESERVED_WHITESPACE.search(doc.text)}
+
+    def keeps_text(self, doc, sheets):
+        if PRESERVED_WHITESPACE.search(doc.text):
+            return True
+        return any(link.kind == 'css' and resolve_href(doc.rel_path, link.url) in sheets
+                   for link in doc.page.links)
+
+    def sources(self):
+        for rel_path in self.corpus.files:
+            if is_tool_report(rel_path) or rel_path.endswith(('.gz', '.br')):
+                continue
+            yield rel_path
+
+    def minify(self, jobs=None):
+        """Minify every changed HTML/CSS/JS file; returns {rel_path: result}."""
+        sheets = self.preserved_sheets()
+        pending = []
+        results = {}
+        for rel_path in self.sources():
+            if not rel_path.lower().endswith(MINIFIED):
+                continue
+            stamp = self._stamp(rel_path)
+            cached = self.results.get(rel_path)
+            if cached is not None and cached[0] == stamp and sheets == self.sheets:
+                # the page and the stylesheets deciding keep_text are as they were
+                results[rel_path] = cached
+                continue
+            doc = self.corpus.get(rel_path)
+            keep_text = doc is not None and doc.kind == 'html' and self.keeps_text(doc, sheets)
+            if cached is not None and cached[0] == stamp and cached[1] == keep_text:
+                results[rel_path] = cached
+            else:
+                pending.append((rel_path, keep_text))
+
+        if jobs == 1 or len(pending) < 2:
+            done = minify_shard(self.root, pending)
+        else:
+            workers = jobs or os.cpu_count() or 1
+            shards = make_shards(self.root, pending, workers * 4, key=lambda item: item[0])
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                done = [item for shard in pool.map(minify_shard, [self.root] * len(shards), shards)
+                        for item in shard]
+        keep = dict(pending)
+        for rel_path, result in done:
+            results[rel_path] = (self._stamp(rel_path), keep[rel_path], result)
+        self.minified = len(done)
+        self.results = results
+        self.sheets = sheets
+        return {rel_path: result for rel_path, (_, _, result) in results.items()}
+
+    def shared_styles(self, minified):
+        """(media, css) -> (shared file path, pages), for blocks on two or more
+        pages; blocks with page-relative url()s stay on their pages."""
+        pages = {}
+        for rel_path, result in minified.items():
+            if result is None:
+                continue
+            for style in {(media, css) for *_, media, css in result['styles']}:
+                if not is_pinned(style[1]):
+                    pages.setdefault(style, []).append(rel_path)
+        shared = {}
+        for (media, css), paths in pages.items():
+            if len(paths) > 1 and css:
+                digest = hashlib.sha1(css.encode('utf-8')).hexdigest()[:12]
+                shared[(media, css)] = (f"{SHARED_CSS_DIR}/{digest}.css", sorted(paths))
+        return shared
+
+    def linked(self, result, shared):
+        """Shared file each of a result's style blocks becomes, or None."""
+        return tuple(shared[(media, css)][0] if (media, css) in shared else None
+                     for *_, media, css in result['styles'])
+
+    def render(self, rel_path, result, shared):
+        """(final text, OffsetMap) of one file, with shared <style>s linked."""
+        offsets = OffsetMap(rel_path.replace(os.sep, '/'), result['out'], result['src'])
+        page_dir = os.path.dirname(rel_path).replace(os.sep, '/')
+        replacements = []
+        for (start, end, src_start, src_end, media, _), path in zip(result['styles'],
+                                                                   self.linked(result, shared)):
+            if path is None:
+                continue
+            href = os.path.relpath(path, page_dir or '.').replace(os.sep, '/')
+            media_attr = f' media="{media}"' if media else ''
+            replacements.append((start, end, src_start, src_end,
+                                 f'<link rel="stylesheet" href="{href}"{media_attr}>'))
+        if not replacements:
+            return result['text'], offsets
+        return splice(result['text'], offsets, replacements)
+
+    def _write(self, out_rel, data):
+        """Write when the content changed; returns True if written."""
+        digest = hashlib.sha1(data).hexdigest()
+        target = self.out / out_rel
+        if self.outputs.get(out_rel) == digest and target.exists():
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(target, data)
+        self.outputs[out_rel] = digest
+        return True
+
+    def _link(self, rel_path):
+        source = self.root / rel_path
+        target = self.out / rel_path
+        stamp = 'link:%d:%d' % self._stamp(rel_path)
+        if target.exists() and (self.outputs.get(rel_path) == stamp or os.path.samefile(source, target)):
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(f".{target.name}.tmp")
+        try:
+            os.link(source, temp)
+        except OSError:
+            shutil.copy2(source, temp)
+        os.replace(temp, target)
+        self.outputs[rel_path] = stamp
+        return True
+
+    def build(self, jobs=None):
+        """Write the build directory; returns a summary dict."""
+        minified = self.minify(jobs)
+        shared = self.shared_styles(minified)
+        produced = set()
+        summary = {'written': 0, 'unchanged': 0, 'removed': 0, 'bytes_before': 0, 'bytes_after': 0,
+                   'shared_styles': len(shared), 'minified': self.minified}
+
+        for (media, css), (path, pages) in sorted(shared.items(), key=lambda item: item[1][0]):
+            produced.add(path.replace('/', os.sep))
+            written = self._write(path.replace('/', os.sep), css.encode('utf-8'))
+            summary['written' if written else 'unchanged'] += 1
+
+        for rel_path in self.sources():
+            result = minified.get(rel_path)
+            produced.add(rel_path)
+            if result is None:
+                written = self._link(rel_path)
+                summary['written' if written else 'unchanged'] += 1
+                continue
+            map_rel = os.path.join(OFFSETS_DIR, rel_path + '.json')
+            produced.add(map_rel)
+            summary['bytes_before'] += result['bytes']
+            key = (self.results[rel_path][:2], self.linked(result, shared))
+            previous = self.rendered.get(rel_path)
+            if previous is not None and previous[:2] == key and rel_path in self.outputs \
+                    and map_rel in self.outputs and (self.out / rel_path).exists():
+                summary['bytes_after'] += previous[2]
+                summary['unchanged'] += 1
+                continue
+            text, offsets = self.render(rel_path, result, shared)
+            data = text.encode('utf-8')
+            summary['bytes_after'] += len(data)
+            self._write(map_rel, json.dumps(offsets.to_json(), separators=(',', ':')).encode())
+            written = self._write(rel_path, data)
+            self.rendered[rel_path] = (*key, len(data))
+            summary['written' if written else 'unchanged'] += 1
+
+        for out_rel in sorted(set(self.outputs) - produced):
+            try:
+                os.unlink(self.out / out_rel)
+            except FileNotFoundError:
+                pass
+            del self.outputs[out_rel]
+            self.rendered.pop(out_rel, None)
+            summary['removed'] += 1
+        self.save()
+        return summary
+
+
+def locate(root, out, rel_path, line, col=1):
+    """(source rel_path, line, column) of a position in a minified file."""
+    out = Path(out)
+    with open(out / OFFSETS_DIR / (rel_path + '.json')) as f:
+        offsets = OffsetMap.from_json(json.load(f))
+    text = (out / rel_path).read_text(encoding='utf-8')
+    lines = text.split('\n')
+    offset = sum(len(l) + 1 for l in lines[:line - 1]) + col - 1
+    source_offset = offsets.source_offset(offset)
+    source_text = (Path(root) / offsets.source).read_text(encoding='utf-8')
+    return (offsets.source, *line_col(source_text, source_offset))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Write a minified copy of the site')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--out', help=f'Build directory (default: <project>/{BUILD_DIR})')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Minifying processes (default: one per CPU)')
+    parser.add_argument('--locate', metavar='FILE:LINE[:COL]',
+                        help='Source position of a position in a minified file, then exit')
+    args = parser.parse_args()
+
+    out = Path(args.out) if args.out else Path(args.project_dir) / BUILD_DIR
+    if args.locate:
+        path, line, *col = args.locate.split(':')
+        try:
+            rel_path = str(Path(path).resolve().relative_to(out.resolve()))
+        except ValueError:
+            rel_path = path
+        source, source_line, source_col = locate(args.project_dir, out, rel_path, int(line),
+                                                 int(col[0]) if col else 1)
+        print(f"{source}:{source_line}:{source_col}")
+        return 0
+
+    build = MinifiedBuild(args.project_dir, out)
+    summary = build.build(args.jobs)
+    before, after = summary['bytes_before'], summary['bytes_after']
+    print(f"Minified {summary['minified']} files ({len(build.results) - summary['minified']} from cache)")
+    if before:
+        print(f"HTML/CSS/JS: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB ({1 - after / before:.0%} smaller)")
+    print(f"Shared <style> blocks: {summary['shared_styles']}")
+    print(f"{out}: {summary['written']} written, {summary['unchanged']} unchanged, {summary['removed']} removed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+HMH Tools - Page Index
+
+Tokenizes an HTML page once and keeps everything the auditors look at:
+the tag stream with attributes and source offsets, every
+href/src/stylesheet reference, the fragment targets (id="" of any
+element, name="" of <a>), <style> blocks, inline style="" values and
+visible text nodes.
+
+Document.page (see corpus.py) builds this lazily, so SHIVA, the triaxial
+audit and link_checker.py all read the same parse of each page. Tools
+that patch a page in place (rewrite, images) find what to patch through
+Page.events(), the start and end tags with their offsets, instead of
+tokenizing the page again.
+"""
+
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+# kind is 'href', 'src' or 'css' (a <link> to a stylesheet)
+Link = namedtuple('Link', 'kind url line tag')
+
+HOME_LINKS = ['/', '/index.html', '../', '../../']
+
+# Tags whose content is not page text
+RAW_TEXT_TAGS = {'script', 'style'}
+
+
+class Page:
+    """Parse product of one HTML page."""
+
+    def __init__(self):
+        self.tags = []            # (tag, attrs dict, line)
+        self.spans = []           # (start, end) offsets of each start tag in tags
+        self.end_tags = []        # (tag, start, end, number of start tags before it)
+        self.links = []           # Link tuples in document order
+        self.anchors = set()      # fragment targets: every id, <a name>
+        self.style_blocks = []    # (css text, line of <style>)
+        self.inline_styles = []   # (style="" value, line)
+        self.text_nodes = []      # visible text, script/style excluded
+        self.title = None         # text of the first <title>
+        self.has_site_header = False
+        self.has_site_footer = False
+        self.has_home_link = False
+
+    def hrefs(self, tag='a'):
+        """href values of one tag type, in document order."""
+        return [link.url for link in self.links if link.kind == 'href' and link.tag == tag]
+
+    def events(self):
+        """Start and end tags in document order, as (kind, tag, attrs,
+        start, end): kind is 'start' or 'end' (attrs is None for an end
+        tag). A self-closing tag is a start followed by an end."""
+        i = 0
+        for tag, start, end, before in self.end_tags:
+            for i in range(i, before):
+                yield ('start', self.tags[i][0], self.tags[i][1]) + self.spans[i]
+            i = before
+            yield 'end', tag, None, start, end
+        for i in range(i, len(self.tags)):
+            yield ('start', self.tags[i][0], self.tags[i][1]) + self.spans[i]
+
+
+class _PageParser(HTMLParser):
+
+    def __init__(self, html):
+        super().__init__()
+        self.html = html
+        # getpos() counts lines by '\n' only
+        self.line_offsets = [0] + [m.end() for m in re.finditer('\n', html)]
+        self.page = Page()
+        self._raw_tag = None
+        self._raw_line = 0
+        self._raw_chunks = []
+        self._in_title = False
+
+    def _offset(self):
+        line, col = self.getpos()
+        return self.line_offsets[line - 1] + col
+
+    def handle_starttag(self, tag, attrs):
+        page = self.page
+        line = self.getpos()[0]
+        start = self._offset()
+        attrs_dict = dict(attrs)
+        page.tags.append((tag, attrs_dict, line))
+        page.spans.append((start, start + len(self.get_starttag_text() or '')))
+
+        anchor = attrs_dict.get('id')
+        if anchor:
+            page.anchors.add(anchor)
+        if tag == 'a' and attrs_dict.get('name'):
+            page.anchors.add(attrs_dict['name'])
+
+        href = attrs_dict.get('href')
+        if href is not None:
+            is_css = tag == 'link' and '.css' in href
+            page.links.append(Link('css' if is_css else 'href', href, line, tag))
+            if tag == 'a' and href in HOME_LINKS:
+                page.has_home_link = True
+
+        src = attrs_dict.get('src')
+        if src is not None:
+            page.links.append(Link('src', src, line, tag))
+
+        style = attrs_dict.get('style')
+        if style:
+            page.inline_styles.append((style, line))
+
+        if tag == 'site-header':
+            page.has_site_header = True
+        elif tag == 'site-footer':
+            page.has_site_footer = True
+        elif tag == 'title' and page.title is None:
+            self._in_title = True
+            page.title = ''
+        elif tag in RAW_TEXT_TAGS:
+            self._raw_tag = tag
+            self._raw_line = line
+            self._raw_chunks = []
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        end = self.page.spans[-1][1]
+        self.page.end_tags.append((tag, end, end, len(self.page.tags)))
+        if tag in RAW_TEXT_TAGS:
+            self._raw_tag = None
+
+    def handle_endtag(self, tag):
+        start = self._offset()
+        self.page.end_tags.append((tag, start, self.html.find('>', start) + 1, len(self.page.tags)))
+        if tag == 'title' and self._in_title:
+            self._in_title = False
+            self.page.title = ' '.join(self.page.title.split())
+        if tag == self._raw_tag:
+            if tag == 'style':
+                self.page.style_blocks.append((''.join(self._raw_chunks), self._raw_line))
+            self._raw_tag = None
+
+    def handle_data(self, data):
+        if self._raw_tag:
+            self._raw_chunks.append(data)
+        elif data.strip():
+            self.page.text_nodes.append(data)
+            if self._in_title:
+                self.page.title += data
+
+
+def parse_page(html):
+    """Tokenize one HTML string into a Page."""
+    parser = _PageParser(html)
+    parser.feed(html)
+    parser.close()
+    return parser.page
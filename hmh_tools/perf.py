@@ -0,0 +1,235 @@
+"""
+HMH Tools - Audit Instrumentation
+
+Per-check cost accounting for the audit scripts. Every block measured
+with PerfRecorder.measure(name), and every per-file check run through
+CheckCosts.call(name, ...), records
+
+  wall_s              elapsed time
+  cpu_s               CPU time: this process, plus the CPU time --jobs
+                      workers report for work done on the block's behalf
+  files_read          files the corpus read from disk
+  bytes_read          bytes the corpus read from disk
+  regex_invocations   calls into the precompiled engines, from their own
+                      counters (RuleEngine, PhraseScanner); module-level
+                      re.*() calls are not measured (the report says so)
+  rss_growth_kb       how far the process RSS high-water mark rose
+                      (the whole run's peak RSS is in 'total')
+  traced_peak_kb      peak Python allocation above what was allocated
+                      when the block or check started (only with
+                      trace_memory=True, via tracemalloc)
+
+The per-file checks of an audit run inside one block (SHIVA's
+scan_files); CheckCosts splits that block's cost by check, in the
+auditing process or in each worker, and PerfRecorder.add_file_checks()
+merges the workers' numbers.
+
+The numbers are cheap enough to collect on every run. cProfile and
+tracemalloc snapshots are heavier and opt-in (see write_profile()).
+
+Usage:
+    perf = PerfRecorder(corpus, counters=[lambda: engine.regex_invocations])
+    with perf:
+        with perf.measure('links'):
+            check_links()
+    report['perf'] = perf.report()
+"""
+
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Listed in every report: counting these would mean patching re process-wide
+NOT_MEASURED = ('module-level re.*() calls',)
+
+COST_FIELDS = ('wall_s', 'cpu_s', 'files_read', 'bytes_read', 'regex_invocations', 'rss_growth_kb')
+# Per-check maxima rather than sums
+PEAK_FIELDS = ('traced_peak_kb',)
+
+# tracemalloc keeps one peak per process. A measurement resets it when it
+# starts; the peak reached so far is first folded into every measurement
+# still open around it.
+_open_peaks = []
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _peak_start():
+    current, peak = tracemalloc.get_traced_memory()
+    for i, seen in enumerate(_open_peaks):
+        _open_peaks[i] = max(seen, peak)
+    _open_peaks.append(0)
+    tracemalloc.reset_peak()
+    return current
+
+
+def _peak_end(started):
+    """Peak allocation above `started` since the matching _peak_start()."""
+    peak = max(_open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+    return max(peak - started, 0) // 1024
+
+
+def _new_entry():
+    return dict.fromkeys(COST_FIELDS, 0)
+
+
+class _Cost:
+    """Cost of one run of a block or check; add_to() folds it into an entry."""
+
+    def __init__(self, corpus, counters):
+        self.corpus = corpus
+        self.counters = counters
+        self.tracing = tracemalloc.is_tracing()
+        if self.tracing:
+            self.allocated = _peak_start()
+        self.files, self.bytes = _io(corpus)
+        self.regex = sum(counter() for counter in counters)
+        self.rss = peak_rss_kb()
+        self.wall, self.cpu = time.perf_counter(), time.process_time()
+
+    def add_to(self, entry):
+        entry['wall_s'] += time.perf_counter() - self.wall
+        entry['cpu_s'] += time.process_time() - self.cpu
+        files, size = _io(self.corpus)
+        entry['files_read'] += files - self.files
+        entry['bytes_read'] += size - self.bytes
+        entry['regex_invocations'] += sum(counter() for counter in self.counters) - self.regex
+        entry['rss_growth_kb'] += peak_rss_kb() - self.rss
+        if self.tracing:
+            entry['traced_peak_kb'] = max(entry.get('traced_peak_kb', 0), _peak_end(self.allocated))
+
+
+def _io(corpus):
+    if corpus is None:
+        return 0, 0
+    return corpus.files_read, corpus.bytes_read
+
+
+def merge_costs(into, entries):
+    """Add {name: entry} (e.g. from a worker) into {name: entry}."""
+    for name, entry in entries.items():
+        target = into.setdefault(name, _new_entry())
+        for key, value in entry.items():
+            if key in PEAK_FIELDS:
+                target[key] = max(target.get(key, 0), value)
+            else:
+                target[key] = target.get(key, 0) + value
+
+
+def _rounded(entry):
+    return {key: round(value, 4) if isinstance(value, float) else value
+            for key, value in entry.items()}
+
+
+class CheckCosts:
+    """Cost of each per-file check, summed over every file it ran on.
+
+    Plain dicts, so a --jobs worker can send its CheckCosts.entries back
+    to the parent for PerfRecorder.add_file_checks().
+    """
+
+    def __init__(self, corpus=None, counters=()):
+        self.corpus = corpus
+        self.counters = list(counters)
+        self.entries = {}
+
+    def call(self, name, func, *args):
+        """func(*args), adding its cost to entries[name]."""
+        cost = _Cost(self.corpus, self.counters)
+        try:
+            return func(*args)
+        finally:
+            entry = self.entries.setdefault(name, _new_entry())
+            cost.add_to(entry)
+            entry['calls'] = entry.get('calls', 0) + 1
+
+
+class PerfRecorder:
+    """Wall/CPU/IO/regex/memory cost of named blocks of an audit run."""
+
+    def __init__(self, corpus=None, counters=(), trace_memory=False):
+        self.corpus = corpus
+        self.counters = list(counters)
+        self.trace_memory = trace_memory
+        self.entries = {}
+        self.file_checks = {}
+        self.worker = _new_entry()
+        self._started = None
+
+    # -- activation: start the run clock and tracemalloc --
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._started = (time.perf_counter(), time.process_time())
+        return self
+
+    def __exit__(self, *exc):
+        wall, cpu = self._started
+        self.total = {'wall_s': round(time.perf_counter() - wall, 4),
+                      'cpu_s': round(time.process_time() - cpu + self.worker['cpu_s'], 4),
+                      'peak_rss_kb': peak_rss_kb()}
+
+    def check_costs(self):
+        """A CheckCosts for per-file checks run in this process."""
+        return CheckCosts(self.corpus, self.counters)
+
+    def _regex_count(self):
+        return sum(counter() for counter in self.counters)
+
+    # -- measurement --
+
+    @contextmanager
+    def measure(self, name):
+        cost = _Cost(self.corpus, self.counters)
+        try:
+            yield
+        finally:
+            cost.add_to(self.entries.setdefault(name, _new_entry()))
+
+    def add_worker(self, name, entry):
+        """Cost of work done on this block's behalf in a worker process."""
+        target = self.entries.setdefault(name, _new_entry())
+        for key in ('cpu_s', 'files_read', 'bytes_read', 'regex_invocations'):
+            target[key] += entry[key]
+            self.worker[key] += entry[key]
+
+    def add_file_checks(self, entries):
+        """Merge per-check costs ({check: entry}, see CheckCosts)."""
+        merge_costs(self.file_checks, entries)
+
+    def report(self):
+        files, size = _io(self.corpus)
+        return {
+            'checks': {name: _rounded(entry) for name, entry in self.entries.items()},
+            'file_checks': {name: _rounded(entry) for name, entry in self.file_checks.items()},
+            'total': {**getattr(self, 'total', {}),
+                      'regex_invocations': self._regex_count() + self.worker['regex_invocations'],
+                      'files_read': files + self.worker['files_read'],
+                      'bytes_read': size + self.worker['bytes_read']},
+            'not_measured': list(NOT_MEASURED),
+        }
+
+
+def write_profile(profiler, path, limit=40):
+    """cProfile data as .prof (for pstats/snakeviz) plus a text top list."""
+    import pstats
+
+    profiler.dump_stats(str(path))
+    with open(f"{path}.txt", 'w') as f:
+        stats = pstats.Stats(profiler, stream=f)
+        stats.sort_stats('cumulative').print_stats(limit)
+
+
+def write_memory_snapshot(path, limit=40):
+    """Top allocation sites of the current tracemalloc snapshot."""
+    snapshot = tracemalloc.take_snapshot()
+    stats = snapshot.statistics('lineno')
+    current, peak = tracemalloc.get_traced_memory()
+    with open(path, 'w') as f:
+        f.write(f"current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n\n")
+        for stat in stats[:limit]:
+            f.write(f"{stat}\n")
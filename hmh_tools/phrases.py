@@ -0,0 +1,87 @@
+"""
+HMH Tools - Multi-Phrase Scanner
+
+Finds every occurrence of every phrase in a list with one pass over the
+text, instead of one `phrase in content` test per phrase.
+
+The phrases are folded into a trie and emitted as a single regex
+(`c(?:alculate|hoose|ycle)|...`), so at each position the regex engine
+follows one branch per character, Aho-Corasick style, in C. After a hit
+the scan resumes one character later, and phrases that are prefixes of
+the longest match at a position are recorded with it, so overlapping and
+nested phrases ('try' inside 'geometry') are all found, exactly where
+`in` would find them.
+
+Matching is literal and case-sensitive: give lowercase phrases and scan
+lowercased text (Document.lower).
+
+Usage:
+    scanner = PhraseScanner(['no hope', 'all is lost'])
+    found = scanner.find_all(doc.lower)      # {'no hope': [1204, 5310]}
+    PhraseScanner.near(found['no hope'], 1300, window=500)
+"""
+
+import re
+from bisect import bisect_left
+
+
+def _trie_pattern(node):
+    branches = [re.escape(ch) + _trie_pattern(child)
+                for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    # '' marks the end of a phrase: the rest is optional, longest first
+    return f"(?:{pattern})?" if '' in node else pattern
+
+
+class PhraseScanner:
+    """A fixed set of literal phrases, located in one scan."""
+
+    def __init__(self, phrases):
+        self.phrases = list(dict.fromkeys(p for p in phrases if p))
+        trie = {}
+        for phrase in self.phrases:
+            node = trie
+            for ch in phrase:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+        self.regex = re.compile(_trie_pattern(trie)) if self.phrases else None
+        self.prefixes = {
+            phrase: [p for p in self.phrases if p != phrase and phrase.startswith(p)]
+            for phrase in self.phrases
+        }
+        self.regex_invocations = 0
+
+    def scan(self, text):
+        """(start, phrase) for every occurrence, in text order."""
+        hits = []
+        if self.regex is None:
+            return hits
+        prefixes = self.prefixes
+        search = self.regex.search
+        m = search(text)
+        calls = 1
+        while m is not None:
+            start = m.start()
+            phrase = m.group()
+            hits.append((start, phrase))
+            for shorter in prefixes[phrase]:
+                hits.append((start, shorter))
+            m = search(text, start + 1)
+            calls += 1
+        self.regex_invocations += calls
+        return hits
+
+    def find_all(self, text):
+        """{phrase: [start, ...]} for the phrases that occur in text."""
+        found = {}
+        for start, phrase in self.scan(text):
+            found.setdefault(phrase, []).append(start)
+        return found
+
+    @staticmethod
+    def near(starts, position, window):
+        """Whether any of the sorted starts lies within window of position."""
+        k = bisect_left(starts, position - window)
+        return k < len(starts) and starts[k] <= position + window
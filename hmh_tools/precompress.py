@@ -0,0 +1,231 @@
+"""
+HMH Tools - Precompressed Output
+
+Publish step that writes .gz and .br siblings next to every text asset
+of the site (HTML, CSS, JS, SVG, JSON, XML), so a server with
+gzip_static/brotli_static-style lookup sends them without compressing
+on each request.
+
+  - gzip at level 9 with a zero mtime, brotli at quality 11: the same
+    input always gives the same bytes
+  - files are compressed in a process pool (--jobs N)
+  - .hmh_cache/precompress.json records the sha1 each sibling was made
+    from; a file whose (mtime, size) or else content hash is unchanged
+    and whose siblings exist is skipped
+  - files under MIN_BYTES, or that a format does not shrink by at least
+    MIN_SAVING, get no sibling in that format; siblings of deleted or
+    no longer compressible files are removed (only ones this tool wrote)
+  - tool reports (SHIVA_REPORT_*, ...) are not published assets and skipped
+  - brotli is optional (brotli or brotlicffi); without it only .gz is made
+
+Per-file byte savings go to PRECOMPRESS_REPORT_<timestamp>.json.
+
+Usage:
+    python3 -m hmh_tools.precompress [project_directory]
+    python3 -m hmh_tools.precompress [project_directory] --jobs 8
+    python3 -m hmh_tools.precompress [project_directory] --dry-run
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from .atomic import atomic_write
+from .cache import CACHE_DIR
+from .corpus import Corpus
+from .report import is_tool_report
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:     # .br siblings are skipped without a brotli module
+        brotli = None
+
+TEXT_EXTENSIONS = ('.html', '.css', '.js', '.svg', '.json', '.xml')
+MIN_BYTES = 1024
+MIN_SAVING = 0.05           # a sibling must be at least 5% smaller
+
+MANIFEST = 'precompress.json'
+
+
+def formats():
+    return ('gz', 'br') if brotli is not None else ('gz',)
+
+
+def compress(data, fmt):
+    if fmt == 'gz':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+
+def compress_file(root, rel_path, sha1, wanted):
+    """Worker: write the siblings of one file.
+
+    Returns (rel_path, sha1, raw bytes, {format: sibling bytes}); a format
+    that does not save MIN_SAVING is left out and its sibling removed.
+    """
+    path = Path(root) / rel_path
+    data = path.read_bytes()
+    sha1 = sha1 or hashlib.sha1(data).hexdigest()
+    sizes = {}
+    for fmt in wanted:
+        sibling = path.with_name(f"{path.name}.{fmt}")
+        packed = compress(data, fmt)
+        if len(packed) <= len(data) * (1 - MIN_SAVING):
+            atomic_write(sibling, packed)
+            sizes[fmt] = len(packed)
+        else:
+            try:
+                os.unlink(sibling)
+            except FileNotFoundError:
+                pass
+    return rel_path, sha1, len(data), sizes
+
+
+class Precompressor:
+    """Text assets of a site and the state of their compressed siblings."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.manifest_path = self.root / CACHE_DIR / MANIFEST
+        try:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self.formats = formats()
+
+    def sources(self):
+        corpus = Corpus(self.root)
+        for rel_path in corpus.files:
+            if not rel_path.lower().endswith(TEXT_EXTENSIONS) or is_tool_report(rel_path):
+                continue
+            if (self.root / rel_path).stat().st_size >= MIN_BYTES:
+                yield rel_path
+
+    def _current(self, rel_path, entry, stamp):
+        """(up to date, sha1 if it had to be computed)"""
+        if entry is None or entry['formats'] != list(self.formats):
+            return False, None
+        sha1 = None
+        if entry['stamp'] != list(stamp):
+            sha1 = hashlib.sha1((self.root / rel_path).read_bytes()).hexdigest()
+            if sha1 != entry['sha1']:
+                return False, sha1
+            entry['stamp'] = list(stamp)
+        path = self.root / rel_path
+        if not all(path.with_name(f"{path.name}.{fmt}").exists() for fmt in entry['sizes']):
+            return False, sha1
+        return True, sha1
+
+    def plan(self):
+        """(pending [(rel_path, known sha1)], unchanged rel_paths, removed rel_paths)"""
+        pending, unchanged = [], []
+        sources = set()
+        for rel_path in self.sources():
+            sources.add(rel_path)
+            stat = (self.root / rel_path).stat()
+            current, sha1 = self._current(rel_path, self.manifest.get(rel_path),
+                                          (stat.st_mtime_ns, stat.st_size))
+            if current:
+                unchanged.append(rel_path)
+            else:
+                pending.append((rel_path, sha1))
+        removed = sorted(set(self.manifest) - sources)
+        return pending, unchanged, removed
+
+    def run(self, jobs=None, dry_run=False):
+        pending, unchanged, removed = self.plan()
+        if dry_run:
+            return [rel_path for rel_path, _ in pending], unchanged, removed
+
+        args = [(self.root, rel_path, sha1, self.formats) for rel_path, sha1 in pending]
+        if jobs == 1 or len(args) < 2:
+            results = [compress_file(*a) for a in args]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(compress_file, *zip(*args), chunksize=8))
+        for rel_path, sha1, raw, sizes in results:
+            stat = (self.root / rel_path).stat()
+            self.manifest[rel_path] = {'stamp': [stat.st_mtime_ns, stat.st_size], 'sha1': sha1,
+                                       'bytes': raw, 'sizes': sizes, 'formats': list(self.formats)}
+        for rel_path in removed:
+            path = self.root / rel_path
+            for fmt in self.manifest.pop(rel_path)['sizes']:
+                try:
+                    os.unlink(path.with_name(f"{path.name}.{fmt}"))
+                except FileNotFoundError:
+                    pass
+        self.save()
+        return [rel_path for rel_path, *_ in results], unchanged, removed
+
+    def save(self):
+        self.manifest_path.parent.mkdir(exist_ok=True)
+        atomic_write(self.manifest_path, json.dumps(dict(sorted(self.manifest.items()))))
+
+    def report(self):
+        files = []
+        totals = {'bytes': 0, **{fmt: 0 for fmt in self.formats}}
+        for rel_path, entry in sorted(self.manifest.items()):
+            item = {'path': rel_path, 'bytes': entry['bytes']}
+            totals['bytes'] += entry['bytes']
+            for fmt in self.formats:
+                size = entry['sizes'].get(fmt, entry['bytes'])
+                totals[fmt] += size
+                item[fmt] = size
+                item[f"{fmt}_saved"] = entry['bytes'] - size
+            files.append(item)
+        files.sort(key=lambda item: -item.get('gz_saved', 0))
+        return {'summary': {'files': len(files), **totals,
+                            **{f"{fmt}_saved": totals['bytes'] - totals[fmt] for fmt in self.formats}},
+                'files': files}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Write .gz/.br siblings of the text assets')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Compression processes (default: one per CPU)')
+    parser.add_argument('--dry-run', action='store_true', help='List what would be compressed')
+    args = parser.parse_args()
+
+    compressor = Precompressor(args.project_dir)
+    if brotli is None:
+        print("brotli not installed: writing .gz only (pip install brotli)")
+    done, unchanged, removed = compressor.run(args.jobs, args.dry_run)
+    print(f"{'To compress' if args.dry_run else 'Compressed'}: {len(done)}, unchanged: {len(unchanged)}, "
+          f"{'to remove' if args.dry_run else 'removed'}: {len(removed)}")
+    if args.dry_run:
+        for rel_path in done[:20]:
+            print(f"  {rel_path}")
+        if len(done) > 20:
+            print(f"  ... and {len(done) - 20} more")
+        return 0
+
+    report = compressor.report()
+    summary = report['summary']
+    if summary['files']:
+        for fmt in compressor.formats:
+            print(f"  .{fmt}: {summary['bytes'] / 1e6:.2f} MB -> {summary[fmt] / 1e6:.2f} MB "
+                  f"({summary[f'{fmt}_saved'] / summary['bytes']:.0%} saved)")
+        for item in report['files'][:5]:
+            print(f"  {item['path']}: {item['bytes'] / 1024:.0f} KB -> {item['gz'] / 1024:.0f} KB gzipped")
+
+    report_name = f"PRECOMPRESS_REPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(Path(args.project_dir) / report_name, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved: {report_name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
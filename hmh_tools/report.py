@@ -0,0 +1,67 @@
+"""
+HMH Tools - Streaming Reports
+
+ReportStream writes an audit as NDJSON: one compact JSON object per line,
+flushed as soon as a check produces it. Nothing is held back until the end
+of the run, so memory does not grow with the report and CI can follow an
+audit with `tail -f`.
+
+Every record has a "type" field:
+  start    - tool, version, timestamp
+  file     - per-file findings as they are computed
+  finding  - one problem (broken link, violation, ...)
+  check    - status/issues of one finished check
+  summary  - the final overall result
+
+Usage:
+    with ReportStream('SHIVA_REPORT.ndjson') as stream:
+        stream.emit('start', tool='SHIVA', version='4.0')
+        stream.emit('finding', check='links', source='a.html', link='b.html')
+"""
+
+import json
+import os
+import re
+
+# <TOOL>_REPORT_<timestamp>.json(.ndjson) files the tools write into the site
+TOOL_REPORT = re.compile(r'^[A-Z0-9_]+_REPORT')
+
+
+def is_tool_report(rel_path):
+    return bool(TOOL_REPORT.match(os.path.basename(rel_path)))
+
+
+def dumps_compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def write_compact_json(path, data):
+    """Final summary as a single-line JSON file (no indent)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(dumps_compact(data))
+        f.write('\n')
+
+
+class ReportStream:
+    """Append-only NDJSON report, flushed record by record."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+        self.records = 0
+
+    def emit(self, record_type, **fields):
+        self.file.write(dumps_compact({'type': record_type, **fields}))
+        self.file.write('\n')
+        self.file.flush()
+        self.records += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,62 @@
+"""
+HMH Tools - Path Resolver
+
+Answers "where does this link point, and is anything there?" without
+touching the filesystem per link. The set of every file (and every
+directory containing one) comes from the corpus walk, and resolution of
+(source_dir, href) pairs is memoized with an LRU, so the same href from
+the same directory is only normalized once per run.
+
+Paths that resolve outside the site root fall back to a real stat(),
+because nothing in the walk can answer for them.
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+
+RESOLVE_CACHE_SIZE = 1 << 16
+
+
+class PathResolver:
+    """Site-relative resolution and existence checks from a single walk."""
+
+    def __init__(self, root, files):
+        self.root = Path(root)
+        self.abs_root = os.path.abspath(self.root)
+        self.files = set(files)
+        self.dirs = {''}
+        for rel_path in self.files:
+            parent = os.path.dirname(rel_path)
+            while parent not in self.dirs:
+                self.dirs.add(parent)
+                parent = os.path.dirname(parent)
+        self.resolve = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self._resolve)
+
+    def _resolve(self, source_dir, href):
+        """Site-relative path of href as seen from source_dir.
+
+        href is used verbatim (callers strip query strings or fragments if
+        they want to); a leading '/' is relative to the site root. The
+        result starts with '..' when the link leaves the site.
+        """
+        if href.startswith('/'):
+            joined = href.lstrip('/')
+        else:
+            joined = os.path.join(source_dir, href)
+        return os.path.normpath(joined) if joined else '.'
+
+    def is_file(self, rel_path):
+        return rel_path in self.files
+
+    def is_dir(self, rel_path):
+        return ('' if rel_path == '.' else rel_path) in self.dirs
+
+    def exists(self, rel_path):
+        """Like os.path.exists() for a site-relative path"""
+        if rel_path == '..' or rel_path.startswith('..' + os.sep):
+            return os.path.exists(self.root / rel_path)
+        return rel_path in self.files or self.is_dir(rel_path)
+
+    def absolute(self, rel_path):
+        return os.path.normpath(os.path.join(self.abs_root, rel_path))
@@ -0,0 +1,230 @@
+"""
+HMH Tools - CSS Rewrite Engine
+
+Rewrites declarations in stylesheets, <style> blocks and style=""
+attributes as minimal range patches on the original text, instead of
+regex-substituting whole blocks. Everything outside a patch - whitespace,
+comments, media queries, the rest of the file - is left byte for byte.
+
+  fixer(block)          a function that looks at one DeclarationBlock (a
+                        CSS rule body or a style="" value) and calls
+                        block.set_value() / .remove() / .insert_after()
+  Rewriter(css_fixers, inline_fixers)
+      .css(text)        patches for a stylesheet
+      .html(text, page) patches for the <style> blocks and style=""
+                        attributes of a page (page: its parse_page(),
+                        made here if not given)
+      .file(path)       FileRewrite: old and new bytes, patches, diff()
+  apply_patches()       splices non-overlapping patches in one pass
+
+Rules are located with hmh_tools.css (so strings, comments and @media
+nesting are handled), and <style>/style="" positions from the tag offsets
+of the shared page parse (style_elements()), so a page is tokenized once.
+Rule bodies holding nested rules are left alone.
+
+Usage:
+    rewriter = Rewriter([grid_to_flex])
+    change = rewriter.file(Path('index.html'))
+    if change.patches:
+        print(change.diff('index.html'))    # dry run
+        change.write()                      # one write per file
+"""
+
+import difflib
+import re
+from collections import namedtuple
+
+from .atomic import atomic_write
+from .css import declaration_spans, parse_css
+from .parse import parse_page
+
+# start/end are offsets into the decoded text; reason says which fixer asked
+Patch = namedtuple('Patch', 'start end text reason')
+
+# One <style> element: offsets of the tag, its content and the end of </style>
+StyleElement = namedtuple('StyleElement', 'start content_start content_end end attrs')
+
+_STYLE_ATTR = re.compile(r'''\sstyle\s*=\s*(?:"([^"]*)"|'([^']*)')''', re.IGNORECASE)
+
+
+def apply_patches(text, patches):
+    """text with every patch applied; overlapping patches are an error."""
+    pieces = []
+    pos = 0
+    for patch in sorted(patches, key=lambda p: (p.start, p.end)):
+        if patch.start < pos:
+            raise ValueError(f"overlapping patches at offset {patch.start}: {patch.reason}")
+        pieces.append(text[pos:patch.start])
+        pieces.append(patch.text)
+        pos = patch.end
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+
+class DeclarationBlock:
+    """The declarations of one rule body or style="" value, and the patches
+    fixers ask for. Declarations always describe the original text."""
+
+    def __init__(self, text, start, end, inline=False, selectors=()):
+        self.text = text
+        self.inline = inline
+        self.selectors = selectors
+        self.declarations = list(declaration_spans(text, start, end))
+        self.patches = []
+        self.reason = None
+
+    def get(self, prop):
+        """The declaration that wins for prop (the last one), or None."""
+        for decl in reversed(self.declarations):
+            if decl.property == prop:
+                return decl
+        return None
+
+    def set_value(self, decl, value):
+        if self.text[decl.value_start:decl.value_end] != value:
+            self.patches.append(Patch(decl.value_start, decl.value_end, value, self.reason))
+
+    def remove(self, decl):
+        """Drop a declaration, and its line when it has one to itself."""
+        text = self.text
+        line_start = text.rfind('\n', 0, decl.start) + 1
+        line_end = text.find('\n', decl.end)
+        line_end = len(text) if line_end < 0 else line_end
+        if not self.inline and not text[line_start:decl.start].strip() and not text[decl.end:line_end].strip():
+            self.patches.append(Patch(line_start, min(line_end + 1, len(text)), '', self.reason))
+            return
+        end = decl.end
+        while end < len(text) and text[end] in ' \t':
+            end += 1
+        self.patches.append(Patch(decl.start, end, '', self.reason))
+
+    def insert_after(self, decl, declarations):
+        """Add declarations ('prop: value;' strings) right after decl, on
+        their own lines with its indentation if decl has a line to itself."""
+        if not declarations:
+            return
+        text = self.text
+        line_start = text.rfind('\n', 0, decl.start) + 1
+        indent = text[line_start:decl.start]
+        if not self.inline and not indent.strip():
+            newline = '\r\n' if text[line_start - 2:line_start] == '\r\n' else '\n'
+            separator = newline + indent
+        else:
+            separator = ' '
+        # a last declaration may omit its ';'
+        prefix = '' if text[decl.start:decl.end].rstrip().endswith(';') else ';'
+        added = prefix + ''.join(separator + d for d in declarations)
+        self.patches.append(Patch(decl.end, decl.end, added, self.reason))
+
+
+def style_elements(page, skip=()):
+    """StyleElement of every closed <style> of a parsed page, leaving out
+    those inside an element whose tag is in skip."""
+    elements = []
+    opened = None
+    inside = 0
+    for kind, tag, attrs, start, end in page.events():
+        if tag in skip:
+            inside = inside + 1 if kind == 'start' else max(inside - 1, 0)
+        elif tag != 'style':
+            continue
+        elif kind == 'start':
+            opened = None if inside else (start, end, attrs)
+        elif opened is not None:
+            elements.append(StyleElement(opened[0], opened[1], start, end, opened[2]))
+            opened = None
+    return elements
+
+
+def style_attr_spans(page, text):
+    """(start, end) of the style="" values of a parsed page."""
+    spans = []
+    for (tag, attrs, _), (start, end) in zip(page.tags, page.spans):
+        if 'style' in attrs:
+            m = _STYLE_ATTR.search(text, start, end)
+            if m:
+                group = 1 if m.group(1) is not None else 2
+                spans.append((m.start(group), m.end(group)))
+    return spans
+
+
+class FileRewrite:
+    """Result of rewriting one file: nothing is written until write()."""
+
+    def __init__(self, path, old, new, patches):
+        self.path = path
+        self.old = old
+        self.new = new
+        self.patches = patches
+
+    @property
+    def changed(self):
+        return self.old != self.new
+
+    def diff(self, name=None):
+        name = name or str(self.path)
+        old = self.old.decode('utf-8').splitlines(keepends=True)
+        new = self.new.decode('utf-8').splitlines(keepends=True)
+        return ''.join(difflib.unified_diff(old, new, f"a/{name}", f"b/{name}"))
+
+    def write(self):
+        """One atomic write of the whole new content."""
+        atomic_write(self.path, self.new)
+
+
+class Rewriter:
+    """Runs fixers over the CSS of stylesheets and pages."""
+
+    def __init__(self, css_fixers, inline_fixers=()):
+        self.css_fixers = list(css_fixers)
+        self.inline_fixers = list(inline_fixers)
+
+    def _run(self, fixers, block):
+        for fixer in fixers:
+            block.reason = fixer.__name__
+            fixer(block)
+        return block.patches
+
+    def css(self, text, start=0, end=None):
+        """Patches for the rules of text[start:end] (a sheet or <style> block)."""
+        end = len(text) if end is None else end
+        patches = []
+        # rule body offsets are relative to the slice
+        for rule in parse_css(text[start:end]):
+            body_start, body_end = rule.body
+            if '{' in text[start + body_start:start + body_end]:
+                continue
+            block = DeclarationBlock(text, start + body_start, start + body_end,
+                                     selectors=rule.selectors)
+            patches.extend(self._run(self.css_fixers, block))
+        return patches
+
+    def inline(self, text, start, end):
+        block = DeclarationBlock(text, start, end, inline=True)
+        return self._run(self.inline_fixers, block)
+
+    def html(self, text, page=None):
+        if page is None:
+            page = parse_page(text)
+        patches = []
+        for element in style_elements(page):
+            patches.extend(self.css(text, element.content_start, element.content_end))
+        if self.inline_fixers:
+            for start, end in style_attr_spans(page, text):
+                if '&' not in text[start:end]:    # leave entity-encoded values alone
+                    patches.extend(self.inline(text, start, end))
+        return patches
+
+    def file(self, path):
+        """FileRewrite for one .html or .css file (UTF-8; others are left alone)."""
+        old = path.read_bytes()
+        try:
+            text = old.decode('utf-8')
+        except UnicodeDecodeError:
+            return FileRewrite(path, old, old, [])
+        if path.suffix == '.css':
+            patches = self.css(text)
+        else:
+            patches = self.html(text)
+        new = apply_patches(text, patches).encode('utf-8') if patches else old
+        return FileRewrite(path, old, new, patches)
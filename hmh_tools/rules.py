@@ -0,0 +1,188 @@
+"""
+HMH Tools - Rule Engine
+
+Runs a set of file-level regex rules (like SHIVA's OMEGA_FAILURE_PATTERNS)
+with ONE scan per file instead of one re.search() per (rule x file).
+
+Rules written as
+    A.*B.*C        "A, later B, later C"   (re.DOTALL)
+    A(?!.*B)       "an A with no B anywhere after it"
+are split into their literal parts. All parts of all rules are compiled
+into a single alternation; the scan visits each position where any part
+matches, records it, and each rule is then decided from the recorded
+positions. That also removes the catastrophic backtracking of
+`display:\\s*grid.*grid-template-columns` on large inline-style pages.
+
+Any other rule shape is kept as its own precompiled regex.
+
+Each hit reports the same start/end re.search() would, plus the line and
+the byte offset in the UTF-8 file.
+
+Usage:
+    engine = RuleEngine({'grid': r'display:\\s*grid.*grid-template-columns'})
+    for hit in engine.scan(text):
+        print(hit.rule, hit.line, hit.byte_offset)
+"""
+
+import re
+from bisect import bisect_left
+from collections import namedtuple
+
+RuleHit = namedtuple('RuleHit', 'rule start end line byte_offset')
+
+_NEGATIVE_TAIL = re.compile(r'^(?P<head>.+)\(\?!\.\*(?P<tail>[^()]+)\)$', re.DOTALL)
+_LITERAL_PREFIX = re.compile(r'[^\\\[\](){}.*+?|^$]*')
+
+
+def _split_parts(pattern):
+    """Split on top-level '.*', or None if the pattern has other structure."""
+    parts = pattern.split('.*')
+    for part in parts:
+        if not part or '(' in part.replace(r'\(', '') or '|' in part:
+            return None
+    return parts
+
+
+class _Rule:
+    def __init__(self, name, pattern, flags):
+        self.name = name
+        self.kind = 'regex'
+        self.parts = []
+
+        negative = _NEGATIVE_TAIL.match(pattern)
+        if negative:
+            head = _split_parts(negative.group('head'))
+            tail = _split_parts(negative.group('tail'))
+            if head and len(head) == 1 and tail and len(tail) == 1:
+                self.kind = 'not_followed'
+                self.parts = [head[0], tail[0]]
+        else:
+            parts = _split_parts(pattern)
+            if parts:
+                self.kind = 'sequence'
+                self.parts = parts
+
+        if self.kind == 'regex':
+            self.regex = re.compile(pattern, flags)
+
+
+class RuleEngine:
+    """Named file-level rules, evaluated with a single combined scan."""
+
+    def __init__(self, rules, flags=re.IGNORECASE | re.DOTALL):
+        self.flags = flags
+        self.rules = [_Rule(name, pattern, flags) for name, pattern in rules.items()]
+
+        self.tokens = []
+        for rule in self.rules:
+            rule.token_ids = []
+            for part in rule.parts:
+                if part not in self.tokens:
+                    self.tokens.append(part)
+                rule.token_ids.append(self.tokens.index(part))
+
+        self.token_regexes = [re.compile(t, flags) for t in self.tokens]
+        prefixes = [_LITERAL_PREFIX.match(t).group(0).lower() for t in self.tokens]
+
+        self.combined = None
+        if self.tokens:
+            alternation = '|'.join(f'(?P<t{i}>{t})' for i, t in enumerate(self.tokens))
+            if all(prefixes):
+                # sre cannot skip ahead on an alternation by itself; a
+                # first-character class lets it jump between candidates
+                first = {p[0] for p in prefixes}
+                if flags & re.IGNORECASE:
+                    first |= {c.upper() for c in first}
+                chars = ''.join(re.escape(c) for c in sorted(first))
+                alternation = f'(?=[{chars}])(?:{alternation})'
+            self.combined = re.compile(alternation, flags)
+
+        # Tokens that could also match where token i matched: only those whose
+        # literal prefixes are compatible need a second look at that position
+        self.overlaps = [
+            [j for j, q in enumerate(prefixes) if j != i and (p.startswith(q) or q.startswith(p))]
+            for i, p in enumerate(prefixes)
+        ]
+        self.regex_invocations = 0
+
+    def _occurrences(self, text):
+        """Every (start, end) of every token, from one pass over text."""
+        found = [[] for _ in self.tokens]
+        if self.combined is None:
+            return found
+        token_regexes = self.token_regexes
+        overlaps = self.overlaps
+        search = self.combined.search
+        calls = 1
+        # Resume one past each hit (not at its end) so a part that starts
+        # inside another part's match is still seen
+        m = search(text)
+        while m is not None:
+            i = m.start()
+            token_id = int(m.lastgroup[1:])
+            if m.end() > i:
+                found[token_id].append((i, m.end()))
+            for other in overlaps[token_id]:
+                tm = token_regexes[other].match(text, i)
+                calls += 1
+                if tm and tm.end() > i:
+                    found[other].append((i, tm.end()))
+            m = search(text, i + 1)
+            calls += 1
+        self.regex_invocations += calls
+        return found
+
+    def _evaluate(self, rule, found, text):
+        if rule.kind == 'regex':
+            self.regex_invocations += 1
+            m = rule.regex.search(text)
+            return (m.start(), m.end()) if m else None
+
+        occurrences = [found[t] for t in rule.token_ids]
+
+        if rule.kind == 'sequence':
+            # Earliest-ending choice at each step is optimal for A.*B.*C
+            first = occurrences[0]
+            if not first:
+                return None
+            start, pos = first[0]
+            for occ in occurrences[1:-1]:
+                k = bisect_left(occ, (pos, -1))
+                if k == len(occ):
+                    return None
+                pos = occ[k][1]
+            last = occurrences[-1]
+            if len(occurrences) > 1:
+                # greedy '.*' runs to the last occurrence of the final part
+                if not last or last[-1][0] < pos:
+                    return None
+                pos = last[-1][1]
+            return start, pos
+
+        # not_followed: an A whose end lies after the last B start
+        heads, tails = occurrences
+        last_tail = tails[-1][0] if tails else -1
+        for start, end in heads:
+            if end > last_tail:
+                return start, end
+        return None
+
+    def scan(self, text):
+        """RuleHit for every rule that matches text, in rule order."""
+        found = self._occurrences(text)
+        spans = []
+        for rule in self.rules:
+            span = self._evaluate(rule, found, text)
+            if span is not None:
+                spans.append((rule.name, span))
+
+        # Line numbers and UTF-8 byte offsets in one forward walk
+        hits = {}
+        line, byte_offset, prev = 1, 0, 0
+        for name, (start, end) in sorted(spans, key=lambda item: item[1][0]):
+            segment = text[prev:start]
+            line += segment.count('\n')
+            byte_offset += len(segment.encode('utf-8'))
+            prev = start
+            hits[name] = RuleHit(name, start, end, line, byte_offset)
+        return [hits[rule.name] for rule in self.rules if rule.name in hits]
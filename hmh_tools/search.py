@@ -0,0 +1,273 @@
+"""
+HMH Tools - Search Index
+
+Builds the full-text index js/smart-search.js queries site-wide: every
+listed page is parsed once (through the shared page cache) and its
+title and visible text go into an inverted index, term -> pages and
+word positions, split into shards the browser loads only when a query
+needs them.
+
+  search-index/meta.json        pages [url, title], stopwords and the
+                                shard table [first term, file]; the one
+                                file that is rewritten in place
+  search-index/shards/<hash>.json
+                                one shard: {term: postings} for a sorted
+                                range of terms, named by content hash so
+                                it can be cached forever (netlify.toml
+                                gives shards/ a one-year Cache-Control,
+                                meta.json is revalidated)
+
+Postings are one flat integer list per term, delta-encoded for gzip:
+[page delta, n, first position, position delta x (n - 1), page delta, ...].
+
+Terms are produced exactly like SmartSearch.normalize(): lower case,
+'-' and '_' as spaces, anything but ASCII letters, digits and
+whitespace dropped; single characters and stopwords are not indexed.
+Shard boundaries are kept from the previous build while every shard
+stays within SHARD_BYTES / 4 .. SHARD_BYTES * 2, so editing one page
+rewrites only the shards its terms live in.
+
+Pages are the sitemap's: 404.html, robots.txt Disallow paths and
+<meta name="robots" noindex> pages are left out. Per-page terms are
+cached in .hmh_cache/search.pickle, so a rebuild reads only changed pages.
+The index is not committed: the Netlify build runs this module.
+
+Usage:
+    python3 -m hmh_tools.search [project_directory]
+    python3 -m hmh_tools.search [project_directory] --dry-run
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from bisect import bisect_right
+from pathlib import Path
+
+from .atomic import atomic_write
+from .cache import AuditCache
+from .corpus import Corpus
+from .sitemap import is_noindex, robots_disallowed
+
+INDEX_DIR = 'search-index'
+META = 'meta.json'
+SHARD_DIR = 'shards'
+INDEX_FORMAT = 1
+
+SHARD_BYTES = 48 * 1024      # target raw JSON size of one shard
+MAX_TERM_LENGTH = 40
+
+STOPWORDS = frozenset('''
+a an and are as at be but by for from has have he her his i if in into is it its
+of on or our she so than that the their them then there these they this to was
+we were what when which who will with you your
+'''.split())
+
+_DASHES = re.compile(r'[-_]')
+_NOT_WORD = re.compile(r'[^A-Za-z0-9_\s]')
+
+
+def tokenize(text):
+    """Words of text as SmartSearch.normalize() splits them."""
+    return _NOT_WORD.sub('', _DASHES.sub(' ', text.lower())).split()
+
+
+def page_terms(page):
+    """{term: [positions]} of a page's visible text (the <title> is one of
+    its text nodes)."""
+    terms = {}
+    position = 0
+    for text in page.text_nodes:
+        for word in tokenize(text):
+            if len(word) > 1 and len(word) <= MAX_TERM_LENGTH and word not in STOPWORDS:
+                terms.setdefault(word, []).append(position)
+            position += 1
+    return terms
+
+
+def encode_postings(postings):
+    """[(page id, positions)] sorted by page id -> flat delta-encoded list."""
+    flat = []
+    previous = 0
+    for page_id, positions in postings:
+        flat.append(page_id - previous)
+        previous = page_id
+        flat.append(len(positions))
+        flat.append(positions[0])
+        flat.extend(b - a for a, b in zip(positions, positions[1:]))
+    return flat
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def split_shards(sizes, boundaries=()):
+    """First term of each shard for {term: encoded size}, terms sorted.
+
+    The previous boundaries are kept when every shard they produce is
+    still within SHARD_BYTES / 4 .. SHARD_BYTES * 2.
+    """
+    terms = sorted(sizes)
+    if boundaries:
+        totals = [0] * len(boundaries)
+        for term in terms:
+            totals[max(0, bisect_right(boundaries, term) - 1)] += sizes[term]
+        low = SHARD_BYTES // 4 if len(totals) > 1 else 0
+        if all(low <= total <= SHARD_BYTES * 2 for total in totals):
+            return list(boundaries)
+
+    firsts = []
+    total = SHARD_BYTES
+    for term in terms:
+        if total >= SHARD_BYTES:
+            firsts.append(term)
+            total = 0
+        total += sizes[term]
+    return firsts
+
+
+class SearchIndex:
+    """The listed pages of a site and their terms, ready to be sharded."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.dir = self.root / INDEX_DIR
+        self.shard_dir = self.dir / SHARD_DIR
+        self.cache = AuditCache(self.root, 'search')
+        self.corpus = Corpus(self.root, cache=self.cache)
+        self.pages = []         # [url, title], page id = position
+        self.postings = {}      # term -> [(page id, positions)]
+        self.pages_read = 0
+        self.pages_cached = 0
+
+    def listed(self):
+        disallowed = robots_disallowed(self.root)
+        for doc in sorted(self.corpus.html(), key=lambda d: d.rel_path):
+            if doc.rel_path == '404.html' or doc.rel_path.startswith(tuple(disallowed)):
+                continue
+            yield doc
+
+    def collect(self):
+        for doc in self.listed():
+            if self.cache.has(doc, 'terms'):
+                entry = self.cache.get(doc, 'terms')
+                self.pages_cached += 1
+            else:
+                page = doc.page
+                entry = None if is_noindex(page) else (page.title or '', page_terms(page))
+                self.cache.put(doc, 'terms', entry)
+                self.pages_read += 1
+            if entry is None:       # noindex
+                continue
+            title, terms = entry
+            page_id = len(self.pages)
+            url = '/' + doc.rel_path.replace(os.sep, '/')
+            self.pages.append([url[:-len('index.html')] if url.endswith('/index.html') else url, title])
+            for term, positions in terms.items():
+                self.postings.setdefault(term, []).append((page_id, positions))
+        self.cache.save()
+
+    def previous_meta(self):
+        try:
+            with open(self.dir / META) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('format') == INDEX_FORMAT else None
+
+    def up_to_date(self):
+        """True when no listed page changed since the index on disk was built."""
+        previous = self.previous_meta()
+        return (previous is not None and self.pages_read == 0 and previous['pages'] == self.pages
+                and all((self.shard_dir / name).exists() for _, name in previous['shards']))
+
+    def build(self):
+        """(meta, {file name: shard bytes})"""
+        # each term's '"term":[postings]' member, serialized once
+        members = {term: f"{_dumps(term)}:{_dumps(encode_postings(postings))}"
+                   for term, postings in self.postings.items()}
+        sizes = {term: len(member) + 1 for term, member in members.items()}
+        previous = self.previous_meta()
+        firsts = split_shards(sizes, [first for first, _ in previous['shards']] if previous else ())
+
+        shards = [[] for _ in firsts]
+        for term in sorted(members):
+            shards[max(0, bisect_right(firsts, term) - 1)].append(members[term])
+        files = {}
+        table = []
+        for first, shard in zip(firsts, shards):
+            data = f"{{{','.join(shard)}}}".encode('utf-8')
+            name = f"{hashlib.sha1(data).hexdigest()[:12]}.json"
+            files[name] = data
+            table.append([first, name])
+        meta = {
+            'format': INDEX_FORMAT,
+            'pages': self.pages,
+            'stopwords': sorted(STOPWORDS),
+            'shards': table,
+        }
+        return meta, files
+
+    def write(self, meta, files, dry_run=False):
+        """Write new shards and meta.json, drop shards no longer listed.
+        Returns (written, removed) file names."""
+        existing = {p.name for p in self.shard_dir.glob('*.json')}
+        written = [name for name in files if name not in existing]
+        removed = sorted(existing - set(files))
+        meta_data = _dumps(meta).encode('utf-8')
+        try:
+            meta_changed = (self.dir / META).read_bytes() != meta_data
+        except OSError:
+            meta_changed = True
+        if meta_changed:
+            written.append(META)
+        if dry_run:
+            return written, removed
+
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        # Shards first: a reader of the new meta.json always finds its shards
+        for name in written:
+            data = meta_data if name == META else files[name]
+            atomic_write(self.dir / META if name == META else self.shard_dir / name, data)
+        for name in removed:
+            os.unlink(self.shard_dir / name)
+        return written, removed
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the sharded site search index')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--dry-run', action='store_true', help='Report the changes, write nothing')
+    args = parser.parse_args()
+
+    index = SearchIndex(args.project_dir)
+    index.collect()
+    print(f"Pages indexed: {len(index.pages)} ({index.pages_read} read, {index.pages_cached} from cache)")
+    if index.up_to_date():
+        print("Search index up to date")
+        return 0
+    meta, files = index.build()
+    written, removed = index.write(meta, files, dry_run=args.dry_run)
+
+    shard_sizes = [len(data) for data in files.values()]
+    gzipped = [len(gzip.compress(data)) for data in files.values()]
+    print(f"Terms: {len(index.postings)}, shards: {len(files)}")
+    if files:
+        print(f"Shard size: {max(shard_sizes) / 1024:.1f} KB max, {max(gzipped) / 1024:.1f} KB gzipped; "
+              f"whole index {sum(shard_sizes) / 1024:.0f} KB, {sum(gzipped) / 1024:.0f} KB gzipped")
+    print(f"meta.json: {len(_dumps(meta)) / 1024:.1f} KB")
+    if written or removed:
+        print(f"{'Would write' if args.dry_run else 'Wrote'}: {len(written)} files, "
+              f"{'would remove' if args.dry_run else 'removed'}: {len(removed)}")
+    else:
+        print("Search index up to date")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
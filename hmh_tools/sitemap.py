@@ -0,0 +1,466 @@
+"""
+HMH Tools - Incremental Sitemap
+
+Keeps a persistent URL <-> file index of the site's pages in
+.hmh_cache/sitemap.pickle and regenerates sitemap.xml from it:
+
+  - which pages are listed: every HTML page except 404.html, pages under
+    a robots.txt Disallow and pages with <meta name="robots" noindex>
+  - lastmod changes only when a page's content hash changes, so
+    re-checkouts and touch(1) do not churn the sitemap. A page the index
+    has not seen yet (a fresh clone: the index is not committed) keeps
+    the <lastmod> of sitemap.xml, or the date of its last git commit,
+    whichever is later; the file's mtime is only the last resort
+  - priority / changefreq, the order of the URLs and the <!-- section -->
+    comments between them are kept from the current sitemap.xml (a
+    hand-edited sitemap is re-imported before the next regeneration);
+    pages it does not list yet follow, by path
+  - past 50,000 URLs, sitemap.xml becomes a sitemap index over
+    sitemap-N.xml files; URLs keep their file, so only the files whose
+    entries changed are rewritten
+
+Only changed pages are read: with an explicit list of changed paths
+(the audit daemon, a git hook) the update is O(changed); without one,
+(mtime, size) stamps pick the changed files and only those are hashed.
+
+Usage:
+    python3 -m hmh_tools.sitemap [project_directory]
+    python3 -m hmh_tools.sitemap [project_directory] --dry-run
+    python3 -m hmh_tools.sitemap [project_directory] --paths about.html physics/index.html
+"""
+
+import hashlib
+import os
+import pickle
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, unquote
+from xml.sax.saxutils import escape
+
+from .atomic import atomic_write
+from .cache import CACHE_DIR
+from .corpus import Corpus
+from .parse import parse_page
+
+SITE_URL = 'https://www.havemindmedia.com'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+INDEX_FORMAT = 1
+
+# sitemaps.org limit per file
+MAX_URLS = 50000
+
+EXCLUDED_PAGES = {'404.html'}
+
+# dirty_shards marker: every sitemap-N.xml must be rewritten
+ALL_SHARDS = 'all'
+
+# One page of the index. digest/stamp describe the file when last seen;
+# listed is False for pages kept out of the sitemap (noindex, Disallow);
+# section is the comment the page was listed under in sitemap.xml ('' if
+# none), None for a page sitemap.xml did not list when last imported
+Entry = namedtuple('Entry', 'url digest stamp lastmod priority changefreq listed section')
+
+SitemapDiff = namedtuple('SitemapDiff', 'added removed updated')
+
+
+def url_for(rel_path, base_url=SITE_URL):
+    path = rel_path.replace(os.sep, '/')
+    if path == 'index.html':
+        return f"{base_url}/"
+    return f"{base_url}/{quote(path, safe='/-_.~')}"
+
+
+def path_for(url, base_url=SITE_URL):
+    """Relative file path of a sitemap URL (the site root is index.html)."""
+    path = unquote(url.replace(base_url, '', 1)).lstrip('/')
+    if not path or path.endswith('/'):
+        path += 'index.html'
+    return path.replace('/', os.sep)
+
+
+def parse_sitemap(path):
+    """[(loc, priority, changefreq, lastmod, section)] of a urlset file, in
+    file order; section is the text of the last comment before the <url>
+    ('' if none). [] if unreadable."""
+    try:
+        parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
+        root = ET.parse(path, parser).getroot()
+    except (OSError, ET.ParseError):
+        return []
+    ns = {'s': SITEMAP_NS}
+    if root.tag == f"{{{SITEMAP_NS}}}sitemapindex":
+        entries = []
+        for sitemap in root.findall('s:sitemap', ns):
+            loc = sitemap.findtext('s:loc', namespaces=ns) or ''
+            entries.extend(parse_sitemap(Path(path).parent / loc.rsplit('/', 1)[-1]))
+        return entries
+    entries = []
+    section = ''
+    for child in root:
+        if child.tag is ET.Comment:
+            section = (child.text or '').strip()
+        elif child.tag == f"{{{SITEMAP_NS}}}url" and child.findtext('s:loc', namespaces=ns):
+            entries.append((child.findtext('s:loc', namespaces=ns).strip(),
+                            child.findtext('s:priority', namespaces=ns),
+                            child.findtext('s:changefreq', namespaces=ns),
+                            child.findtext('s:lastmod', namespaces=ns),
+                            section))
+    return entries
+
+
+def robots_disallowed(root):
+    """Path prefixes robots.txt disallows (for every user agent)."""
+    prefixes = []
+    try:
+        lines = (Path(root) / 'robots.txt').read_text(encoding='utf-8', errors='ignore').splitlines()
+    except OSError:
+        return prefixes
+    for line in lines:
+        key, _, value = line.partition(':')
+        value = value.split('#')[0].strip().lstrip('/')
+        if key.strip().lower() == 'disallow' and value:
+            prefixes.append(value.replace('/', os.sep))
+    return prefixes
+
+
+def is_noindex(page):
+    for tag, attrs, _ in page.tags:
+        if tag == 'meta' and (attrs.get('name') or '').lower() == 'robots':
+            if 'noindex' in (attrs.get('content') or '').lower():
+                return True
+    return False
+
+
+def _lastmod(mtime):
+    return datetime.fromtimestamp(mtime, timezone.utc).strftime('%Y-%m-%d')
+
+
+def git_commit_dates(root):
+    """{rel_path: YYYY-MM-DD of the last commit touching it}; {} outside git."""
+    try:
+        log = subprocess.run(
+            ['git', '-c', 'core.quotePath=false', 'log', '--format=format:%x01%cs',
+             '--name-only', '--relative', '--', '.'],
+            cwd=root, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    dates = {}
+    date = None
+    for line in log.splitlines():
+        if line.startswith('\x01'):
+            date = line[1:]
+        elif line:
+            # Newest commit first: keep the first date seen per path
+            dates.setdefault(line.replace('/', os.sep), date)
+    return dates
+
+
+def _url_line(entry):
+    line = f"  <url><loc>{escape(entry.url)}</loc><lastmod>{entry.lastmod}</lastmod>"
+    if entry.priority:
+        line += f"<priority>{entry.priority}</priority>"
+    if entry.changefreq:
+        line += f"<changefreq>{entry.changefreq}</changefreq>"
+    return line + "</url>"
+
+
+class Sitemap:
+    """Persistent page index and the sitemap file(s) generated from it."""
+
+    def __init__(self, root, base_url=SITE_URL, max_urls=MAX_URLS):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip('/')
+        self.max_urls = max_urls
+        self.path = self.root / CACHE_DIR / 'sitemap.pickle'
+        self.entries = {}        # rel_path -> Entry
+        self.by_url = {}         # url -> rel_path
+        self.shards = {}         # rel_path -> shard number (sitemap index mode)
+        self.written = {}        # file name -> sha1 of what we last wrote
+        self.dirty_shards = set()
+        self.disallowed = robots_disallowed(self.root)
+        self._git_dates = None
+        self._load()
+
+    # -- persistence --
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return
+        if data.get('format') != INDEX_FORMAT or data.get('base_url') != self.base_url:
+            return
+        self.entries = data['entries']
+        self.shards = data['shards']
+        self.written = data['written']
+        self.by_url = {entry.url: rel_path for rel_path, entry in self.entries.items()}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, pickle.dumps({'format': INDEX_FORMAT, 'base_url': self.base_url,
+                                              'entries': self.entries, 'shards': self.shards,
+                                              'written': self.written},
+                                             protocol=pickle.HIGHEST_PROTOCOL))
+
+    # -- lookups --
+
+    def listed(self):
+        return {rel_path: entry for rel_path, entry in self.entries.items() if entry.listed}
+
+    def url(self, rel_path):
+        entry = self.entries.get(rel_path)
+        return entry.url if entry else None
+
+    def page(self, url):
+        return self.by_url.get(url)
+
+    # -- updates --
+
+    def _hand_edited(self):
+        """Whether sitemap.xml is not what this index last wrote."""
+        sitemap = self.root / 'sitemap.xml'
+        try:
+            digest = hashlib.sha1(sitemap.read_bytes()).hexdigest()
+        except OSError:
+            return False
+        return self.written.get('sitemap.xml') != digest
+
+    def _import_current(self):
+        """Take priority / changefreq, sections, order (and the listed set)
+        from sitemap.xml."""
+        imported = {}
+        for loc, priority, changefreq, lastmod, section in parse_sitemap(self.root / 'sitemap.xml'):
+            rel_path = path_for(loc, self.base_url)
+            entry = self.entries.get(rel_path)
+            if entry is not None:
+                imported[rel_path] = entry._replace(priority=priority, changefreq=changefreq,
+                                                    section=section)
+            else:
+                # Seen in the sitemap, not yet hashed: the scan below fills it
+                # in, keeping the published lastmod
+                lastmod = lastmod.strip()[:10] if lastmod else None
+                imported[rel_path] = Entry(loc, None, None, lastmod, priority, changefreq, True, section)
+            self.by_url[loc] = rel_path
+        # The index keeps the sitemap's order; pages it does not list go after
+        others = {rel_path: entry._replace(section=None)
+                  for rel_path, entry in self.entries.items() if rel_path not in imported}
+        self.entries = {**imported, **others}
+
+    def _excluded(self, rel_path):
+        return (rel_path in EXCLUDED_PAGES
+                or any(rel_path.startswith(prefix) for prefix in self.disallowed))
+
+    def _first_lastmod(self, rel_path, imported, mtime):
+        """lastmod of a page not hashed before: not the checkout time if avoidable."""
+        if self._git_dates is None:
+            self._git_dates = git_commit_dates(self.root)
+        known = [d for d in (imported, self._git_dates.get(rel_path)) if d]
+        return max(known) if known else _lastmod(mtime)
+
+    def _refresh(self, rel_path, diff):
+        """Re-stat (and if needed re-hash) one page; record what changed."""
+        full = self.root / rel_path
+        old = self.entries.get(rel_path)
+        try:
+            stat = full.stat()
+        except OSError:
+            if old is not None:
+                del self.entries[rel_path]
+                self.by_url.pop(old.url, None)
+                if old.listed:
+                    diff.removed.append(rel_path)
+                    self._touch(self.shards.pop(rel_path, None))
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if old is not None and old.stamp == stamp:
+            return
+
+        data = full.read_bytes()
+        digest = hashlib.sha1(data).hexdigest()
+        if old is not None and old.digest == digest:
+            self.entries[rel_path] = old._replace(stamp=stamp)
+            return
+
+        listed = not self._excluded(rel_path) and not is_noindex(
+            parse_page(data.decode('utf-8', errors='ignore')))
+        url = url_for(rel_path, self.base_url)
+        if old is None or old.digest is None:
+            lastmod = self._first_lastmod(rel_path, old and old.lastmod, stat.st_mtime)
+        else:
+            lastmod = _lastmod(stat.st_mtime)
+        entry = Entry(url, digest, stamp, lastmod,
+                      old.priority if old else None, old.changefreq if old else None, listed,
+                      old.section if old else None)
+        self.entries[rel_path] = entry
+        self.by_url[url] = rel_path
+
+        was_listed = old is not None and old.listed
+        if listed and not was_listed:
+            diff.added.append(rel_path)
+        elif listed:
+            diff.updated.append(rel_path)
+        elif was_listed:
+            diff.removed.append(rel_path)
+        if listed or was_listed:
+            self._touch(self.shards.get(rel_path))
+
+    def _touch(self, shard):
+        if shard is not None:
+            self.dirty_shards.add(shard)
+
+    def update(self, changed=None):
+        """Bring the index up to date; returns a SitemapDiff of listed pages.
+
+        changed: relative paths known to have changed (added, edited or
+        deleted). None means: find them by comparing (mtime, size) stamps.
+        """
+        diff = SitemapDiff([], [], [])
+        if self._hand_edited():
+            self._import_current()
+            self.dirty_shards.add(ALL_SHARDS)
+        if changed is None:
+            html = {doc.rel_path for doc in Corpus(self.root).html()}
+            changed = html | {p for p in self.entries if p not in html}
+        for rel_path in sorted(set(changed)):
+            if rel_path.endswith('.html'):
+                self._refresh(rel_path, diff)
+        # Pages imported from sitemap.xml whose file does not exist
+        for rel_path in [p for p, e in self.entries.items() if e.digest is None]:
+            self._refresh(rel_path, diff)
+        return diff
+
+    # -- output --
+
+    def _assign_shards(self):
+        """Keep each URL in its sitemap-N.xml; new URLs fill the last files."""
+        listed = self.listed()
+        for rel_path in list(self.shards):
+            if rel_path not in listed:
+                del self.shards[rel_path]
+        counts = {}
+        for shard in self.shards.values():
+            counts[shard] = counts.get(shard, 0) + 1
+        shard = max(counts, default=1)
+        for rel_path in sorted(listed):
+            if rel_path in self.shards:
+                continue
+            while counts.get(shard, 0) >= self.max_urls:
+                shard += 1
+            self.shards[rel_path] = shard
+            counts[shard] = counts.get(shard, 0) + 1
+            self.dirty_shards.add(shard)
+
+    def _in_order(self, paths):
+        """Pages as sitemap.xml listed them, then the pages it did not, by path."""
+        position = {rel_path: i for i, rel_path in enumerate(self.entries)}
+
+        def key(rel_path):
+            if self.entries[rel_path].section is None:
+                return (1, 0, rel_path)
+            return (0, position[rel_path], rel_path)
+        return sorted(paths, key=key)
+
+    def render(self):
+        """{file name: content} of every sitemap file that must be (re)written."""
+        listed = self.listed()
+        if len(listed) <= self.max_urls:
+            self.shards = {}
+            return {'sitemap.xml': self._urlset([listed[p] for p in self._in_order(listed)])}
+
+        self._assign_shards()
+        by_shard = {}
+        for rel_path, shard in self.shards.items():
+            by_shard.setdefault(shard, []).append(rel_path)
+        files = {}
+        for shard, paths in sorted(by_shard.items()):
+            name = f"sitemap-{shard}.xml"
+            if shard in self.dirty_shards or ALL_SHARDS in self.dirty_shards or name not in self.written:
+                files[name] = self._urlset([listed[p] for p in self._in_order(paths)])
+        index = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 f'<sitemapindex xmlns="{SITEMAP_NS}">']
+        for shard, paths in sorted(by_shard.items()):
+            lastmod = max(listed[p].lastmod for p in paths)
+            index.append(f"  <sitemap><loc>{escape(self.base_url)}/sitemap-{shard}.xml</loc>"
+                         f"<lastmod>{lastmod}</lastmod></sitemap>")
+        index.append('</sitemapindex>\n')
+        files['sitemap.xml'] = '\n'.join(index)
+        return files
+
+    @staticmethod
+    def _urlset(entries):
+        """One urlset file; each section comment goes before the first URL
+        of its section, after a blank line."""
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<urlset xmlns="{SITEMAP_NS}">']
+        section = ''
+        for entry in entries:
+            if entry.section and entry.section != section:
+                if len(lines) > 2:
+                    lines.append('')
+                lines.append(f"  <!-- {entry.section} -->")
+            section = entry.section
+            lines.append(_url_line(entry))
+        return '\n'.join([*lines, '</urlset>\n'])
+
+    def write(self, dry_run=False):
+        """Write the sitemap files whose content changed; returns their names."""
+        written = []
+        for name, content in self.render().items():
+            data = content.encode('utf-8')
+            digest = hashlib.sha1(data).hexdigest()
+            target = self.root / name
+            if self.written.get(name) == digest and target.exists():
+                continue
+            written.append(name)
+            if dry_run:
+                continue
+            atomic_write(target, data)
+            self.written[name] = digest
+        # sitemap-N.xml files left over from a bigger site
+        for name in list(self.written):
+            if name != 'sitemap.xml' and int(name[8:-4]) not in set(self.shards.values()):
+                if not dry_run:
+                    (self.root / name).unlink(missing_ok=True)
+                    del self.written[name]
+        if not dry_run:
+            self.dirty_shards = set()
+        return written
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Regenerate sitemap.xml from changed pages')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--base-url', default=SITE_URL)
+    parser.add_argument('--paths', nargs='+', metavar='PATH',
+                        help='Only these pages changed (default: detect by mtime/size)')
+    parser.add_argument('--dry-run', action='store_true', help='Report the changes, write nothing')
+    args = parser.parse_args()
+
+    sitemap = Sitemap(args.project_dir, args.base_url)
+    changed = [os.path.normpath(p) for p in args.paths] if args.paths else None
+    diff = sitemap.update(changed)
+    for label, paths in (('added', diff.added), ('removed', diff.removed), ('updated', diff.updated)):
+        for rel_path in paths[:20]:
+            print(f"  {label.upper()}: {rel_path}")
+        if len(paths) > 20:
+            print(f"  ... and {len(paths) - 20} more {label}")
+    written = sitemap.write(dry_run=args.dry_run)
+    print(f"{len(sitemap.listed())} URLs: {len(diff.added)} added, {len(diff.removed)} removed, "
+          f"{len(diff.updated)} updated")
+    if written:
+        print(f"{'Would write' if args.dry_run else 'Wrote'}: {', '.join(written)}")
+    else:
+        print("Sitemap up to date")
+    if not args.dry_run:
+        sitemap.save()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
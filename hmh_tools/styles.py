@@ -0,0 +1,371 @@
+"""
+HMH Tools - Shared Stylesheets
+
+Moves the CSS that many pages carry in their own <style> blocks into
+shared, content-hashed files under css/blocks/, so a visitor downloads it
+once and every later page takes it from the browser cache.
+
+  fingerprint   every top-level rule of a <style> block is normalized with
+                the minifier (comments and whitespace dropped), so copies
+                that differ only in formatting compare equal
+  clusters      a leading run of rules that MIN_PAGES or more pages share,
+                at least MIN_BYTES once minified, becomes one file. A run
+                covering the whole block replaces it; otherwise the block
+                keeps the rules after the run, which are searched again for
+                a further shared run. Runs saving the most bytes go first.
+  files         css/blocks/<sha1>.css holds the run as written on the first
+                page. A name never changes content, so netlify.toml serves
+                /css/blocks/* with a one-year immutable Cache-Control.
+  pages         the hoisted rules become <link rel="stylesheet"> where the
+                <style> was, so the cascade order does not change. The new
+                files and all pages are committed as one transaction
+                (hmh_tools.transaction), so --undo restores the pages and
+                removes the files again.
+
+A run stops at the first rule with a page-relative url() or @import: from
+css/blocks/ it would resolve against another directory. Only plain
+<style> elements (no attributes but media/type) outside <svg>, <template>
+and <noscript> are touched. The files already in css/blocks/ are matched
+first, so a page that copies a hoisted block links the existing file even
+when it is the only copy left.
+
+Usage:
+    python3 -m hmh_tools.styles [project_directory]
+    python3 -m hmh_tools.styles [project_directory] --dry-run
+    python3 -m hmh_tools.styles [project_directory] --undo
+"""
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sys
+import textwrap
+from datetime import datetime
+from pathlib import Path
+
+from .corpus import Corpus
+from .css import is_pinned, statement_spans
+from .minify import minify_css
+from .rewrite import FileRewrite, Patch, apply_patches, style_elements
+from .transaction import ConflictError, Transaction, list_transactions, undo
+
+TOOL_NAME = 'hmh-styles'
+BLOCKS_DIR = 'css/blocks'
+
+MIN_PAGES = 2
+MIN_BYTES = 1024            # smaller runs cost more as a request than they save
+
+CSS_TYPES = {'', 'text/css'}
+# <style> inside these cannot become a <link>
+FOREIGN_PARENTS = {'svg', 'template', 'noscript'}
+
+
+def normalize(css):
+    return ''.join(text for _, text in minify_css(css))
+
+
+class StyleBlock:
+    """One plain <style> element of a page and its top-level rules."""
+
+    def __init__(self, page, text, tag_start, content_start, content_end, close_end, media):
+        self.page = page
+        self.tag_start = tag_start
+        self.content_start = content_start
+        self.content_end = content_end
+        self.close_end = close_end
+        self.media = media
+        # (start, end, normalized) per rule; pinned rules end every run
+        self.rules = []
+        self.pinned = []
+        for start, end in statement_spans(text, content_start, content_end):
+            css = text[start:end]
+            self.rules.append((start, end, normalize(css)))
+            self.pinned.append(is_pinned(css))
+        self.cursor = 0         # first rule not hoisted
+        self.hoisted = []       # shared file paths, in order
+
+    def runs(self):
+        """Normalized rules from the cursor up to the first pinned one."""
+        for i in range(self.cursor, len(self.rules)):
+            if self.pinned[i]:
+                return
+            yield self.rules[i][2]
+
+
+def style_blocks(rel_path, text, page):
+    """StyleBlock of every plain <style> element of a page (text and its
+    parse_page())."""
+    blocks = []
+    for element in style_elements(page, skip=FOREIGN_PARENTS):
+        attrs = element.attrs
+        if set(attrs) - {'media', 'type'} or (attrs.get('type') or '').lower() not in CSS_TYPES:
+            continue
+        blocks.append(StyleBlock(rel_path, text, element.start, element.content_start,
+                                 element.content_end, element.end, attrs.get('media')))
+    return blocks
+
+
+class _Node:
+    """Rule-sequence trie node: the blocks whose remaining rules start with
+    the path to it."""
+
+    __slots__ = ('children', 'blocks', 'depth', 'bytes', 'file')
+
+    def __init__(self, depth=0, size=0):
+        self.children = {}
+        self.blocks = []
+        self.depth = depth
+        self.bytes = size
+        self.file = None
+
+
+def _trie(blocks, existing):
+    roots = {}
+    for media, runs in existing.items():
+        for rules, path in runs:
+            node = roots.setdefault(media, _Node())
+            for rule in rules:
+                node = node.children.setdefault(rule, _Node(node.depth + 1, node.bytes + len(rule)))
+            node.file = path
+    for block in blocks:
+        node = roots.setdefault(block.media, _Node())
+        for rule in block.runs():
+            node = node.children.setdefault(rule, _Node(node.depth + 1, node.bytes + len(rule)))
+            node.blocks.append(block)
+    return roots
+
+
+def _best(roots):
+    """(media, node) to hoist next: an existing file first, else the shared
+    run saving the most bytes."""
+    best, best_key = None, None
+    stack = [(media, node) for media, node in roots.items()]
+    while stack:
+        media, node = stack.pop()
+        stack.extend((media, child) for child in node.children.values())
+        if not node.blocks:
+            continue
+        pages = len({block.page for block in node.blocks})
+        if node.file is not None:
+            key = (1, node.bytes, node.file)
+        elif pages >= MIN_PAGES and node.bytes >= MIN_BYTES:
+            key = (0, (pages - 1) * node.bytes, node.depth)
+        else:
+            continue
+        if best_key is None or key > best_key:
+            best, best_key = (media, node), key
+    return best
+
+
+class SharedStyles:
+    """The <style> blocks of a site and the runs of rules they share."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.corpus = Corpus(self.root)
+        self.texts = {}
+        self.blocks = []
+        for doc in self.corpus.html():
+            if '<style' not in doc.lower:
+                continue
+            self.texts[doc.rel_path] = doc.text
+            self.blocks.extend(style_blocks(doc.rel_path, doc.text, doc.page))
+        self.files = {}         # path -> content, new files of this run
+        self.existing = {}      # media -> [(normalized rules, path)]
+        self.linked = {}        # path -> (rules, bytes, pages)
+        self._load_existing()
+
+    def _load_existing(self):
+        directory = self.root / BLOCKS_DIR
+        if not directory.is_dir():
+            return
+        for path in sorted(directory.glob('*.css')):
+            text = path.read_text(encoding='utf-8')
+            rules = tuple(normalize(text[s:e]) for s, e in statement_spans(text))
+            rel_path = f"{BLOCKS_DIR}/{path.name}"
+            # the media a file was hoisted under is not recorded: match it for any
+            for media in {block.media for block in self.blocks}:
+                self.existing.setdefault(media, []).append((rules, rel_path))
+
+    def _file_for(self, node):
+        """Path of the shared file for a node's run, written from the first page's copy."""
+        if node.file is not None:
+            return node.file
+        block = min(node.blocks, key=lambda b: (b.page, b.tag_start))
+        text = self.texts[block.page]
+        first = block.rules[block.cursor][0]
+        start = block.rules[block.cursor - 1][1] if block.cursor else block.content_start
+        end = block.rules[block.cursor + node.depth - 1][1]
+        # from the start of the first rule's line, so dedent sees its indent
+        line_start = text.rfind('\n', start, first) + 1 or start
+        css = textwrap.dedent(text[line_start:end]).strip('\n') + '\n'
+        data = css.encode('utf-8')
+        path = f"{BLOCKS_DIR}/{hashlib.sha1(data).hexdigest()[:12]}.css"
+        self.files[path] = data
+        return path
+
+    def cluster(self):
+        """Hoist runs until no block has one left to share."""
+        while True:
+            pending = [block for block in self.blocks if block.cursor < len(block.rules)]
+            picked = _best(_trie(pending, self.existing))
+            if picked is None:
+                break
+            media, node = picked
+            path = self._file_for(node)
+            pages = {block.page for block in node.blocks}
+            rules, size, linked = self.linked.get(path, (node.depth, node.bytes, set()))
+            self.linked[path] = (rules, size, linked | pages)
+            for block in node.blocks:
+                block.hoisted.append(path)
+                block.cursor += node.depth
+            if node.file is None:
+                self.existing.setdefault(media, []).append((self._runs_of(node), path))
+
+    @staticmethod
+    def _runs_of(node):
+        block = node.blocks[0]
+        return tuple(rule for _, _, rule in block.rules[block.cursor - node.depth:block.cursor])
+
+    def page_patches(self, rel_path):
+        text = self.texts[rel_path]
+        page_dir = posixpath.dirname(rel_path.replace(os.sep, '/')) or '.'
+        patches = []
+        for block in self.blocks:
+            if block.page != rel_path or not block.hoisted:
+                continue
+            line_start = text.rfind('\n', 0, block.tag_start) + 1
+            indent = text[line_start:block.tag_start]
+            indent = indent if not indent.strip() else ''
+            media = f' media="{block.media}"' if block.media is not None else ''
+            links = [f'<link rel="stylesheet" href="{posixpath.relpath(path, page_dir)}"{media}>'
+                     for path in block.hoisted]
+            if block.cursor < len(block.rules):
+                # the rest of the block stays inline after the links
+                open_tag = text[block.tag_start:block.content_start]
+                end = block.rules[block.cursor - 1][1]
+                new = f"\n{indent}".join(links + [open_tag])
+            else:
+                end = block.close_end
+                new = f"\n{indent}".join(links)
+            patches.append(Patch(block.tag_start, end, new, TOOL_NAME))
+        return patches
+
+    def rewrites(self):
+        """FileRewrite of every page with hoisted rules."""
+        changes = []
+        for rel_path in sorted({block.page for block in self.blocks if block.hoisted}):
+            path = self.root / rel_path
+            old = path.read_bytes()
+            new = apply_patches(self.texts[rel_path], self.page_patches(rel_path)).encode('utf-8')
+            if new != old:
+                changes.append(FileRewrite(path, old, new, []))
+        return changes
+
+    def unused(self):
+        """Files in css/blocks/ no page links any more."""
+        directory = self.root / BLOCKS_DIR
+        if not directory.is_dir():
+            return []
+        linked = set()
+        for text in (doc.text for doc in self.corpus.html() if BLOCKS_DIR in doc.text):
+            linked.update(re.findall(rf'{BLOCKS_DIR}/([0-9a-f]+\.css)', text))
+        return sorted(f"{BLOCKS_DIR}/{p.name}" for p in directory.glob('*.css')
+                      if p.name not in linked and f"{BLOCKS_DIR}/{p.name}" not in self.files)
+
+    def report(self, changes):
+        files = [{'path': path, 'rules': rules, 'bytes': size, 'pages': sorted(pages),
+                  'saved': (len(pages) - 1) * size}
+                 for path, (rules, size, pages) in self.linked.items()]
+        files.sort(key=lambda item: -item['saved'])
+        return {
+            'summary': {
+                'style_blocks': len(self.blocks),
+                'shared_files': len(files),
+                'new_files': len(self.files),
+                'pages': len(changes),
+                'bytes_removed': sum(len(c.old) - len(c.new) for c in changes),
+                'unused': self.unused(),
+            },
+            'files': files,
+        }
+
+
+def build(root, dry_run=False):
+    """Cluster, write the shared files and rewrite the pages; returns the report."""
+    styles = SharedStyles(root)
+    styles.cluster()
+    changes = styles.rewrites()
+    report = styles.report(changes)
+    report['txid'] = None
+    if dry_run:
+        report['diff'] = ''.join(change.diff(str(change.path.relative_to(styles.root)))
+                                 for change in changes)
+        return report
+    if changes:
+        with Transaction(root, TOOL_NAME) as tx:
+            for path, data in styles.files.items():
+                if not (styles.root / path).exists():
+                    tx.stage(path, None, data)
+            for change in changes:
+                tx.stage(str(change.path.relative_to(styles.root)), change.old, change.new)
+        report['txid'] = tx.txid
+    return report
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Move shared <style> rules into hashed stylesheets')
+    parser.add_argument('project_dir', nargs='?', default='.')
+    parser.add_argument('--dry-run', action='store_true', help='Print the page diff, write nothing')
+    parser.add_argument('--undo', nargs='?', const='latest', metavar='TXID',
+                        help='Undo the latest (or given) run and exit')
+    args = parser.parse_args()
+
+    if args.undo:
+        txid = args.undo
+        if txid == 'latest':
+            runs = [m for m in list_transactions(args.project_dir)
+                    if m['tool'] == TOOL_NAME and m['status'] == 'committed']
+            if not runs:
+                print("Nothing to undo")
+                return 1
+            txid = runs[-1]['txid']
+        restored, skipped = undo(args.project_dir, txid)
+        print(f"Restored {len(restored)} files, skipped {len(skipped)} edited since")
+        return 1 if skipped else 0
+
+    try:
+        report = build(args.project_dir, args.dry_run)
+    except ConflictError as e:
+        print(f"ABORTED, pages unchanged: {e}")
+        return 1
+
+    if args.dry_run:
+        sys.stdout.write(report.pop('diff'))
+    summary = report['summary']
+    print(f"<style> blocks: {summary['style_blocks']}")
+    print(f"Shared stylesheets linked: {summary['shared_files']} ({summary['new_files']} new)")
+    for item in report['files'][:5]:
+        print(f"  {item['path']}: {item['rules']} rules, {item['bytes'] / 1024:.1f} KB "
+              f"on {len(item['pages'])} pages")
+    print(f"Pages {'to rewrite' if args.dry_run else 'rewritten'}: {summary['pages']}, "
+          f"{summary['bytes_removed'] / 1024:.0f} KB of inline CSS moved out")
+    if summary['unused']:
+        print(f"No longer linked: {', '.join(summary['unused'])}")
+    if report['txid']:
+        print(f"Undo: python3 -m hmh_tools.styles --undo {report['txid']}")
+
+    if not args.dry_run:
+        report_name = f"STYLES_REPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(Path(args.project_dir) / report_name, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved: {report_name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
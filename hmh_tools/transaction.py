@@ -0,0 +1,216 @@
+"""
+HMH Tools - Transactional File Batches
+
+Applies new contents to many files of the site as one unit, with an undo
+manifest, so a batch fixer can never leave the tree half-converted.
+
+  stage(rel_path, old, new)   new content written to a temp file next to
+                              the target (same filesystem, fsynced); the
+                              old content copied to the undo store.
+                              old=None creates a file that must not exist
+                              yet; undoing the batch deletes it again
+  commit()                    every target checked against the content
+                              the batch was computed from, the manifest
+                              written, then each temp file renamed over
+                              its target (os.replace is atomic per file).
+                              If anything fails part way, the files
+                              already replaced are restored before the
+                              error propagates.
+  abort()                     temp files removed, nothing touched
+  undo(root, txid)            a committed batch rolled back from its
+                              manifest; files edited since are skipped
+                              unless force=True
+
+Undo data lives in .hmh_cache/undo/<txid>/: manifest.json plus the
+original bytes of every file under files/.
+
+Usage:
+    with Transaction(root, 'omega-fix-3.0') as tx:
+        for rel_path, old, new in changes:
+            tx.stage(rel_path, old, new)
+    print(tx.txid)                      # committed on a clean exit
+    undo(root, tx.txid)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+from .atomic import atomic_write, fsync_dir, temp_file, write_synced
+from .cache import CACHE_DIR
+
+UNDO_DIR = 'undo'
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _file_digest(path):
+    """sha1 of a file's content; None if it does not exist."""
+    try:
+        return _digest(path.read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+class ConflictError(Exception):
+    """A file changed between computing a batch and committing it."""
+
+
+def undo_root(root):
+    return Path(root) / CACHE_DIR / UNDO_DIR
+
+
+class Transaction:
+    """New contents for a set of files, committed all together or not at all."""
+
+    def __init__(self, root, tool):
+        self.root = Path(root)
+        self.tool = tool
+        stamp = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{os.getpid()}"
+        self.txid = stamp
+        n = 1
+        while (undo_root(root) / self.txid).exists():
+            n += 1
+            self.txid = f"{stamp}.{n}"
+        self.dir = undo_root(root) / self.txid
+        self.entries = []       # manifest entries, staging order
+        self._temps = {}        # rel_path -> temp file
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and not self.committed:
+            self.commit()
+        elif not self.committed:
+            self.abort()
+
+    def stage(self, rel_path, old, new):
+        """Queue new bytes for rel_path; old is what they were computed from
+        (None for a new file)."""
+        target = self.root / rel_path
+        if old is None:
+            target.parent.mkdir(parents=True, exist_ok=True)
+        self._temps[rel_path] = temp_file(target, new)
+
+        if old is not None:
+            backup = self.dir / 'files' / rel_path
+            backup.parent.mkdir(parents=True, exist_ok=True)
+            write_synced(backup, old)
+        self.entries.append({'path': rel_path, 'before': None if old is None else _digest(old),
+                             'after': _digest(new)})
+
+    def _write_manifest(self, status):
+        manifest = {
+            'txid': self.txid,
+            'tool': self.tool,
+            'date': datetime.now().isoformat(),
+            'status': status,
+            'files': self.entries,
+        }
+        atomic_write(self.dir / 'manifest.json', json.dumps(manifest, indent=2))
+
+    def commit(self):
+        if not self.entries:
+            self.committed = True
+            return
+        for entry in self.entries:
+            if _file_digest(self.root / entry['path']) != entry['before']:
+                self.abort()
+                raise ConflictError(f"{entry['path']} changed after the batch was computed")
+
+        # Written first: a crash during the renames can still be undone
+        self._write_manifest('committing')
+        replaced = []
+        try:
+            for entry in self.entries:
+                os.replace(self._temps[entry['path']], self.root / entry['path'])
+                replaced.append(entry)
+            for directory in {(self.root / e['path']).parent for e in self.entries}:
+                fsync_dir(directory)
+        except BaseException:
+            for entry in reversed(replaced):
+                _restore(self.root, self.dir, entry)
+            self.abort()
+            self._write_manifest('rolled back')
+            raise
+        self._temps = {}
+        self._write_manifest('committed')
+        self.committed = True
+
+    def abort(self):
+        for temp in self._temps.values():
+            try:
+                os.unlink(temp)
+            except FileNotFoundError:
+                pass
+        self._temps = {}
+        # Nothing was ever replaced: the backups are not needed
+        if not (self.dir / 'manifest.json').exists():
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def _restore(root, tx_dir, entry):
+    """Put a file's original bytes back, atomically; a file the batch
+    created is deleted."""
+    target = Path(root) / entry['path']
+    if entry['before'] is None:
+        target.unlink(missing_ok=True)
+    else:
+        atomic_write(target, (tx_dir / 'files' / entry['path']).read_bytes())
+
+
+def load_manifest(root, txid):
+    with open(undo_root(root) / txid / 'manifest.json') as f:
+        return json.load(f)
+
+
+def list_transactions(root):
+    """Manifests of every recorded batch, oldest first."""
+    base = undo_root(root)
+    if not base.is_dir():
+        return []
+    manifests = []
+    for tx_dir in sorted(base.iterdir()):
+        try:
+            manifests.append(load_manifest(root, tx_dir.name))
+        except (OSError, ValueError):
+            continue
+    return manifests
+
+
+def undo(root, txid=None, force=False):
+    """Roll back one batch (default: the latest committed one).
+
+    Returns (restored, skipped) lists of paths; a file is skipped when its
+    content is neither the batch's result nor the original (edited since),
+    unless force is set.
+    """
+    if txid is None:
+        committed = [m for m in list_transactions(root) if m['status'] in ('committed', 'committing')]
+        if not committed:
+            raise FileNotFoundError('no committed batch to undo')
+        txid = committed[-1]['txid']
+    manifest = load_manifest(root, txid)
+    tx_dir = undo_root(root) / txid
+
+    restored, skipped = [], []
+    for entry in manifest['files']:
+        current = _file_digest(Path(root) / entry['path'])
+        if current == entry['before']:
+            continue    # never replaced (an interrupted commit)
+        if current != entry['after'] and not force:
+            skipped.append(entry['path'])
+            continue
+        _restore(root, tx_dir, entry)
+        restored.append(entry['path'])
+
+    manifest['status'] = 'undone' if not skipped else 'partially undone'
+    atomic_write(tx_dir / 'manifest.json', json.dumps(manifest, indent=2))
+    return restored, skipped
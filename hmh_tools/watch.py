@@ -0,0 +1,211 @@
+"""
+HMH Tools - Filesystem Watch
+
+Reports which files under the site root changed since the last call.
+
+  InotifyWatcher  Linux inotify through ctypes (no extra packages): one
+                  watch per directory, new directories are picked up as
+                  they appear. Exposes fileno() so it can sit in a select
+                  loop and cost nothing while the tree is idle.
+  PollingWatcher  Portable fallback: re-stats the tree every interval and
+                  diffs (mtime, size) stamps.
+
+make_watcher() returns inotify where it works and polling otherwise.
+
+Usage:
+    watcher = make_watcher('.')
+    while True:
+        watcher.wait(timeout=1.0)
+        for rel_path in watcher.changes():
+            print('changed', rel_path)
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+from .corpus import EXCLUDE_DIRS
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0o2000000)
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _walk_files(root, rel_dir, exclude_dirs):
+    """Relative paths of every file at or below rel_dir."""
+    for dirpath, dirnames, filenames in os.walk(os.path.join(root, rel_dir)):
+        dirnames[:] = [d for d in dirnames if d not in exclude_dirs]
+        rel = os.path.relpath(dirpath, root)
+        for name in filenames:
+            yield name if rel == '.' else os.path.join(rel, name)
+
+
+class PollingWatcher:
+    """Finds changes by comparing (mtime, size) of every file."""
+
+    kind = 'polling'
+
+    def __init__(self, root, exclude_dirs=EXCLUDE_DIRS, interval=1.0):
+        self.root = str(root)
+        self.exclude_dirs = set(exclude_dirs)
+        self.interval = interval
+        self.stamps = self._snapshot()
+
+    def _snapshot(self):
+        stamps = {}
+        for rel_path in _walk_files(self.root, '.', self.exclude_dirs):
+            try:
+                st = os.stat(os.path.join(self.root, rel_path))
+            except OSError:
+                continue
+            stamps[rel_path] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def fileno(self):
+        return None
+
+    def wait(self, timeout=None):
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+
+    def changes(self):
+        current = self._snapshot()
+        previous, self.stamps = self.stamps, current
+        changed = {p for p, stamp in current.items() if previous.get(p) != stamp}
+        return changed | (previous.keys() - current.keys())
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify on every directory of the tree, via ctypes."""
+
+    kind = 'inotify'
+
+    def __init__(self, root, exclude_dirs=EXCLUDE_DIRS):
+        self.root = str(root)
+        self.exclude_dirs = set(exclude_dirs)
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError('libc not found')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}
+        self.pending = set()
+        try:
+            self._watch_tree('.')
+        except OSError:
+            self.close()
+            raise
+
+    def _watch(self, rel_dir):
+        path = os.path.join(self.root, rel_dir).encode()
+        wd = self.libc.inotify_add_watch(self.fd, path, WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return
+            # ENOSPC: fs.inotify.max_user_watches is too low for this tree
+            raise OSError(err, f"inotify_add_watch failed for {rel_dir}")
+        self.dirs[wd] = rel_dir
+
+    def _watch_tree(self, rel_dir):
+        for dirpath, dirnames, _ in os.walk(os.path.join(self.root, rel_dir)):
+            dirnames[:] = [d for d in dirnames if d not in self.exclude_dirs]
+            self._watch(os.path.normpath(os.path.relpath(dirpath, self.root)))
+
+    def _unwatch_tree(self, rel_dir):
+        """Drop watches below a directory that moved away (their names are stale)."""
+        prefix = rel_dir + os.sep
+        for wd, watched in list(self.dirs.items()):
+            if watched == rel_dir or watched.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def fileno(self):
+        return self.fd
+
+    def wait(self, timeout=None):
+        select.select([self.fd], [], [], timeout)
+
+    def _read_events(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset += length
+            self._handle(wd, mask, name)
+        return True
+
+    def _handle(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost: report every file
+            self.pending.update(_walk_files(self.root, '.', self.exclude_dirs))
+            return
+        rel_dir = self.dirs.get(wd)
+        if rel_dir is None:
+            return
+        if mask & IN_IGNORED:
+            del self.dirs[wd]
+            return
+        if not name:
+            return
+        rel_path = name if rel_dir == '.' else os.path.join(rel_dir, name)
+
+        if mask & IN_ISDIR:
+            if name in self.exclude_dirs:
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Files may already exist before the new watch is in place
+                self._watch_tree(rel_path)
+                self.pending.update(_walk_files(self.root, rel_path, self.exclude_dirs))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._unwatch_tree(rel_path)
+                self.pending.add(rel_path + os.sep)
+            return
+        self.pending.add(rel_path)
+
+    def changes(self):
+        """Paths touched since the last call; a removed directory is 'dir/'."""
+        while self._read_events():
+            pass
+        changed, self.pending = self.pending, set()
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def make_watcher(root, exclude_dirs=EXCLUDE_DIRS, poll_interval=1.0):
+    """inotify where available, polling otherwise."""
+    try:
+        return InotifyWatcher(root, exclude_dirs)
+    except (OSError, AttributeError):
+        return PollingWatcher(root, exclude_dirs, poll_interval)
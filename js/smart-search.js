@@ -5,6 +5,7 @@
  * - Fuzzy matching (handles hyphens, spaces, variations)
  * - Synonyms for common Epoch terms
  * - Relevance scoring
+ * - Site-wide search over the sharded index in /search-index/ (searchSite)
  * [1 = -1]
  */
 
@@ -138,11 +139,176 @@ const SmartSearch = {
         };
     },
 
-    // Initialize search on a library page
+    // Site-wide index built by `python3 -m hmh_tools.search`: meta.json
+    // lists the pages and shards, each shard is fetched only when a query
+    // needs one of its terms
+    indexBase: '/search-index/',
+    _meta: null,
+    _shards: {},
+    _siteQuery: 0,
+
+    fetchJSON: function(path) {
+        return fetch(this.indexBase + path).then(r => {
+            if (!r.ok) throw new Error('SmartSearch: ' + path + ' answered ' + r.status);
+            return r.json();
+        });
+    },
+
+    // A failed load is not cached: the next query tries again
+    loadMeta: function() {
+        if (!this._meta) {
+            this._meta = this.fetchJSON('meta.json').catch(err => {
+                this._meta = null;
+                throw err;
+            });
+        }
+        return this._meta;
+    },
+
+    loadShard: function(file) {
+        if (!this._shards[file]) {
+            this._shards[file] = this.fetchJSON('shards/' + file).catch(err => {
+                // A missing shard means the index was rebuilt: reload meta.json too
+                delete this._shards[file];
+                this._meta = null;
+                throw err;
+            });
+        }
+        return this._shards[file];
+    },
+
+    // Shard holding a term: the last one whose first term sorts before it
+    shardFor: function(meta, term) {
+        let lo = 0, hi = meta.shards.length - 1, found = 0;
+        while (lo <= hi) {
+            const mid = (lo + hi) >> 1;
+            if (meta.shards[mid][0] <= term) {
+                found = mid;
+                lo = mid + 1;
+            } else {
+                hi = mid - 1;
+            }
+        }
+        return meta.shards[found][1];
+    },
+
+    // [page delta, n, position, position deltas...]* -> {pageId: [positions]}
+    decodePostings: function(flat) {
+        const pages = {};
+        let page = 0;
+        for (let i = 0; i < flat.length; i += 2 + flat[i + 1]) {
+            page += flat[i];
+            const positions = [];
+            let position = 0;
+            for (let j = 0; j < flat[i + 1]; j++) {
+                position += flat[i + 2 + j];
+                positions.push(position);
+            }
+            pages[page] = positions;
+        }
+        return pages;
+    },
+
+    // Search every page of the site; resolves to [{url, title, score}]
+    searchSite: async function(query, limit = 20) {
+        const meta = await this.loadMeta();
+        const stopwords = new Set(meta.stopwords);
+        const keep = w => w.length > 1 && !stopwords.has(w);
+        const words = this.normalize(query).split(' ').filter(keep);
+        if (words.length === 0) return [];
+
+        const terms = new Set(words);
+        this.expandTerms(query).forEach(t => this.normalize(t).split(' ').filter(keep).forEach(w => terms.add(w)));
+
+        const files = [...new Set([...terms].map(t => this.shardFor(meta, t)))];
+        const shards = {};
+        await Promise.all(files.map(f => this.loadShard(f).then(s => { shards[f] = s; })));
+
+        // The last word may still be being typed: match it as a prefix too
+        const prefix = words[words.length - 1];
+        const prefixShard = shards[this.shardFor(meta, prefix)];
+        const completions = Object.keys(prefixShard).filter(t => t !== prefix && t.startsWith(prefix)).slice(0, 20);
+
+        const postings = {};
+        [...terms, ...completions].forEach(t => {
+            const shard = shards[this.shardFor(meta, t)];
+            if (shard && shard[t]) postings[t] = this.decodePostings(shard[t]);
+        });
+
+        const scores = {};
+        Object.entries(postings).forEach(([term, pages]) => {
+            const weight = words.includes(term) ? 10 : completions.includes(term) ? 6 : 3;
+            Object.entries(pages).forEach(([page, positions]) => {
+                scores[page] = (scores[page] || 0) + weight * (1 + Math.log(positions.length));
+            });
+        });
+
+        // Query words next to each other on the page
+        for (let k = 1; k < words.length; k++) {
+            const before = postings[words[k - 1]] || {};
+            const after = postings[words[k]] || {};
+            Object.keys(after).forEach(page => {
+                if (!before[page]) return;
+                const starts = new Set(before[page]);
+                if (after[page].some(p => starts.has(p - 1))) scores[page] += 15;
+            });
+        }
+
+        return Object.entries(scores)
+            .map(([page, score]) => {
+                const [url, title] = meta.pages[page];
+                const titleWords = this.normalize(title).split(' ');
+                const bonus = words.filter(w => titleWords.includes(w)).length * 5;
+                return { url: url, title: title, score: score + bonus };
+            })
+            .sort((a, b) => b.score - a.score)
+            .slice(0, limit);
+    },
+
+    // Show searchSite() results for a query in a results box: one .item
+    // link per page, in its .site-results-list (or the box itself).
+    // Only the answer to the latest query is shown
+    showSiteResults: function(query, box, limit) {
+        const ticket = ++this._siteQuery;
+        if (query.length < 2) {
+            box.classList.add('hidden');
+            return;
+        }
+        this.searchSite(query, limit).then(results => {
+            if (ticket !== this._siteQuery) return;
+            const list = box.querySelector('.site-results-list') || box;
+            list.innerHTML = '';
+            results.forEach(result => {
+                const item = document.createElement('div');
+                item.className = 'item';
+                const link = document.createElement('a');
+                link.href = result.url;
+                const title = document.createElement('div');
+                title.className = 'title';
+                title.textContent = result.title || result.url;
+                const path = document.createElement('div');
+                path.className = 'path';
+                path.textContent = result.url;
+                link.append(title, path);
+                item.append(link);
+                list.append(item);
+            });
+            box.classList.toggle('hidden', results.length === 0);
+        }).catch(err => {
+            if (ticket !== this._siteQuery) return;
+            box.classList.add('hidden');
+            console.warn(err.message);
+        });
+    },
+
+    // Initialize search on a library page. With options.siteResultsSelector,
+    // every query also searches the whole site (searchSite) into that box
     init: function(inputSelector, containerSelector, itemSelector, options = {}) {
         const input = document.querySelector(inputSelector);
         const container = document.querySelector(containerSelector);
         const noResults = document.querySelector(options.noResultsSelector || '#noResults');
+        const siteResults = options.siteResultsSelector ? document.querySelector(options.siteResultsSelector) : null;
+        let siteTimer = null;
 
         if (!input || !container) {
             console.warn('SmartSearch: Could not find input or container');
@@ -157,6 +323,12 @@ const SmartSearch = {
             const categories = container.querySelectorAll('.category');
             const nestedGroups = container.querySelectorAll('.nested-group');
 
+            // Site-wide results once typing pauses
+            if (siteResults) {
+                clearTimeout(siteTimer);
+                siteTimer = setTimeout(() => self.showSiteResults(query, siteResults, options.siteLimit || 10), 150);
+            }
+
             // Reset if empty
             if (query.length < 2) {
                 items.forEach(item => item.classList.remove('hidden', 'search-highlight'));
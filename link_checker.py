@@ -2,70 +2,161 @@
 """
 Comprehensive broken link checker for HaveMind Media website
 Checks all href and src attributes in HTML files
+
+Fragments (#section, page.html#section) are checked against the id /
+<a name> targets of the page they point at.
+
+With --external, outbound http/https links are verified too (concurrent
+HEAD/GET checks, results cached in .hmh_cache/ for --external-ttl hours).
 """
 
 import os
-import re
 from pathlib import Path
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse, urljoin, unquote
 from collections import defaultdict
 
+from hmh_tools import Corpus
+from hmh_tools.cache import CACHE_DIR, AuditCache
+from hmh_tools.external import ExternalLinkChecker, is_checkable, normalize_url
+
 def is_external_url(url):
     """Check if URL is external (http/https)"""
-    return url.startswith(('http://', 'https://', '//', 'mailto:', 'tel:', 'javascript:'))
+    return url.startswith(('http://', 'https://', '//', 'mailto:', 'tel:', 'javascript:', 'data:'))
 
 def is_anchor_only(url):
     """Check if URL is just an anchor (#something)"""
     return url.startswith('#') or url == ''
 
-def extract_links(html_content, file_path):
-    """Extract all href and src attributes from HTML"""
-    links = []
-
-    # Find all href attributes
-    href_pattern = r'href\s*=\s*["\']([^"\']+)["\']'
-    hrefs = re.findall(href_pattern, html_content, re.IGNORECASE)
-    links.extend([('href', href) for href in hrefs])
-
-    # Find all src attributes
-    src_pattern = r'src\s*=\s*["\']([^"\']+)["\']'
-    srcs = re.findall(src_pattern, html_content, re.IGNORECASE)
-    links.extend([('src', src) for src in srcs])
+def link_fragment(url):
+    """The element id a link's fragment targets, or None if nothing to check
 
-    # Find CSS link tags
-    css_pattern = r'<link[^>]+href\s*=\s*["\']([^"\']+\.css[^"\']*)["\']'
-    css_links = re.findall(css_pattern, html_content, re.IGNORECASE)
-    links.extend([('css', css) for css in css_links])
+    '#', '#top', client-side routes ('#/path', '#!path') and text
+    fragments ('#:~:text=') don't name an element.
+    """
+    fragment = unquote(url.partition('#')[2])
+    if not fragment or fragment == 'top' or fragment.startswith(('/', '!', ':~:')):
+        return None
+    return fragment
 
-    return links
+def extract_links(page):
+    """Extract all href, src and stylesheet references from a parsed page"""
+    return [(link.kind, link.url) for link in page.links if link.url]
 
-def resolve_path(source_file, relative_path):
-    """Resolve a relative path from the source file's directory"""
-    source_dir = os.path.dirname(source_file)
+def resolve_path(source_dir, relative_path, resolver):
+    """Resolve a link from the source file's directory to a site-relative path
 
+    Root-absolute links resolve against the scanned root. Resolution is
+    memoized per (source_dir, link) by the resolver.
+    """
     # Remove query strings and fragments
     clean_path = relative_path.split('?')[0].split('#')[0]
-
-    # Resolve the path
-    if clean_path.startswith('/'):
-        # Absolute path from root
-        base_dir = Path(source_file).parts[0]
-        for i, part in enumerate(Path(source_file).parts):
-            if 'havemindmedia-website_v1.0_01-04-2026' in part:
-                base_dir = os.path.join('/', *Path(source_file).parts[:i+1])
-                break
-        resolved = os.path.normpath(os.path.join(base_dir, clean_path.lstrip('/')))
-    else:
-        # Relative path from current file's directory
-        resolved = os.path.normpath(os.path.join(source_dir, clean_path))
-
-    return resolved
-
-def check_file_exists(file_path):
-    """Check if a file exists on disk"""
-    return os.path.exists(file_path)
-
-def scan_website(root_dir):
+    return resolver.resolve(source_dir, clean_path)
+
+def check_file_exists(rel_path, resolver):
+    """Check if a file exists, against the set of files from the site walk"""
+    return resolver.exists(rel_path)
+
+def check_page(doc, resolver):
+    """Check every link of one parsed page.
+
+    Returns per-page counts, the broken links, the outbound http(s) links,
+    the (type, link, target, fragment) of every link with a fragment and
+    every resolved path the result depends on (used by the incremental
+    cache). Fragments are checked later, against the target's current
+    anchors, so they stay valid when only the target page changes.
+    """
+    counts = {'total_links': 0, 'broken_links': 0, 'external_links': 0, 'anchor_only': 0}
+    source_dir = os.path.dirname(doc.rel_path)
+    broken = []
+    external = []
+    fragments = []
+    deps = []
+
+    for link_type, link_url in extract_links(doc.page):
+        counts['total_links'] += 1
+
+        # Skip external URLs
+        if is_external_url(link_url):
+            counts['external_links'] += 1
+            if is_checkable(link_url):
+                external.append((link_type, link_url))
+            continue
+
+        # Skip anchor-only links
+        if is_anchor_only(link_url):
+            counts['anchor_only'] += 1
+            fragment = link_fragment(link_url)
+            if fragment:
+                fragments.append((link_type, link_url, doc.rel_path, fragment))
+            continue
+
+        # Resolve and check if file exists
+        try:
+            resolved_path = resolve_path(source_dir, link_url, resolver)
+            deps.append(resolved_path)
+
+            if not check_file_exists(resolved_path, resolver):
+                counts['broken_links'] += 1
+                broken.append({
+                    'type': link_type,
+                    'link': link_url,
+                    'resolved': resolver.absolute(resolved_path)
+                })
+            elif '#' in link_url:
+                fragment = link_fragment(link_url)
+                if fragment:
+                    fragments.append((link_type, link_url, resolved_path, fragment))
+        except Exception as e:
+            counts['broken_links'] += 1
+            broken.append({
+                'type': link_type,
+                'link': link_url,
+                'resolved': f'ERROR: {str(e)}'
+            })
+
+    return counts, broken, external, fragments, deps
+
+def check_fragments(fragments, corpus, broken_links, stats):
+    """Check every #fragment against the anchor set of its target page"""
+    for source, links in fragments.items():
+        for link_type, link_url, target, fragment in links:
+            anchors = corpus.anchors(target)
+            if anchors is None or fragment in anchors:
+                continue
+            stats['broken_anchors'] += 1
+            broken_links[source].append({
+                'type': link_type,
+                'link': link_url,
+                'resolved': f"{target}#{fragment}",
+                'status': 'ANCHOR NOT FOUND',
+            })
+
+def check_external(external_links, root_dir, ttl_hours, broken_links, stats):
+    """Verify every outbound link once, however many pages use it"""
+    checker = ExternalLinkChecker(
+        cache_path=os.path.join(root_dir, CACHE_DIR, 'external-links.pickle'),
+        ttl=ttl_hours * 3600,
+    )
+    urls = {url for links in external_links.values() for _, url in links}
+    print(f"Checking {len(urls)} external URLs...")
+    results = checker.check(urls)
+    checker.save()
+    print(f"External links: {checker.summary()}\n")
+
+    for source, links in external_links.items():
+        for link_type, link_url in links:
+            result = results[normalize_url(link_url)]
+            if result.ok:
+                continue
+            stats['external_broken'] += 1
+            broken_links[source].append({
+                'type': link_type,
+                'link': link_url,
+                'resolved': result.url,
+                'status': f"HTTP {result.status}" if result.status else result.error,
+            })
+
+def scan_website(root_dir, incremental=False, external=False, external_ttl=168):
     """Scan entire website for broken links"""
     broken_links = defaultdict(list)
     stats = {
@@ -73,65 +164,57 @@ def scan_website(root_dir):
         'total_links': 0,
         'broken_links': 0,
         'external_links': 0,
-        'anchor_only': 0
+        'anchor_only': 0,
+        'external_broken': 0,
+        'broken_anchors': 0
     }
-
-    # Find all HTML files
-    html_files = []
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith('.html'):
-                html_files.append(os.path.join(root, file))
-
-    html_files.sort()
-    stats['total_files'] = len(html_files)
-
-    print(f"Found {len(html_files)} HTML files to check\n")
+    external_links = {}
+    fragment_links = {}
+
+    # Find all HTML files (one walk, each page read and parsed once)
+    cache = None
+    if incremental:
+        cache = AuditCache(root_dir, 'link-checker', salt=Path(__file__).read_bytes())
+    corpus = Corpus(root_dir, cache=cache)
+    documents = corpus.html()
+    resolver = corpus.resolver()
+    stats['total_files'] = len(documents)
+
+    print(f"Found {len(documents)} HTML files to check\n")
+    if cache is not None:
+        print(f"Incremental cache: {cache.summary()}\n")
 
     # Check each HTML file
-    for html_file in html_files:
-        try:
-            with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-
-            links = extract_links(content, html_file)
-
-            for link_type, link_url in links:
-                stats['total_links'] += 1
-
-                # Skip external URLs
-                if is_external_url(link_url):
-                    stats['external_links'] += 1
-                    continue
-
-                # Skip anchor-only links
-                if is_anchor_only(link_url):
-                    stats['anchor_only'] += 1
-                    continue
-
-                # Resolve and check if file exists
-                try:
-                    resolved_path = resolve_path(html_file, link_url)
-
-                    if not check_file_exists(resolved_path):
-                        stats['broken_links'] += 1
-                        rel_source = html_file.replace(root_dir, '').lstrip('/')
-                        broken_links[rel_source].append({
-                            'type': link_type,
-                            'link': link_url,
-                            'resolved': resolved_path
-                        })
-                except Exception as e:
-                    stats['broken_links'] += 1
-                    rel_source = html_file.replace(root_dir, '').lstrip('/')
-                    broken_links[rel_source].append({
-                        'type': link_type,
-                        'link': link_url,
-                        'resolved': f'ERROR: {str(e)}'
-                    })
-
-        except Exception as e:
-            print(f"Error reading {html_file}: {str(e)}")
+    for doc in documents:
+        html_file = os.path.join(root_dir, doc.rel_path)
+        result = cache.get(doc, 'links') if cache is not None else None
+        if result is None:
+            try:
+                counts, broken, outbound, fragments, deps = check_page(doc, resolver)
+            except Exception as e:
+                print(f"Error reading {html_file}: {str(e)}")
+                continue
+            result = (counts, broken, outbound, fragments)
+            if cache is not None:
+                cache.put(doc, 'links', result, deps)
+
+        counts, broken, outbound, fragments = result
+        for key, value in counts.items():
+            stats[key] += value
+        if broken:
+            broken_links[doc.rel_path].extend(broken)
+        if outbound:
+            external_links[doc.rel_path] = outbound
+        if fragments:
+            fragment_links[doc.rel_path] = fragments
+
+    check_fragments(fragment_links, corpus, broken_links, stats)
+
+    if cache is not None:
+        cache.save()
+
+    if external and external_links:
+        check_external(external_links, root_dir, external_ttl, broken_links, stats)
 
     return broken_links, stats
 
@@ -144,13 +227,17 @@ def print_report(broken_links, stats, root_dir):
     print(f"\nStatistics:")
     print(f"  Total HTML files scanned: {stats['total_files']}")
     print(f"  Total links found: {stats['total_links']}")
-    print(f"  External links (skipped): {stats['external_links']}")
-    print(f"  Anchor-only links (skipped): {stats['anchor_only']}")
-    print(f"  BROKEN LINKS FOUND: {stats['broken_links']}")
+    if stats['external_broken']:
+        print(f"  External links: {stats['external_links']} ({stats['external_broken']} broken)")
+    else:
+        print(f"  External links (skipped): {stats['external_links']}")
+    print(f"  Anchor-only links: {stats['anchor_only']}")
+    print(f"  Missing anchor targets: {stats['broken_anchors']}")
+    print(f"  BROKEN LINKS FOUND: {stats['broken_links'] + stats['external_broken'] + stats['broken_anchors']}")
     print("\n" + "=" * 80)
 
     if not broken_links:
-        print("\nNo broken links found! All internal links are valid.")
+        print("\nNo broken links found! All links are valid.")
         return
 
     print(f"\nBROKEN LINKS BY SOURCE FILE ({len(broken_links)} files with issues):")
@@ -175,7 +262,7 @@ def print_report(broken_links, stats, root_dir):
                 link_type = link_info['type'].upper()
                 print(f"    [{link_type}] {link_info['link']}")
                 print(f"         → Resolved to: {link_info['resolved']}")
-                print(f"         → Status: FILE NOT FOUND")
+                print(f"         → Status: {link_info.get('status', 'FILE NOT FOUND')}")
 
     print("\n" + "=" * 80)
     print("\nSUMMARY BY LINK TYPE:")
@@ -192,8 +279,20 @@ def print_report(broken_links, stats, root_dir):
     print("\n" + "=" * 80)
 
 if __name__ == "__main__":
-    root_directory = "/Users/paymore/Downloads/HaveMindHive/havemindmedia-website_v1.0_01-04-2026"
+    import argparse
+    parser = argparse.ArgumentParser(description="Comprehensive broken link checker")
+    parser.add_argument("root_dir", nargs="?",
+                        default="/Users/paymore/Downloads/HaveMindHive/havemindmedia-website_v1.0_01-04-2026")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse results for unchanged pages from .hmh_cache/")
+    parser.add_argument("--external", action="store_true",
+                        help="Also verify outbound http/https links")
+    parser.add_argument("--external-ttl", type=float, default=168, metavar="HOURS",
+                        help="Re-check cached external results older than this (default: 168)")
+    args = parser.parse_args()
+    root_directory = args.root_dir
 
     print("Starting comprehensive link scan...\n")
-    broken_links, stats = scan_website(root_directory)
+    broken_links, stats = scan_website(root_directory, incremental=args.incremental,
+                                       external=args.external, external_ttl=args.external_ttl)
     print_report(broken_links, stats, root_directory)
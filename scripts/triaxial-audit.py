@@ -11,6 +11,15 @@ Run individual audits:
   python3 scripts/triaxial-audit.py --shiva   # Structure verification
   python3 scripts/triaxial-audit.py --omega   # Content verification
   python3 scripts/triaxial-audit.py --alpha   # Link & navigation verification
+
+Re-check only pages changed since the last run (and pages linking to them):
+  python3 scripts/triaxial-audit.py --incremental
+
+Stream findings as NDJSON while the audit runs (CI can tail it):
+  python3 scripts/triaxial-audit.py --stream
+
+Audit another tree (a staging copy, a synthetic benchmark site):
+  python3 scripts/triaxial-audit.py --root /path/to/site
 """
 
 import os
@@ -19,12 +28,50 @@ import sys
 import json
 import argparse
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 # Configuration
 SITE_ROOT = Path(__file__).parent.parent
 SITE_URL = "https://www.havemindmedia.com"
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from hmh_tools import Corpus
+from hmh_tools.cache import AuditCache
+from hmh_tools.report import ReportStream, write_compact_json
+from hmh_tools.sitemap import parse_sitemap, path_for
+
+# Set by --incremental: per-file ALPHA results are reused from .hmh_cache/
+AUDIT_CACHE = None
+
+# Set by --stream: findings are written as NDJSON as they are found
+REPORT_STREAM = None
+
+
+@lru_cache(maxsize=None)
+def site_corpus():
+    """One walk of SITE_ROOT shared by SHIVA, OMEGA and ALPHA"""
+    return Corpus(SITE_ROOT, cache=AUDIT_CACHE)
+
+def emit(record_type, **fields):
+    if REPORT_STREAM is not None:
+        REPORT_STREAM.emit(record_type, **fields)
+
+def emit_audit(audit, results):
+    """One record per finished audit: flags as-is, lists reduced to counts"""
+    emit("audit", audit=audit, **{k: len(v) if isinstance(v, (list, dict)) else v
+                                  for k, v in results.items()})
+
+def cached(doc, key, scan):
+    """Per-file result of scan(doc), reused from AUDIT_CACHE if the file is unchanged"""
+    if AUDIT_CACHE is not None and AUDIT_CACHE.has(doc, key):
+        return AUDIT_CACHE.get(doc, key)
+    result, deps = scan(doc)
+    if AUDIT_CACHE is not None:
+        AUDIT_CACHE.put(doc, key, result, deps)
+    return result
+
+
 class Colors:
     GREEN = '\033[92m'
     RED = '\033[91m'
@@ -69,13 +116,13 @@ def run_shiva():
         "html_files": [],
         "missing_dirs": [],
         "missing_assets": [],
+        "orphaned_pages": [],
         "passed": True
     }
 
     # Count HTML files
-    html_files = list(SITE_ROOT.glob("**/*.html"))
-    html_files = [f for f in html_files if "node_modules" not in str(f)]
-    results["html_files"] = [str(f.relative_to(SITE_ROOT)) for f in html_files]
+    html_files = site_corpus().html()
+    results["html_files"] = [doc.rel_path for doc in html_files]
 
     print(f"  Found {Colors.BOLD}{len(html_files)}{Colors.END} HTML files")
 
@@ -122,16 +169,34 @@ def run_shiva():
             results["missing_assets"].append(asset)
             results["passed"] = False
 
+    # Check for orphaned pages (nothing links to them)
+    orphans = site_corpus().link_graph().orphans()
+    results["orphaned_pages"] = orphans
+    for p in orphans:
+        emit("finding", audit="shiva", kind="orphaned_page", path=p)
+
+    print(f"\n  Checking for orphaned pages:")
+    if orphans:
+        print_warn(f"{len(orphans)} pages have no inbound links")
+        for p in orphans[:5]:
+            print(f"      - {p}")
+        if len(orphans) > 5:
+            print(f"      ... and {len(orphans) - 5} more")
+    else:
+        print_pass("Every page is linked from somewhere")
+
     # Summary
     print(f"\n  {Colors.BOLD}SHIVA Summary:{Colors.END}")
     print(f"    HTML Files: {len(html_files)}")
     print(f"    Missing Dirs: {len(results['missing_dirs'])}")
     print(f"    Missing Assets: {len(results['missing_assets'])}")
+    print(f"    Orphaned Pages: {len(orphans)}")
 
     if results["passed"]:
         print(f"\n  {Colors.GREEN}{Colors.BOLD}SHIVA: PASSED{Colors.END}")
     else:
         print(f"\n  {Colors.RED}{Colors.BOLD}SHIVA: FAILED{Colors.END}")
+    emit_audit("shiva", results)
 
     return results
 
@@ -157,32 +222,25 @@ def run_omega():
     }
 
     # Count actual pages
-    html_files = list(SITE_ROOT.glob("**/*.html"))
-    html_files = [f for f in html_files if "node_modules" not in str(f)]
+    corpus = site_corpus()
+    html_files = corpus.html()
     results["actual_pages"] = len(html_files)
 
     # Parse sitemap
     sitemap_path = SITE_ROOT / "sitemap.xml"
     if sitemap_path.exists():
-        with open(sitemap_path, 'r') as f:
-            content = f.read()
-        sitemap_urls = re.findall(r'<loc>([^<]+)</loc>', content)
+        sitemap_urls = [loc for loc, *_ in parse_sitemap(sitemap_path)]
         results["sitemap_urls"] = len(sitemap_urls)
 
         print(f"  Sitemap URLs: {Colors.BOLD}{len(sitemap_urls)}{Colors.END}")
         print(f"  Actual HTML files: {Colors.BOLD}{len(html_files)}{Colors.END}")
 
         # Check for pages not in sitemap
-        sitemap_paths = set()
-        for url in sitemap_urls:
-            path = url.replace(SITE_URL, "").lstrip("/")
-            if not path:
-                path = "index.html"
-            sitemap_paths.add(path)
+        sitemap_paths = {path_for(url, SITE_URL) for url in sitemap_urls}
 
         missing_from_sitemap = []
-        for f in html_files:
-            rel_path = str(f.relative_to(SITE_ROOT))
+        for doc in html_files:
+            rel_path = doc.rel_path
             if rel_path not in sitemap_paths and rel_path != "404.html":
                 missing_from_sitemap.append(rel_path)
 
@@ -193,16 +251,16 @@ def run_omega():
             if len(missing_from_sitemap) > 5:
                 print(f"      ... and {len(missing_from_sitemap) - 5} more")
             results["sitemap_missing"] = missing_from_sitemap
+            for p in missing_from_sitemap:
+                emit("finding", audit="omega", kind="not_in_sitemap", path=p)
     else:
         print_fail("sitemap.xml not found")
         results["passed"] = False
 
     # Check site-directory coverage
-    site_dir_path = SITE_ROOT / "site-directory.html"
-    if site_dir_path.exists():
-        with open(site_dir_path, 'r') as f:
-            content = f.read()
-        dir_links = re.findall(r'href="([^"]+\.html)"', content)
+    site_dir_doc = corpus.get("site-directory.html")
+    if site_dir_doc is not None:
+        dir_links = [l.url for l in site_dir_doc.page.links if l.kind == 'href' and l.url.endswith('.html')]
         dir_links = [l for l in dir_links if not l.startswith('http')]
         results["nav_coverage"] = len(set(dir_links))
         print(f"\n  Site Directory links: {Colors.BOLD}{len(set(dir_links))}{Colors.END}")
@@ -216,6 +274,7 @@ def run_omega():
         print(f"\n  {Colors.GREEN}{Colors.BOLD}OMEGA: PASSED{Colors.END}")
     else:
         print(f"\n  {Colors.RED}{Colors.BOLD}OMEGA: FAILED{Colors.END}")
+    emit_audit("omega", results)
 
     return results
 
@@ -223,6 +282,56 @@ def run_omega():
 # ALPHA - Link & Navigation Verification (THE KEY ONE I MISSED)
 # =============================================================================
 
+SUSPICIOUS_PATTERNS = [
+    (r'href="[^"]*\.\./[^"]*\.\./[^"]*\.\./[^"]*\.\./[^"]*"', "4+ level relative paths"),
+    (r'href="[^"]*(?<!/)index\.html"', "index.html without trailing context"),
+    (r'href="tools/[^"]*"', "tools/ without leading ../"),
+    (r'href="ancient-teachings/', "deprecated ancient-teachings path"),
+]
+
+def alpha_scan_links(doc):
+    """Internal .html links of one page: (checked, broken), plus the paths consulted"""
+    rel_file = doc.rel_path
+    source_dir = os.path.dirname(rel_file)
+    resolver = site_corpus().resolver()
+    broken_links = []
+    deps = []
+    total_links = 0
+
+    # Find all href links to .html files
+    links = [l.url for l in doc.page.links if l.kind == 'href' and l.url.endswith('.html')]
+
+    for link in links:
+        # Skip external links
+        if link.startswith('http') or link.startswith('//') or link.startswith('#'):
+            continue
+
+        total_links += 1
+
+        # Resolve relative path (memoized, checked against the site walk)
+        target = resolver.resolve(source_dir, link)
+        deps.append(target)
+
+        if not resolver.exists(target):
+            broken_links.append({
+                "source": rel_file,
+                "link": link,
+                "expected": target if not target.startswith('..') else resolver.absolute(target)
+            })
+
+    return (total_links, broken_links), deps
+
+def alpha_scan_suspicious(doc):
+    """Link patterns in one page that often cause 404s"""
+    content = doc.text
+    found = []
+    for pattern, desc in SUSPICIOUS_PATTERNS:
+        matches = re.findall(pattern, content)
+        if matches:
+            for m in matches[:2]:
+                found.append({"file": doc.rel_path, "pattern": desc, "match": m})
+    return found, ()
+
 def run_alpha():
     """
     ALPHA: Link and navigation verification
@@ -243,43 +352,19 @@ def run_alpha():
         "passed": True
     }
 
-    html_files = list(SITE_ROOT.glob("**/*.html"))
-    html_files = [f for f in html_files if "node_modules" not in str(f)]
+    html_files = site_corpus().html()
 
     print(f"  Scanning {len(html_files)} HTML files for broken links...\n")
 
     broken_links = []
     total_links = 0
 
-    for html_file in html_files:
-        rel_file = str(html_file.relative_to(SITE_ROOT))
-        file_dir = html_file.parent
-
-        with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-
-        # Find all href links to .html files
-        links = re.findall(r'href=["\']([^"\']+\.html)["\']', content)
-
-        for link in links:
-            # Skip external links
-            if link.startswith('http') or link.startswith('//') or link.startswith('#'):
-                continue
-
-            total_links += 1
-
-            # Resolve relative path
-            if link.startswith('/'):
-                target = SITE_ROOT / link.lstrip('/')
-            else:
-                target = (file_dir / link).resolve()
-
-            if not target.exists():
-                broken_links.append({
-                    "source": rel_file,
-                    "link": link,
-                    "expected": str(target.relative_to(SITE_ROOT) if target.is_relative_to(SITE_ROOT) else target)
-                })
+    for doc in html_files:
+        checked, broken = cached(doc, "alpha_links", alpha_scan_links)
+        total_links += checked
+        broken_links.extend(broken)
+        for bl in broken:
+            emit("finding", audit="alpha", kind="broken_link", **bl)
 
     results["total_links_checked"] = total_links
     results["broken_links"] = broken_links
@@ -334,24 +419,12 @@ def run_alpha():
     # Check for suspicious patterns that often cause 404s
     print(f"\n  Checking for suspicious link patterns:")
 
-    suspicious_patterns = [
-        (r'href="[^"]*\.\./[^"]*\.\./[^"]*\.\./[^"]*\.\./[^"]*"', "4+ level relative paths"),
-        (r'href="[^"]*(?<!/)index\.html"', "index.html without trailing context"),
-        (r'href="tools/[^"]*"', "tools/ without leading ../"),
-        (r'href="ancient-teachings/', "deprecated ancient-teachings path"),
-    ]
-
     suspicious_found = []
-    for html_file in html_files:
-        with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-
-        rel_file = str(html_file.relative_to(SITE_ROOT))
-        for pattern, desc in suspicious_patterns:
-            matches = re.findall(pattern, content)
-            if matches:
-                for m in matches[:2]:
-                    suspicious_found.append({"file": rel_file, "pattern": desc, "match": m})
+    for doc in html_files:
+        suspicious = cached(doc, "alpha_suspicious", alpha_scan_suspicious)
+        suspicious_found.extend(suspicious)
+        for sp in suspicious:
+            emit("finding", audit="alpha", kind="suspicious_pattern", **sp)
 
     if suspicious_found:
         print_warn(f"Found {len(suspicious_found)} suspicious patterns")
@@ -372,6 +445,7 @@ def run_alpha():
         print(f"\n  {Colors.GREEN}{Colors.BOLD}ALPHA: PASSED{Colors.END}")
     else:
         print(f"\n  {Colors.RED}{Colors.BOLD}ALPHA: FAILED{Colors.END}")
+    emit_audit("alpha", results)
 
     return results
 
@@ -379,7 +453,7 @@ def run_alpha():
 # Main
 # =============================================================================
 
-def run_all():
+def run_all(timestamp=None):
     """Run complete triaxial audit"""
     print(f"""
 {Colors.CYAN}{Colors.BOLD}
@@ -389,7 +463,7 @@ def run_all():
 ╚══════════════════════════════════════════════════════════════╝
 {Colors.END}""")
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
 
     results = {
         "timestamp": timestamp,
@@ -428,35 +502,72 @@ def run_all():
         print(f"  Review failures before deployment.")
         print(f"  ══════════════════════════════════════{Colors.END}\n")
 
+    emit("summary", passed=all_passed, shiva=results["shiva"]["passed"],
+         omega=results["omega"]["passed"], alpha=results["alpha"]["passed"])
+
     # Save report
     report_path = SITE_ROOT / f"TRIAXIAL_REPORT_{timestamp}.json"
-    with open(report_path, 'w') as f:
-        json.dump(results, f, indent=2, default=str)
+    if REPORT_STREAM is not None:
+        # Every finding is already in the NDJSON stream; keep the summary compact
+        write_compact_json(report_path, {
+            "timestamp": timestamp,
+            "site_root": str(SITE_ROOT),
+            "stream": REPORT_STREAM.path.name,
+            "passed": all_passed,
+            **{audit: results[audit]["passed"] for audit in ("shiva", "omega", "alpha")}
+        })
+    else:
+        with open(report_path, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
     print(f"  Report saved: {report_path.name}\n")
 
     return 0 if all_passed else 1
 
 def main():
+    global SITE_ROOT, AUDIT_CACHE, REPORT_STREAM
+
     parser = argparse.ArgumentParser(description="Triaxial Audit System")
     parser.add_argument("--shiva", action="store_true", help="Run SHIVA (structure) audit only")
     parser.add_argument("--omega", action="store_true", help="Run OMEGA (content) audit only")
     parser.add_argument("--alpha", action="store_true", help="Run ALPHA (navigation) audit only")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse per-file results for unchanged pages from .hmh_cache/")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write findings to TRIAXIAL_REPORT_*.ndjson as they are found")
+    parser.add_argument("--root", type=Path, default=SITE_ROOT,
+                        help="Site directory to audit (default: this repository)")
 
     args = parser.parse_args()
 
+    SITE_ROOT = args.root.resolve()
     os.chdir(SITE_ROOT)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    if args.stream:
+        REPORT_STREAM = ReportStream(SITE_ROOT / f"TRIAXIAL_REPORT_{timestamp}.ndjson")
+        emit("start", tool="TRIAXIAL", timestamp=timestamp, site_root=str(SITE_ROOT))
+    if args.incremental:
+        AUDIT_CACHE = AuditCache(SITE_ROOT, "triaxial", salt=Path(__file__).read_bytes())
+        site_corpus()
+        print_info(f"Incremental cache: {AUDIT_CACHE.summary()}")
 
     if args.shiva:
         result = run_shiva()
-        return 0 if result["passed"] else 1
+        status = 0 if result["passed"] else 1
     elif args.omega:
         result = run_omega()
-        return 0 if result["passed"] else 1
+        status = 0 if result["passed"] else 1
     elif args.alpha:
         result = run_alpha()
-        return 0 if result["passed"] else 1
+        status = 0 if result["passed"] else 1
     else:
-        return run_all()
+        status = run_all(timestamp)
+
+    if AUDIT_CACHE is not None:
+        AUDIT_CACHE.save()
+    if REPORT_STREAM is not None:
+        REPORT_STREAM.close()
+    return status
 
 if __name__ == "__main__":
     sys.exit(main())